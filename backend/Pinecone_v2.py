@@ -2,22 +2,21 @@ import os
 import json
 from pinecone import Pinecone, ServerlessSpec
 from langchain.vectorstores import Pinecone as PineconeVectorStore
-from langchain.embeddings.huggingface import HuggingFaceEmbeddings
 from langchain.schema import Document
 from dotenv import load_dotenv
+from partitions import partition_from_path, tier_namespace
+from embedding_models import get_hf_embeddings, HF_EMBEDDING_DIM, chunk_content, chunk_position
+from sections import section_fields
 
 # Load environment variables from .env
 load_dotenv(dotenv_path=".env")
 
-def index_json_content(json_content, index_name="json-index", pinecone_api_key=None, region="us-east-1"):
-    """
-    Index JSON content (as a string or dict) into Pinecone after chunking.
+UPSERT_BATCH_SIZE = 100  # Vectors per Pinecone upsert request
 
-    Args:
-        json_content (str or dict): The JSON content as a string or dict.
-        index_name (str): Pinecone index name (lowercase, alphanumeric, dash-separated).
-        pinecone_api_key (str, optional): Pinecone API key (default: from .env).
-        region (str, optional): Pinecone region (default: us-east-1).
+def get_pinecone_index(index_name="json-index", pinecone_api_key=None, region="us-east-1"):
+    """
+    Connects to a Pinecone index, creating it (384-dim, cosine) if it doesn't exist yet.
+    Returns (index, normalized index name).
     """
     index_name = index_name.lower().replace("_", "-")
 
@@ -35,17 +34,36 @@ def index_json_content(json_content, index_name="json-index", pinecone_api_key=N
         print(f"⚠️ Index '{index_name}' not found. Creating it now...")
         pc.create_index(
             name=index_name,
-            dimension=384,
+            dimension=HF_EMBEDDING_DIM,
             metric="cosine",
             spec=ServerlessSpec(cloud="aws", region=region)
         )
 
-    index = pc.Index(index_name)
+    return pc.Index(index_name), index_name
+
+def index_json_content(json_content, index_name="json-index", pinecone_api_key=None, region="us-east-1",
+                       source_path=None, namespace=None):
+    """
+    Index JSON content (as a string or dict) into Pinecone after chunking.
+
+    Args:
+        json_content (str or dict): The JSON content as a string or dict.
+        index_name (str): Pinecone index name (lowercase, alphanumeric, dash-separated).
+        pinecone_api_key (str, optional): Pinecone API key (default: from .env).
+        region (str, optional): Pinecone region (default: us-east-1).
+        source_path (str, optional): GCS path of the chunked file, used to derive the partition.
+        namespace (str, optional): Pinecone namespace (default: year-quarter partition of source_path).
+    """
+    index, index_name = get_pinecone_index(index_name, pinecone_api_key, region)
+
+    # Initialize embeddings (loaded once per process)
+    embeddings = get_hf_embeddings()
 
-    # Initialize embeddings
-    embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
+    # ✅ Route into the year/quarter namespace so queries only scan the relevant partition
+    if namespace is None:
+        namespace = partition_from_path(source_path)
 
-    vector_store = PineconeVectorStore(index=index, embedding=embeddings, text_key="page_content")
+    vector_store = PineconeVectorStore(index=index, embedding=embeddings, text_key="page_content", namespace=namespace)
 
     # Parse JSON
     try:
@@ -56,20 +74,64 @@ def index_json_content(json_content, index_name="json-index", pinecone_api_key=N
     if 'chunks' not in data or not isinstance(data['chunks'], list):
         raise ValueError("❌ No valid 'chunks' found in JSON content.")
 
-    chunks = [
-        chunk.get("content", "") if isinstance(chunk, dict) else chunk
-        for chunk in data["chunks"]
-    ]
+    metadata = {"source": source_path or "in-memory"}
+    if namespace:
+        metadata["partition"] = namespace
 
+    # ✅ Section metadata from the "markdown" chunker lets queries filter by Item/topic
     documents = [
-        Document(page_content=chunk, metadata={"source": "in-memory"})
-        for chunk in chunks if chunk
+        Document(page_content=chunk_content(chunk), metadata={**metadata, **section_fields(chunk), **chunk_position(chunk)})
+        for chunk in data["chunks"] if chunk_content(chunk)
     ]
 
     if documents:
         vector_store.add_documents(documents)
-        print(f"✅ Successfully indexed {len(documents)} chunks into Pinecone ({index_name}).")
+        print(f"✅ Successfully indexed {len(documents)} chunks into Pinecone ({index_name}, namespace: {namespace or 'default'}).")
     else:
         print("⚠️ No chunks were created. JSON content might be empty.")
 
     return vector_store
+
+
+def upsert_embedded_chunks(chunks, embeddings, index_name="json-index", pinecone_api_key=None, region="us-east-1",
+                           source_path=None, namespace=None, index=None, tier="chunks"):
+    """
+    Upserts chunks whose embeddings were already computed (e.g. by the ingestion pipeline) into Pinecone.
+    Vectors are stored exactly as the LangChain store writes them (text under `page_content`), so the
+    hybrid search reads them the same way. Ids are derived from the source path and chunk position,
+    so re-ingesting a file overwrites its vectors instead of duplicating them.
+
+    Args:
+        chunks (list[str or dict]): Chunk texts or chunk records (section metadata is kept).
+        embeddings (list[list[float]]): One 384-dim embedding per chunk (all-MiniLM-L6-v2).
+        source_path (str, optional): GCS path the chunks came from, used for ids and the partition.
+        namespace (str, optional): Year-quarter partition (default: derived from source_path).
+        index (optional): An already-connected index to write to instead of `index_name`.
+        tier (str): "chunks", or "summaries" to write section/document summaries to the summary tier's namespace.
+
+    Returns:
+        int: Number of vectors upserted.
+    """
+    if len(chunks) != len(embeddings):
+        raise ValueError("❌ Every chunk needs exactly one embedding.")
+
+    if index is None:
+        index, index_name = get_pinecone_index(index_name, pinecone_api_key, region)
+    partition = namespace if namespace is not None else partition_from_path(source_path)
+    namespace = tier_namespace(partition, tier)
+
+    source = source_path or "in-memory"
+    metadata = {"source": source}
+    if partition:
+        metadata["partition"] = partition
+
+    vectors = [
+        {"id": f"{source}#{i}", "values": list(embedding),
+         "metadata": {**metadata, **section_fields(chunk), **chunk_position(chunk), "page_content": chunk_content(chunk)}}
+        for i, (chunk, embedding) in enumerate(zip(chunks, embeddings)) if chunk_content(chunk)
+    ]
+    for start in range(0, len(vectors), UPSERT_BATCH_SIZE):
+        index.upsert(vectors=vectors[start:start + UPSERT_BATCH_SIZE], namespace=namespace or "")
+
+    print(f"✅ Upserted {len(vectors)} chunks into Pinecone ({index_name}, namespace: {namespace or 'default'}).")
+    return len(vectors)
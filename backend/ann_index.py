@@ -0,0 +1,420 @@
+import io
+import json
+import os
+import threading
+import time
+import numpy as np
+from google.api_core.exceptions import NotFound
+from gcs_utils import get_file_content, download_file_from_gcs, upload_to_gcs, get_blob_info
+from search import get_embedding, normalize_rows, extract_chunk_records
+from gen_embedding import list_embedding_artifacts, EMBEDDINGS_PREFIX
+from embedding_models import check_dimensions
+from corpus_search import quarter_tag
+from sections import resolve_section_filter
+
+ANN_INDEX_BLOB = f"{EMBEDDINGS_PREFIX}/_ann/corpus_ivf.npz"  # Persisted next to the embedding artifacts
+
+MAX_TRAINING_VECTORS = 50_000  # k-means sample size; enough to place centroids well
+RETRAIN_GROWTH_FACTOR = 4  # Retrain centroids once the corpus outgrows the training set this much
+ANN_INDEX_REFRESH_SECONDS = float(os.getenv("ANN_INDEX_REFRESH_SECONDS", "30"))  # How often a replica checks for a newer index
+
+
+class IVFIndex:
+    """
+    Inverted-file (IVF) approximate nearest-neighbour index over normalized embeddings.
+
+    Vectors are clustered with spherical k-means; a query only scores the vectors in the
+    `n_probe` clusters whose centroids are closest to it instead of the whole corpus.
+    New artifacts are added incrementally by assigning them to the existing centroids; every
+    vector's metadata records the `artifact` it came from, so a re-embedded artifact can be replaced.
+    """
+
+    def __init__(self):
+        self.centroids = None
+        self.vectors = np.zeros((0, 0), dtype=np.float32)
+        self.assignments = np.zeros(0, dtype=np.int32)
+        self.metadata = []
+        self.indexed_files = {}  # artifact name -> GCS generation it was indexed at
+        self.trained_size = 0
+        self._lists = None
+        self._fields = {}
+
+    def __len__(self):
+        return len(self.metadata)
+
+    @property
+    def dim(self):
+        return None if self.centroids is None else self.centroids.shape[1]
+
+    @property
+    def needs_retrain(self):
+        return self.trained_size and len(self) > RETRAIN_GROWTH_FACTOR * self.trained_size
+
+    def train(self, vectors, n_lists=None, iterations=10, seed=0):
+        """Places the IVF centroids with spherical k-means over (a sample of) the vectors."""
+        vectors = normalize_rows(vectors)
+        rng = np.random.default_rng(seed)
+        corpus_size = len(vectors)  # Before sampling, so needs_retrain compares corpus sizes
+
+        if len(vectors) > MAX_TRAINING_VECTORS:
+            vectors = vectors[rng.choice(len(vectors), MAX_TRAINING_VECTORS, replace=False)]
+
+        if n_lists is None:
+            n_lists = int(np.sqrt(len(vectors)))
+        n_lists = max(1, min(n_lists, len(vectors)))
+
+        centroids = vectors[rng.choice(len(vectors), n_lists, replace=False)]
+        for _ in range(iterations):
+            assignments = np.argmax(vectors @ centroids.T, axis=1)
+            for list_id in range(n_lists):
+                members = vectors[assignments == list_id]
+                if len(members):
+                    centroids[list_id] = members.mean(axis=0)
+            centroids = normalize_rows(centroids)
+
+        self.centroids = centroids
+        self.trained_size = corpus_size
+
+        # Re-assign anything already stored to the new centroids
+        if len(self):
+            self.assignments = self._assign(self.vectors)
+        self._lists = None
+
+    def _assign(self, vectors):
+        return np.argmax(vectors @ self.centroids.T, axis=1).astype(np.int32)
+
+    def add(self, vectors, metadata, file_name=None, generation=None):
+        """Adds vectors (one metadata dict each) from artifact `file_name`; trains the centroids first if needed."""
+        vectors = normalize_rows(vectors)
+        if len(vectors) != len(metadata):
+            raise ValueError("Each vector needs exactly one metadata entry.")
+        if file_name:
+            metadata = [{**entry, "artifact": file_name} for entry in metadata]
+        if not len(vectors):
+            if file_name:
+                self.indexed_files[file_name] = generation
+            return
+
+        if self.centroids is None:
+            self.train(vectors)
+        elif vectors.shape[1] != self.dim:
+            raise ValueError(f"Vector dimension {vectors.shape[1]} does not match index dimension {self.dim}.")
+
+        self.vectors = vectors if not len(self) else np.vstack([self.vectors, vectors])
+        self.assignments = np.concatenate([self.assignments, self._assign(vectors)])
+        self.metadata.extend(metadata)
+        if file_name:
+            self.indexed_files[file_name] = generation
+
+        self._lists = None
+        self._fields = {}
+
+    def remove_file(self, file_name):
+        """Drops every vector of one artifact (the centroids stay). Returns how many were removed."""
+        keep = np.array([entry.get("artifact") != file_name for entry in self.metadata], dtype=bool)
+        removed = int(len(keep) - keep.sum())
+        if removed:
+            self.vectors = self.vectors[keep]
+            self.assignments = self.assignments[keep]
+            self.metadata = [entry for entry, kept in zip(self.metadata, keep) if kept]
+            self._lists = None
+            self._fields = {}
+        self.indexed_files.pop(file_name, None)
+        return removed
+
+    def _inverted_lists(self):
+        if self._lists is None:
+            order = np.argsort(self.assignments, kind="stable")
+            boundaries = np.searchsorted(self.assignments[order], np.arange(len(self.centroids) + 1))
+            self._lists = [order[boundaries[i]:boundaries[i + 1]] for i in range(len(self.centroids))]
+        return self._lists
+
+    def _filter_mask(self, ids, filters):
+        """Which of `ids` have every metadata field in `filters` equal to its value."""
+        mask = np.ones(len(ids), dtype=bool)
+        for field, value in filters.items():
+            if field not in self._fields:
+                self._fields[field] = np.array([m.get(field) or "" for m in self.metadata])
+            mask &= self._fields[field][ids] == value
+        return mask
+
+    def _top_k(self, query, candidate_ids, k, filters=None):
+        if filters:
+            candidate_ids = candidate_ids[self._filter_mask(candidate_ids, filters)]
+        if not len(candidate_ids):
+            return np.zeros(0, dtype=np.float32), candidate_ids
+
+        scores = self.vectors[candidate_ids] @ query
+        if len(scores) > k:
+            top = np.argpartition(-scores, k)[:k]
+        else:
+            top = np.arange(len(scores))
+        top = top[np.argsort(-scores[top])]
+        return scores[top], candidate_ids[top]
+
+    def search(self, query_embedding, k=5, n_probe=8, quarter=None, where=None):
+        """
+        Returns (scores, ids) of the approximate top-k vectors, scanning only `n_probe` clusters.
+        With a `quarter` filter (or other metadata equality filters in `where`, e.g. a section),
+        the probe widens to further clusters (nearest first) until it has found k matching
+        vectors, so a filter doesn't cost recall.
+        """
+        if not len(self):
+            return np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.int64)
+
+        filters = {**(where or {}), **({"quarter": quarter} if quarter is not None else {})}
+        query = normalize_rows(query_embedding)
+        order = np.argsort(-(self.centroids @ query))
+        lists = self._inverted_lists()
+        if not filters:
+            candidate_ids = np.concatenate([lists[list_id] for list_id in order[:n_probe]])
+            return self._top_k(query, candidate_ids, k)
+
+        selected, found = [], 0
+        for probed, list_id in enumerate(order, start=1):
+            ids = lists[list_id][self._filter_mask(lists[list_id], filters)]
+            selected.append(ids)
+            found += len(ids)
+            if probed >= n_probe and found >= k:
+                break
+        return self._top_k(query, np.concatenate(selected), k)
+
+    def brute_force_search(self, query_embedding, k=5, quarter=None, where=None):
+        """Exact top-k over every vector; the ground truth for recall measurements."""
+        query = normalize_rows(query_embedding)
+        filters = {**(where or {}), **({"quarter": quarter} if quarter is not None else {})}
+        return self._top_k(query, np.arange(len(self)), k, filters)
+
+    def to_bytes(self):
+        """Serializes the index to a compressed .npz payload."""
+        buffer = io.BytesIO()
+        np.savez_compressed(
+            buffer,
+            centroids=self.centroids,
+            vectors=self.vectors,
+            assignments=self.assignments,
+            trained_size=np.array(self.trained_size),
+            metadata=np.array(json.dumps(self.metadata, ensure_ascii=False)),
+            indexed_files=np.array(json.dumps(self.indexed_files, sort_keys=True))
+        )
+        buffer.seek(0)
+        return buffer
+
+    @classmethod
+    def from_bytes(cls, data):
+        """Restores an index written by `to_bytes`."""
+        payload = np.load(io.BytesIO(data), allow_pickle=False)
+        index = cls()
+        index.centroids = payload["centroids"]
+        index.vectors = payload["vectors"]
+        index.assignments = payload["assignments"]
+        index.trained_size = int(payload["trained_size"])
+        index.metadata = json.loads(str(payload["metadata"]))
+        indexed_files = json.loads(str(payload["indexed_files"]))
+        # Indexes saved before generations were recorded list names only
+        index.indexed_files = indexed_files if isinstance(indexed_files, dict) else dict.fromkeys(indexed_files)
+        return index
+
+
+# In-process copy of the corpus index so queries don't re-download it, with the index blob's
+# generation it was loaded at and when that was last compared with the stored one
+_corpus_index = None
+_corpus_index_generation = None
+_corpus_index_checked_at = 0.0
+_corpus_index_lock = threading.Lock()
+
+
+def load_artifact_records(file_name):
+    """Loads the chunk records that carry stored embeddings from one artifact."""
+    content = json.loads(get_file_content(file_name))
+    records = extract_chunk_records(content)
+    embedded = [record for record in records if record["embedding"] is not None]
+
+    if len(embedded) < len(records):
+        print(f"⚠️ {file_name}: {len(records) - len(embedded)} chunks have no stored embedding, re-run embedding to index them.")
+    return embedded
+
+
+def save_index(index, blob_name=ANN_INDEX_BLOB):
+    """Persists the index to GCS."""
+    file_url = upload_to_gcs(index.to_bytes(), blob_name, content_type="application/octet-stream")
+    print(f"✅ ANN index ({len(index)} vectors) saved to GCS: {file_url}")
+    return file_url
+
+
+def load_index(blob_name=ANN_INDEX_BLOB):
+    """Loads the persisted index from GCS, or returns None if none has been built yet."""
+    try:
+        return IVFIndex.from_bytes(download_file_from_gcs(blob_name))
+    except NotFound:
+        return None
+
+
+def build_corpus_index(rebuild=False, n_lists=None, prefix=EMBEDDINGS_PREFIX, blob_name=ANN_INDEX_BLOB):
+    """
+    Builds the corpus index, or incrementally brings it up to date: artifacts that are new or
+    were re-embedded (their GCS generation changed) are (re-)added, deleted ones are dropped.
+
+    Centroids are retrained from scratch when `rebuild` is set or when the corpus has grown
+    well past the size the centroids were trained on.
+    """
+    global _corpus_index, _corpus_index_generation, _corpus_index_checked_at
+
+    index = None if rebuild else load_index(blob_name)
+    artifacts = list_embedding_artifacts(prefix)
+
+    if index is not None and None in index.indexed_files.values():
+        print("♻️ ANN index predates artifact generations, rebuilding it...")
+        index = None
+
+    removed = 0
+    if index is not None:
+        for file_name, generation in list(index.indexed_files.items()):
+            if artifacts.get(file_name) != generation:
+                removed += index.remove_file(file_name)
+        if not len(index):
+            index = IVFIndex()  # Nothing left to keep the centroids for
+        new_files = sorted(name for name in artifacts if name not in index.indexed_files)
+    else:
+        index = IVFIndex()
+        new_files = sorted(artifacts)
+
+    # Only artifacts with the index's model and dimension can share it; for a new index, the first file decides
+    indexed_config = (index.metadata[0].get("embedding_model"), index.dim) if len(index) else None
+    loaded = []
+    for file_name in new_files:
+        records = load_artifact_records(file_name)
+        vectors = [record.pop("embedding") for record in records]
+        if records:
+            configs = {(record.get("embedding_model"), len(vector)) for record, vector in zip(records, vectors)}
+            if len(configs) > 1:
+                print(f"⚠️ Skipping {file_name}: mixes embedding models/dimensions {sorted(configs, key=str)}.")
+                continue
+            config = configs.pop()
+            if indexed_config is None:
+                indexed_config = config
+            elif config != indexed_config:
+                print(f"⚠️ Skipping {file_name}: embedded with {config[0]} ({config[1]} dims), "
+                      f"index uses {indexed_config[0]} ({indexed_config[1]} dims).")
+                continue
+        loaded.append((file_name, vectors, records))
+
+    # Train on the whole batch up front so the centroids reflect the full corpus, not the first file
+    if index.centroids is None and any(vectors for _, vectors, _ in loaded):
+        index.train(np.vstack([vectors for _, vectors, _ in loaded if vectors]), n_lists=n_lists)
+
+    added = 0
+    for file_name, vectors, records in loaded:
+        index.add(vectors, records, file_name=file_name, generation=artifacts[file_name])
+        added += len(records)
+
+    retrained = False
+    if index.needs_retrain:
+        print("♻️ Corpus outgrew the IVF centroids, retraining...")
+        index.train(index.vectors, n_lists=n_lists)
+        retrained = True
+
+    if added or removed or retrained or rebuild:
+        save_index(index, blob_name)
+
+    if blob_name == ANN_INDEX_BLOB:
+        info = get_blob_info(blob_name)
+        with _corpus_index_lock:
+            _corpus_index, _corpus_index_generation = index, info["generation"] if info else None
+            _corpus_index_checked_at = time.monotonic()
+    print(f"✅ ANN index ready: {len(index)} vectors from {len(index.indexed_files)} files "
+          f"({len(new_files)} added, {removed} stale vectors dropped).")
+    return index
+
+
+def get_corpus_index():
+    """
+    Returns the cached corpus index, loading it from GCS on first use. Every
+    ANN_INDEX_REFRESH_SECONDS the stored index's generation is checked, so a replica picks up an
+    index rebuilt by another one.
+    """
+    global _corpus_index, _corpus_index_generation, _corpus_index_checked_at
+    with _corpus_index_lock:
+        if _corpus_index is not None and time.monotonic() - _corpus_index_checked_at < ANN_INDEX_REFRESH_SECONDS:
+            return _corpus_index
+        info = get_blob_info(ANN_INDEX_BLOB)
+        _corpus_index_checked_at = time.monotonic()
+        if info is not None and (_corpus_index is None or info["generation"] != _corpus_index_generation):
+            _corpus_index, _corpus_index_generation = load_index(), info["generation"]
+        if _corpus_index is None:
+            raise ValueError("ANN index has not been built yet. Call /build_ann_index first.")
+        return _corpus_index
+
+
+def search_corpus_ann(query, quarter_filter=None, top_n=5, n_probe=8, section=None):
+    """
+    Searches every indexed artifact at once and returns results shaped like `search_from_content`.
+    `quarter_filter` takes the same forms as the corpus search ("Q3 2023", "2023-Q3", "Q3_2023");
+    the section is filtered like in `search_from_content` (strictly when given, preferred when
+    the query names one).
+    """
+    index = get_corpus_index()
+    if not len(index):
+        return []
+
+    # Query with the model/dimension the indexed chunks were embedded with
+    model = index.metadata[0].get("embedding_model")
+    query_embedding = get_embedding(query, model=model, dimensions=index.dim)
+    check_dimensions(len(query_embedding), index.dim, model)
+
+    quarter = quarter_tag(quarter_filter)
+    field, value, strict = resolve_section_filter(query, section)
+    where = {field: value} if field else None
+    scores, ids = index.search(query_embedding, k=top_n, n_probe=n_probe, quarter=quarter, where=where)
+    if where and not strict and not len(ids):
+        scores, ids = index.search(query_embedding, k=top_n, n_probe=n_probe, quarter=quarter)
+
+    return [
+        {
+            "similarity": float(score),
+            "chunk": index.metadata[i]["chunk"],
+            "filename": index.metadata[i].get("filename"),
+            "quarter": index.metadata[i].get("quarter"),
+            "section_path": index.metadata[i].get("section_path")
+        }
+        for score, i in zip(scores, ids)
+    ]
+
+
+def recall_at_k(index, k=10, n_probe=8, sample_size=100, query_embeddings=None, seed=0):
+    """
+    Measures ANN recall@k against brute-force search.
+
+    Uses `query_embeddings` if given, otherwise a random sample of the stored chunk vectors
+    as queries. Also reports the mean per-query latency of both searches.
+    """
+    if query_embeddings is None:
+        rng = np.random.default_rng(seed)
+        sample = rng.choice(len(index), min(sample_size, len(index)), replace=False)
+        query_embeddings = index.vectors[sample]
+
+    hits, total = 0, 0
+    ann_seconds, exact_seconds = 0.0, 0.0
+    for query in query_embeddings:
+        start = time.perf_counter()
+        _, ann_ids = index.search(query, k=k, n_probe=n_probe)
+        ann_seconds += time.perf_counter() - start
+
+        start = time.perf_counter()
+        _, exact_ids = index.brute_force_search(query, k=k)
+        exact_seconds += time.perf_counter() - start
+
+        hits += len(set(ann_ids.tolist()) & set(exact_ids.tolist()))
+        total += len(exact_ids)
+
+    queries = max(len(query_embeddings), 1)
+    return {
+        "k": k,
+        "n_probe": n_probe,
+        "queries": len(query_embeddings),
+        "vectors": len(index),
+        "lists": 0 if index.centroids is None else len(index.centroids),
+        "recall_at_k": hits / total if total else None,
+        "ann_ms_per_query": 1000 * ann_seconds / queries,
+        "brute_force_ms_per_query": 1000 * exact_seconds / queries
+    }
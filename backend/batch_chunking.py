@@ -0,0 +1,160 @@
+import argparse
+import itertools
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from gcs_utils import list_files_in_gcs, download_file_from_gcs
+from chunking import get_tokenizer, TokenizedText, chunk_text, chunked_blob_name, upload_chunked_data, CHUNKING_STRATEGIES, STRATEGY_PARAMS
+
+# Sweep outputs get their own folder per configuration, outside chunked_outputs/ so indexing never picks them up
+SWEEP_PREFIX = "chunked_sweeps"
+
+
+def sweep_configs(strategies, chunk_sizes=None, chunk_overlaps=None):
+    """
+    Every (strategy, chunk_size, chunk_overlap) combination to run. None means the strategy's default;
+    strategies without an overlap setting get a single configuration per size.
+    """
+    configs = []
+    for strategy in strategies:
+        if strategy not in CHUNKING_STRATEGIES:
+            raise ValueError(f"Unknown strategy: {strategy}. Choose from {', '.join(CHUNKING_STRATEGIES)}.")
+        overlaps = chunk_overlaps if STRATEGY_PARAMS[strategy][1] else None
+        for size, overlap in itertools.product(chunk_sizes or [None], overlaps or [None]):
+            if size is not None and overlap is not None and overlap >= size:
+                raise ValueError(f"chunk_overlap ({overlap}) must be smaller than chunk_size ({size}).")
+            config = {"strategy": strategy, "chunk_size": size, "chunk_overlap": overlap}
+            if config not in configs:
+                configs.append(config)
+    return configs
+
+
+def config_tag(config):
+    """Folder name for a configuration, e.g. "sliding-512-64" ("default" where the strategy's default is used)."""
+    size = config["chunk_size"] if config["chunk_size"] is not None else "default"
+    overlap = config["chunk_overlap"] if config["chunk_overlap"] is not None else "default"
+    return f"{config['strategy']}-{size}-{overlap}"
+
+
+def batch_output_name(file_name, config, tagged):
+    """
+    Where a document's chunks are written. A single configuration writes to the same chunked_outputs/
+    path /fetch_file/ uses; a sweep writes under chunked_sweeps/<config>/ so runs don't overwrite each other.
+    """
+    if not tagged:
+        return chunked_blob_name(f"chunked_{file_name}")
+    return chunked_blob_name(f"{SWEEP_PREFIX}/{config_tag(config)}/{file_name}")
+
+
+def init_worker():
+    """Runs once per worker process: loads the tiktoken encoder before any document arrives."""
+    get_tokenizer().encode("warm up")
+
+
+def chunk_document(file_name, configs, tagged):
+    """
+    Worker task: downloads one Markdown document, tokenizes it once, runs every configuration over
+    that tokenization and uploads each result. Failures are reported per configuration.
+    """
+    start = time.perf_counter()
+    doc = TokenizedText(download_file_from_gcs(file_name).decode("utf-8"))
+
+    results = []
+    for config in configs:
+        output = batch_output_name(file_name, config, tagged)
+        try:
+            chunks = chunk_text(doc, config["strategy"], config["chunk_size"], config["chunk_overlap"])
+            upload_chunked_data(chunks, output)
+            results.append({**config, "file": file_name, "output": output, "chunks": len(chunks)})
+        except Exception as e:
+            results.append({**config, "file": file_name, "output": output, "error": str(e)})
+
+    return {"file": file_name, "tokens": len(doc), "seconds": round(time.perf_counter() - start, 3), "results": results}
+
+
+def list_markdown_files(prefix="outputs"):
+    """Parsed Markdown documents under a GCS prefix."""
+    return [name for name in list_files_in_gcs(prefix) if name.lower().endswith(".md")]
+
+
+def run_batch_chunking(prefix="outputs", strategies=("fixed",), chunk_sizes=None, chunk_overlaps=None,
+                       max_workers=None, file_names=None):
+    """
+    Chunks every Markdown document under `prefix` with every requested configuration, spreading
+    documents across a pool of worker processes.
+
+    Args:
+        prefix (str): GCS folder holding the parsed Markdown (default: outputs).
+        strategies (list[str]): Chunking strategies to run.
+        chunk_sizes (list[int], optional): Sizes to sweep (default: each strategy's own).
+        chunk_overlaps (list[int], optional): Overlaps to sweep, for strategies that have one.
+        max_workers (int, optional): Worker processes (default: one per CPU).
+        file_names (list[str], optional): Explicit documents instead of everything under `prefix`.
+
+    Returns:
+        dict: Totals, throughput, and chunk counts per configuration, plus any failures.
+    """
+    configs = sweep_configs(strategies, chunk_sizes, chunk_overlaps)
+    file_names = list(file_names) if file_names is not None else list_markdown_files(prefix)
+    if not file_names:
+        raise ValueError(f"No Markdown files found under {prefix}/")
+
+    tagged = len(configs) > 1
+    max_workers = max(1, min(max_workers or os.cpu_count() or 1, len(file_names)))
+    print(f"🧩 Chunking {len(file_names)} documents × {len(configs)} configurations on {max_workers} processes")
+
+    documents, failures = [], []
+    per_config = {config_tag(config): {**config, "documents": 0, "chunks": 0} for config in configs}
+    start = time.perf_counter()
+
+    # spawn: workers start clean (no forked GCS client or model state) and each loads the encoder once
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"),
+                             initializer=init_worker) as executor:
+        futures = {executor.submit(chunk_document, name, configs, tagged): name for name in file_names}
+        for future in as_completed(futures):
+            try:
+                document = future.result()
+            except Exception as e:
+                failures.append({"file": futures[future], "error": str(e)})
+                print(f"❌ Failed to chunk {futures[future]}: {e}")
+                continue
+            documents.append(document)
+            for result in document["results"]:
+                if "error" in result:
+                    failures.append(result)
+                    print(f"❌ {config_tag(result)} failed for {result['file']}: {result['error']}")
+                else:
+                    totals = per_config[config_tag(result)]
+                    totals["documents"] += 1
+                    totals["chunks"] += result["chunks"]
+
+    elapsed = time.perf_counter() - start
+    print(f"✅ Chunked {len(documents)}/{len(file_names)} documents in {elapsed:.1f}s")
+    return {
+        "prefix": prefix,
+        "documents": len(file_names),
+        "configurations": list(per_config.values()),
+        "outputs_written": sum(totals["documents"] for totals in per_config.values()),
+        "output_prefix": SWEEP_PREFIX if tagged else "chunked_outputs",
+        "failed": failures,
+        "workers": max_workers,
+        "wall_seconds": round(elapsed, 3),
+        "documents_per_sec": round(len(documents) / elapsed, 3) if elapsed else None,
+        "tokens_per_sec": round(sum(d["tokens"] for d in documents) / elapsed, 1) if elapsed else None
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Chunk every parsed Markdown document in GCS with one or more configurations.")
+    parser.add_argument("--prefix", default="outputs")
+    parser.add_argument("--strategies", nargs="+", default=["fixed"], choices=list(CHUNKING_STRATEGIES))
+    parser.add_argument("--chunk-sizes", type=int, nargs="+", default=None)
+    parser.add_argument("--chunk-overlaps", type=int, nargs="+", default=None)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    summary = run_batch_chunking(args.prefix, args.strategies, args.chunk_sizes, args.chunk_overlaps, args.workers)
+    for totals in summary["configurations"]:
+        print(f"  {config_tag(totals)}: {totals['chunks']} chunks from {totals['documents']} documents")
+    print(f"📊 {summary['documents_per_sec']} documents/sec, {summary['tokens_per_sec']} tokens/sec")
@@ -0,0 +1,193 @@
+"""
+Batch question answering for standard question sets (e.g. the same 30 KPIs every quarter).
+
+Asking /ask once per question pays for every step 30 times in a row. Here all the questions are
+embedded in one batched call and their vector searches run in parallel. Questions that retrieve the
+same chunks share one built context, and a question asked twice is answered once. The LLM calls
+run with bounded concurrency, and each answer is yielded as soon as it's ready. A batch then takes
+about as long as its slowest few LLM calls, not the sum of all of them.
+"""
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from context_builder import build_context
+from embedding_models import get_hf_embeddings, HF_EMBEDDING_MODEL
+from provenance import citations
+from reranker import chunk_id, RERANK_ENABLED
+from sections import section_filter
+from summary_tier import route_query
+from tracing import span, in_current_context
+
+BATCH_STORES = ("pinecone", "chroma")
+BATCH_MAX_QUESTIONS = 100
+BATCH_LLM_CONCURRENCY = int(os.getenv("BATCH_LLM_CONCURRENCY", "8"))  # Concurrent LLM calls per batch
+BATCH_MAX_CONCURRENCY = 32
+BATCH_RETRIEVAL_WORKERS = 8  # Concurrent vector searches (each one also fans out over partitions)
+
+NO_RESULTS_ANSWER = "I couldn't find relevant information in the database."
+
+
+def normalize_question(question):
+    """Key for spotting repeated questions: whitespace collapsed, case ignored."""
+    return " ".join(question.split()).casefold()
+
+
+def validate_batch(questions, store="pinecone", tier="auto", max_concurrency=BATCH_LLM_CONCURRENCY, section=None, top_k=5):
+    """
+    Raises ValueError for a batch that can't run; called before the response starts streaming, so a
+    bad option fails the request instead of every question.
+    """
+    if not questions or not any(question.strip() for question in questions):
+        raise ValueError("At least one question is required.")
+    if len(questions) > BATCH_MAX_QUESTIONS:
+        raise ValueError(f"A batch holds at most {BATCH_MAX_QUESTIONS} questions.")
+    if store not in BATCH_STORES:
+        raise ValueError(f"Unknown store: {store}. Choose from {', '.join(BATCH_STORES)}.")
+    if not 1 <= max_concurrency <= BATCH_MAX_CONCURRENCY:
+        raise ValueError(f"max_concurrency must be between 1 and {BATCH_MAX_CONCURRENCY}.")
+    if top_k < 1:
+        raise ValueError("top_k must be at least 1.")
+    route_query("", tier)  # Rejects unknown tiers
+    if section:
+        section_filter(section)  # Rejects unknown sections
+
+
+def store_pipeline(store, index_name="json-index", persist_directory="./chroma_langchain_db", top_k=5, partition=None,
+                   section=None, rerank_results=RERANK_ENABLED, tier="auto"):
+    """(retrieve(question, embedding), answer(question, built)) for a store; imported lazily like the indexers."""
+    if store == "pinecone":
+        from pinecone import Pinecone
+        from hybrid_search_pinecone_gpt_v2 import retrieve_for_query, answer_with_context, PINECONE_API_KEY
+        index = Pinecone(api_key=PINECONE_API_KEY).Index(index_name)
+
+        def retrieve(question, embedding):
+            return retrieve_for_query(question, index, top_k, partition, section, rerank_results, tier, query_embedding=embedding)
+        return retrieve, answer_with_context
+
+    import chromadb
+    from hybrid_search_chromadb_gpt_v2 import retrieve_for_query, answer_with_context
+    chroma_client = chromadb.PersistentClient(path=persist_directory)
+
+    def retrieve(question, embedding):
+        return retrieve_for_query(question, chroma_client, index_name, top_k, partition, section, rerank_results, tier,
+                                  query_embedding=embedding)
+    return retrieve, answer_with_context
+
+
+def run_batch(questions, retrieve, answer, max_concurrency, emit):
+    """Answers a batch of questions, passing each result to `emit` as it's ready (see answer_batch)."""
+    started = time.perf_counter()
+    unique, blank = {}, 0  # normalized question -> indexes asking it
+    for i, question in enumerate(questions):
+        if question.strip():
+            unique.setdefault(normalize_question(question), []).append(i)
+        else:
+            blank += 1
+            emit({"index": i, "query": question, "error": "Empty question.", "seconds": 0.0})
+    asked = [questions[indexes[0]] for indexes in unique.values()]
+    groups = list(unique.values())
+
+    with span("qa.batch", {"batch.questions": len(questions), "batch.unique_questions": len(asked),
+                           "batch.max_concurrency": max_concurrency}) as batch_span:
+        # ✅ One batched embedding call for every question
+        with span("embed.query", {"embedding.provider": "huggingface", "embedding.model": HF_EMBEDDING_MODEL,
+                                  "embedding.inputs": len(asked)}):
+            embeddings = get_hf_embeddings().embed_documents(asked)
+
+        # ✅ Vector searches in parallel; a failed search only fails its own question
+        def retrieve_one(position):
+            try:
+                return retrieve(asked[position], embeddings[position]), None
+            except Exception as e:
+                return None, e
+
+        with ThreadPoolExecutor(max_workers=min(BATCH_RETRIEVAL_WORKERS, len(asked))) as executor:
+            retrieved = list(executor.map(in_current_context(retrieve_one), range(len(asked))))
+
+        # ✅ Questions that retrieved the same chunks share one context
+        contexts = {}
+        for chunks, _ in retrieved:
+            if chunks:
+                key = tuple(sorted(chunk_id(chunk) for chunk in chunks))
+                if key not in contexts:
+                    contexts[key] = build_context(chunks)
+        built_contexts = [contexts[tuple(sorted(chunk_id(chunk) for chunk in chunks))] if chunks else None
+                          for chunks, _ in retrieved]
+
+        def answer_one(position):
+            return answer(asked[position], built_contexts[position])
+
+        def emit_results(position, **fields):
+            for i in groups[position]:
+                emit({"index": i, "query": questions[i], **fields, "seconds": round(time.perf_counter() - started, 3)})
+
+        # ✅ Answers without an LLM call first, then LLM calls with bounded concurrency, each streamed when done
+        pending = []
+        for position, (chunks, error) in enumerate(retrieved):
+            if error is not None:
+                emit_results(position, error=f"Retrieval failed: {error}")
+            elif not chunks:
+                emit_results(position, response=NO_RESULTS_ANSWER, citations=[])
+            else:
+                pending.append(position)
+
+        failed = 0
+        with ThreadPoolExecutor(max_workers=min(max_concurrency, len(pending) or 1)) as executor:
+            futures = {executor.submit(in_current_context(answer_one), position): position for position in pending}
+            for future in as_completed(futures):
+                position = futures[future]
+                try:
+                    response = future.result()
+                except Exception as e:
+                    failed += 1
+                    emit_results(position, error=f"Answer failed: {e}")
+                    continue
+                emit_results(position, response=response, citations=citations(built_contexts[position]["chunks"]))
+
+        summary = {"questions": len(questions), "unique_questions": len(asked), "contexts": len(contexts),
+                   "llm_calls": len(pending), "failed": blank + failed + sum(error is not None for _, error in retrieved)}
+        batch_span.set_attributes({f"batch.{key}": value for key, value in summary.items()})
+
+    seconds = time.perf_counter() - started
+    print(f"📝 Answered {len(questions)} questions in {seconds:.1f}s: {len(pending)} LLM calls, "
+          f"{len(contexts)} distinct contexts, {summary['failed']} failed")
+    emit({"done": True, **summary, "seconds": round(seconds, 3)})
+
+
+def answer_batch(questions, retrieve, answer, max_concurrency=BATCH_LLM_CONCURRENCY):
+    """
+    Starts answering a batch of questions and returns an iterator over the results as they arrive.
+    The batch runs in a background thread (in the caller's trace context), so it isn't held up by
+    a slow reader.
+
+    Args:
+        questions (list[str]): The questions, in the order the results' `index` refers to.
+        retrieve: `retrieve(question, query_embedding)` -> retrieved chunks (see store_pipeline).
+        answer: `answer(question, built_context)` -> answer text.
+        max_concurrency (int): Maximum LLM calls in flight.
+
+    Yields:
+        dict: `index`, `query`, `response`, `citations` and `seconds` (since the batch started) per
+        question, or `error` instead of a response when that question failed. Repeated questions
+        come out together. The last item is a summary with `done: true`.
+    """
+    results = queue.Queue()
+
+    def run():
+        try:
+            run_batch(questions, retrieve, answer, max_concurrency, results.put)
+        except Exception as e:
+            print(f"❌ Batch failed: {e}")
+            results.put({"done": True, "error": str(e)})
+
+    threading.Thread(target=in_current_context(run), daemon=True).start()
+
+    def stream():
+        while True:
+            result = results.get()
+            yield result
+            if result.get("done"):
+                return
+    return stream()
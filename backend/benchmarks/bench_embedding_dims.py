@@ -0,0 +1,96 @@
+"""
+Retrieval quality vs. memory/latency at each embedding dimension, on the filings question set.
+
+Every chunk and question is embedded once at the model's full size; each smaller size is
+derived by Matryoshka truncation + re-normalization, which is what the API's `dimensions`
+argument does for text-embedding-3 models. This makes real OpenAI embedding calls.
+
+Run from backend/:
+    python -m benchmarks.bench_embedding_dims --chunks-dir ./chunked_outputs --dims 256 512 1024 1536
+"""
+import argparse
+import time
+import numpy as np
+from embedding_models import EMBEDDING_MODELS, embed_texts, truncate_embedding
+from benchmarks.common import (
+    load_questions, load_chunked_corpus, relevant_ids, recall_at_k, reciprocal_rank,
+    mean, latency_summary, write_results
+)
+
+EMBED_BATCH_SIZE = 256
+
+
+def embed_all(texts, model):
+    vectors = []
+    for start in range(0, len(texts), EMBED_BATCH_SIZE):
+        vectors.extend(embed_texts(texts[start:start + EMBED_BATCH_SIZE], model=model))
+    return np.asarray(vectors, dtype=np.float32)
+
+
+def evaluate_dimension(chunk_matrix, question_matrix, corpus, questions, dim, k):
+    chunks = truncate_embedding(chunk_matrix, dim)
+    queries = truncate_embedding(question_matrix, dim)
+    ids = [chunk["id"] for chunk in corpus]
+
+    recalls, rrs, latencies = [], [], []
+    for question, query in zip(questions, queries):
+        start = time.perf_counter()
+        scores = chunks @ query
+        top = np.argsort(-scores)[:k]
+        latencies.append(time.perf_counter() - start)
+
+        ranked = [ids[i] for i in top]
+        relevant = relevant_ids(corpus, question)
+        recalls.append(recall_at_k(ranked, relevant, k))
+        rrs.append(reciprocal_rank(ranked, relevant) if relevant else None)
+
+    return {
+        "dim": dim,
+        f"recall_at_{k}": mean(recalls),
+        "mrr": mean(rrs),
+        "bytes_per_vector": dim * 4,
+        "corpus_mb": chunks.nbytes / 2**20,
+        "search_latency": latency_summary(latencies)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks-dir", required=True, help="Local copy of chunked_outputs/")
+    parser.add_argument("--model", default="text-embedding-3-small", choices=[m for m, s in EMBEDDING_MODELS.items() if s["matryoshka"]])
+    parser.add_argument("--dims", type=int, nargs="+", default=[256, 512, 1024, 1536])
+    parser.add_argument("-k", type=int, default=5)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    corpus = load_chunked_corpus(args.chunks_dir)
+    questions = load_questions()
+    if not corpus:
+        raise SystemExit(f"No chunks found under {args.chunks_dir}")
+
+    print(f"📐 Embedding {len(corpus)} chunks and {len(questions)} questions with {args.model}...")
+    chunk_matrix = embed_all([chunk["text"] for chunk in corpus], args.model)
+    question_matrix = embed_all([q["question"] for q in questions], args.model)
+
+    full_dim = EMBEDDING_MODELS[args.model]["dim"]
+    results = []
+    for dim in sorted(set(args.dims)):
+        if dim > full_dim:
+            print(f"⚠️ Skipping {dim}: {args.model} returns at most {full_dim} dims")
+            continue
+        result = evaluate_dimension(chunk_matrix, question_matrix, corpus, questions, dim, args.k)
+        results.append(result)
+        print(f"  dim={dim:5d}  recall@{args.k}={result[f'recall_at_{args.k}']}  mrr={result['mrr']}  "
+              f"memory={result['corpus_mb']:.2f} MB  p50={result['search_latency']['p50_ms']:.3f} ms")
+
+    write_results("embedding_dims", {
+        "model": args.model,
+        "k": args.k,
+        "chunks": len(corpus),
+        "questions": len(questions),
+        "results": results
+    }, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+"""
+Ingestion throughput per stage (parse, chunk, embed) on a directory of PDFs, without GCS.
+
+Stages:
+  parse_pymupdf  pdf_parser.pdf_to_markdown                                  pages/sec
+  parse_docling  new_docling.process_pdf                                     pages/sec
+  parse_mistral  mistral_ocr_local.process_pdf_mistral, OCR client mocked    pages/sec
+  chunk          every strategy in chunking.CHUNKING_STRATEGIES              chunks/sec, tokens/sec
+  embed_hf       all-MiniLM-L6-v2, as the Pinecone/ChromaDB indexers use it  embeddings/sec
+  embed_openai   embedding_models.embed_chunks, embeddings API mocked        embeddings/sec, requests
+
+Each stage runs in a fresh process, so the peak RSS reported is that stage's own. Storage is swapped
+for local disk (STORAGE_BACKEND=local); every stage writes under its own folder of --storage-dir.
+The chunk and embed stages read the Markdown written by parse_pymupdf (or --markdown-dir).
+The mocked OCR returns the PyMuPDF text of each page and the mocked embeddings API returns hashing
+vectors, so those stages measure this code's own overhead; add --ocr-latency-ms / --openai-latency-ms
+to simulate the services. Model load time is reported separately from throughput.
+
+Run from backend/:
+    python -m benchmarks.bench_ingestion --pdf-dir ./pdfs --stages parse_pymupdf chunk embed_hf
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import resource
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+# Every stage reads and writes local disk instead of GCS (set before anything imports gcs_utils)
+os.environ["STORAGE_BACKEND"] = "local"
+os.environ.setdefault("OPENAI_API_KEY", "offline-benchmark")
+
+from chunking import CHUNKING_STRATEGIES
+from benchmarks.common import load_markdown_corpus, write_results
+
+STAGES = ("parse_pymupdf", "parse_docling", "parse_mistral", "chunk", "embed_hf", "embed_openai")
+
+
+class PDFUpload:
+    """The parts of FastAPI's UploadFile that pdf_parser.pdf_to_markdown reads."""
+
+    def __init__(self, data, filename):
+        self.data = data
+        self.filename = filename
+
+    async def read(self):
+        return self.data
+
+
+def list_pdfs(pdf_dir):
+    return sorted(path for path in Path(pdf_dir).rglob("*") if path.suffix.lower() == ".pdf")
+
+
+def page_texts(path):
+    """Plain text of every page, via PyMuPDF (also used as the mocked OCR output)."""
+    import fitz
+    with fitz.open(path) as doc:
+        return [page.get_text("text") for page in doc]
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # KiB on Linux
+
+
+def throughput(count, seconds):
+    return round(count / seconds, 2) if seconds else None
+
+
+def parse_pymupdf(options):
+    from pdf_parser import pdf_to_markdown
+    pdfs = list_pdfs(options["pdf_dir"])
+    pages = sum(len(page_texts(path)) for path in pdfs)
+
+    start = time.perf_counter()
+    for path in pdfs:
+        asyncio.run(pdf_to_markdown(PDFUpload(path.read_bytes(), str(path.relative_to(options["pdf_dir"])))))
+    seconds = time.perf_counter() - start
+    return {"documents": len(pdfs), "pages": pages, "seconds": round(seconds, 3), "pages_per_sec": throughput(pages, seconds)}
+
+
+def parse_docling(options):
+    from new_docling import process_pdf
+    pdfs = list_pdfs(options["pdf_dir"])
+    pages = sum(len(page_texts(path)) for path in pdfs)
+
+    failed = 0
+    with tempfile.TemporaryDirectory() as output_dir:
+        start = time.perf_counter()
+        for path in pdfs:
+            failed += process_pdf(str(path), output_dir) is None
+        seconds = time.perf_counter() - start
+    return {"documents": len(pdfs), "failed": failed, "pages": pages, "seconds": round(seconds, 3),
+            "pages_per_sec": throughput(pages, seconds)}
+
+
+def parse_mistral(options):
+    os.environ.setdefault("MISTRAL_API_KEY", "offline-benchmark")
+    import mistral_ocr_local
+    from benchmarks.standins import MockOCRClient
+    pdfs = list_pdfs(options["pdf_dir"])
+    pages_by_url = {path.resolve().as_uri(): page_texts(path) for path in pdfs}
+    mistral_ocr_local.client = MockOCRClient(pages_by_url, options["ocr_latency_ms"] / 1000)
+    pages = sum(len(page_list) for page_list in pages_by_url.values())
+
+    start = time.perf_counter()
+    for url in pages_by_url:
+        mistral_ocr_local.process_pdf_mistral(url)
+    seconds = time.perf_counter() - start
+    return {"documents": len(pdfs), "pages": pages, "seconds": round(seconds, 3), "pages_per_sec": throughput(pages, seconds),
+            "ocr_latency_ms_per_page": options["ocr_latency_ms"]}
+
+
+def chunk(options):
+    from chunking import chunk_text, TokenizedText, get_tokenizer
+    documents = load_markdown_corpus(options["markdown_dir"])
+    get_tokenizer()
+    if "semantic" in options["strategies"]:
+        from embedding_models import embed_sentences
+        embed_sentences(["warm up"])  # Load the model before timing
+
+    tokens = sum(len(TokenizedText(text)) for text in documents.values())
+    strategies = []
+    for strategy in options["strategies"]:
+        chunks = 0
+        start = time.perf_counter()
+        try:
+            for text in documents.values():
+                chunks += len(chunk_text(text, strategy))
+        except Exception as e:
+            strategies.append({"strategy": strategy, "error": str(e)})
+            continue
+        seconds = time.perf_counter() - start
+        strategies.append({"strategy": strategy, "chunks": chunks, "seconds": round(seconds, 3),
+                           "chunks_per_sec": throughput(chunks, seconds), "tokens_per_sec": throughput(tokens, seconds)})
+    return {"documents": len(documents), "tokens": tokens, "strategies": strategies}
+
+
+def embedding_inputs(options):
+    """Chunk records of the Markdown corpus, chunked with --embed-strategy (not timed)."""
+    from chunking import chunk_text
+    documents = load_markdown_corpus(options["markdown_dir"])
+    return [record for text in documents.values() for record in chunk_text(text, options["embed_strategy"])]
+
+
+def embed_hf(options):
+    from embedding_models import get_hf_embeddings, chunk_content
+    texts = [chunk_content(record) for record in embedding_inputs(options)]
+
+    start = time.perf_counter()
+    embeddings = get_hf_embeddings()
+    embeddings.embed_documents(["warm up"])
+    load_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    embeddings.embed_documents(texts)
+    seconds = time.perf_counter() - start
+    return {"chunks": len(texts), "load_seconds": round(load_seconds, 3), "seconds": round(seconds, 3),
+            "embeddings_per_sec": throughput(len(texts), seconds)}
+
+
+def embed_openai(options):
+    import embedding_models
+    from benchmarks.standins import MockEmbeddingsAPI
+    records = embedding_inputs(options)
+    model, dim = embedding_models.resolve_embedding_config(options["openai_model"])
+    api = MockEmbeddingsAPI({name: spec["dim"] for name, spec in embedding_models.EMBEDDING_MODELS.items()},
+                            options["openai_latency_ms"] / 1000)
+    embedding_models.openai.embeddings = api
+
+    start = time.perf_counter()
+    embedding_models.embed_chunks(records, model=model)
+    seconds = time.perf_counter() - start
+    return {"chunks": len(records), "model": model, "dim": dim, "requests": api.requests, "seconds": round(seconds, 3),
+            "embeddings_per_sec": throughput(len(records), seconds), "api_latency_ms_per_request": options["openai_latency_ms"]}
+
+
+def run_stage(stage, options):
+    """Runs in a fresh worker process (whose LOCAL_STORAGE_DIR is the stage's own folder)."""
+    result = {"stage": stage}
+    try:
+        result.update(globals()[stage](options))
+    except ImportError as e:
+        result["skipped"] = str(e)
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["peak_rss_mb"] = round(peak_rss_mb(), 1)
+    return result
+
+
+def summary_line(result):
+    if "skipped" in result:
+        return f"⚠️ {result['stage']}: skipped ({result['skipped']})"
+    if "error" in result:
+        return f"❌ {result['stage']}: {result['error']}"
+    if result["stage"] == "chunk":
+        rates = ", ".join(f"{s['strategy']}={s.get('chunks_per_sec', 'error')}" for s in result["strategies"])
+        return f"✅ chunk: chunks/sec {rates}  peak RSS {result['peak_rss_mb']} MB"
+    rate = f"{result['pages_per_sec']} pages/sec" if "pages_per_sec" in result else f"{result['embeddings_per_sec']} embeddings/sec"
+    return f"✅ {result['stage']}: {rate}  peak RSS {result['peak_rss_mb']} MB"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pdf-dir", required=True, help="Directory of PDFs (searched recursively)")
+    parser.add_argument("--stages", nargs="+", default=list(STAGES), choices=STAGES)
+    parser.add_argument("--strategies", nargs="+", default=list(CHUNKING_STRATEGIES), choices=list(CHUNKING_STRATEGIES))
+    parser.add_argument("--embed-strategy", default="fixed", choices=list(CHUNKING_STRATEGIES),
+                        help="Chunking used to produce the embedding stages' inputs")
+    parser.add_argument("--markdown-dir", default=None, help="Markdown for the chunk/embed stages (default: parse_pymupdf's output)")
+    parser.add_argument("--storage-dir", default=None, help="Local storage root (default: a temporary directory)")
+    parser.add_argument("--openai-model", default=None)
+    parser.add_argument("--ocr-latency-ms", type=float, default=0.0, help="Simulated OCR latency per page")
+    parser.add_argument("--openai-latency-ms", type=float, default=0.0, help="Simulated embeddings API latency per request")
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    pdfs = list_pdfs(args.pdf_dir)
+    if not pdfs:
+        raise SystemExit(f"No PDFs found under {args.pdf_dir}")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        storage_dir = os.path.abspath(args.storage_dir or temp_dir)
+        options = {
+            "pdf_dir": os.path.abspath(args.pdf_dir),
+            "storage_dir": storage_dir,
+            "markdown_dir": args.markdown_dir or os.path.join(storage_dir, "parse_pymupdf", "outputs"),
+            "strategies": args.strategies,
+            "embed_strategy": args.embed_strategy,
+            "openai_model": args.openai_model,
+            "ocr_latency_ms": args.ocr_latency_ms,
+            "openai_latency_ms": args.openai_latency_ms
+        }
+        print(f"📐 {len(pdfs)} PDFs, storage under {storage_dir}")
+
+        # Parsing first, so the chunk and embed stages find parse_pymupdf's Markdown
+        results = []
+        for stage in sorted(args.stages, key=STAGES.index):
+            if stage in ("chunk", "embed_hf", "embed_openai") and not load_markdown_corpus(options["markdown_dir"]):
+                results.append({"stage": stage, "skipped": f"no Markdown under {options['markdown_dir']} (run parse_pymupdf or pass --markdown-dir)"})
+                print(summary_line(results[-1]))
+                continue
+            # One fresh process per stage: imports, models and peak RSS don't carry over between stages.
+            # Spawned workers inherit the environment, so this points the stage's gcs_utils at its own folder.
+            os.environ["LOCAL_STORAGE_DIR"] = os.path.join(storage_dir, stage)
+            with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+                results.append(executor.submit(run_stage, stage, options).result())
+            print(summary_line(results[-1]))
+
+    write_results("ingestion", {
+        "pdfs": len(pdfs),
+        "strategies": args.strategies,
+        "embed_strategy": args.embed_strategy,
+        "results": results
+    }, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+"""
+Retrieval quality and speed of the three RAG pipelines, per chunking strategy, fully offline.
+
+For every chunking strategy the parsed filings are chunked and embedded once, then indexed into:
+  manual    embedding artifacts searched by search.search_from_content (matrix cosine)
+  pinecone  Pinecone_v2.upsert_embedded_chunks → hybrid_search_pinecone_gpt_v2.retrieve_pinecone,
+            against an in-memory Pinecone stand-in
+  chroma    chromadb_v2.upsert_embedded_chunks_chromadb → hybrid_search_chromadb_gpt_v2.retrieve_chromadb,
+            against an in-memory chromadb client
+Only retrieval is measured (no LLM calls). Each question in filings_questions.json is run through
+every pipeline; recall@k, MRR and p50/p95/p99 latency / QPS are written to benchmarks/results/retrieval.json.
+
+With --rerank each pipeline retrieves --rerank-candidates chunks and the cross-encoder (reranker.py,
+RERANK_MODEL, downloaded on first use) keeps the top k; its added latency is reported separately
+as rerank_latency, and recall/MRR are those of the re-ranked list.
+
+Embeddings come from the hashing stand-in by default (lexical, no downloads); --embedder minilm uses
+the local all-MiniLM-L6-v2 model instead, if it is already cached.
+
+Run from backend/:
+    python -m benchmarks.bench_retrieval --markdown-dir ./outputs --strategies fixed sentence markdown -k 5
+    python -m benchmarks.bench_retrieval --markdown-dir ./outputs --rerank --rerank-candidates 50 -k 5
+"""
+import argparse
+import contextlib
+import os
+import time
+from collections import defaultdict
+
+# The hybrid modules build their OpenAI client on import; it is never called here (retrieval only)
+os.environ.setdefault("OPENAI_API_KEY", "offline-benchmark")
+
+from chunking import chunk_text, chunked_blob_name, CHUNKING_STRATEGIES
+from embedding_models import chunk_content
+from reranker import RERANK_MODEL
+from partitions import partition_from_path
+from benchmarks.common import (
+    load_questions, load_markdown_corpus, relevant_ids, recall_at_k, reciprocal_rank,
+    mean, latency_summary, write_results
+)
+from benchmarks.standins import HashingEmbeddings, InMemoryPineconeIndex
+
+PIPELINES = ("manual", "pinecone", "chroma")
+DEFAULT_STRATEGIES = ["fixed", "sentence", "recursive", "markdown"]
+
+
+@contextlib.contextmanager
+def quiet():
+    """The retrieval functions log every search; keep that out of the benchmark output."""
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+def build_corpus(documents, strategy, chunk_size):
+    """Chunks every document; returns the corpus (one entry per chunk) and the chunks grouped by source path."""
+    corpus, by_source = [], defaultdict(list)
+    for path, text in documents.items():
+        source = chunked_blob_name(f"chunked_outputs/{path}")  # The path /fetch_file/ would write
+        for i, chunk in enumerate(chunk_text(text, strategy, chunk_size)):
+            entry = {"id": f"{source}#{i}", "text": chunk_content(chunk), "source": source,
+                     "partition": partition_from_path(source), "chunk": chunk}
+            corpus.append(entry)
+            by_source[source].append(entry)
+    return corpus, by_source
+
+
+class ManualPipeline:
+    """Embedding artifacts (as gen_embedding writes them) searched in one matrix product by search.py."""
+
+    def __init__(self, by_source, vectors, embedder):
+        from gen_embedding import build_embedding_item, quarter_from_filename
+        from search import search_from_content
+        self.search_from_content = search_from_content
+        self.embedder = embedder
+        self.items = [
+            build_embedding_item(entry["chunk"], source, quarter_from_filename(source), i, vectors[entry["id"]],
+                                 "offline-standin", len(vectors[entry["id"]]))
+            for source, entries in by_source.items() for i, entry in enumerate(entries)
+        ]
+
+    def search(self, query, k):
+        results = self.search_from_content(self.items, query, top_n=k, query_embedding=self.embedder.embed_query(query))
+        return [{**result, "text": result["chunk"], "score": result["similarity"], "source": result["filename"]} for result in results]
+
+
+class PineconePipeline:
+    def __init__(self, by_source, vectors, embedder):
+        from Pinecone_v2 import upsert_embedded_chunks
+        from hybrid_search_pinecone_gpt_v2 import retrieve_pinecone
+        self.retrieve = retrieve_pinecone
+        self.index = InMemoryPineconeIndex()
+        self.embedder = embedder
+        for source, entries in by_source.items():
+            upsert_embedded_chunks([entry["chunk"] for entry in entries], [vectors[entry["id"]] for entry in entries],
+                                   source_path=source, index=self.index)
+
+    def search(self, query, k):
+        return self.retrieve(query, self.index, self.embedder, top_k=k)
+
+
+class ChromaPipeline:
+    def __init__(self, by_source, vectors, embedder, collection_name):
+        import chromadb
+        from chromadb_v2 import upsert_embedded_chunks_chromadb
+        from hybrid_search_chromadb_gpt_v2 import retrieve_chromadb
+        self.retrieve = retrieve_chromadb
+        self.client = chromadb.EphemeralClient()
+        self.embedder = embedder
+        self.collection_name = collection_name
+        for source, entries in by_source.items():
+            upsert_embedded_chunks_chromadb([entry["chunk"] for entry in entries], [vectors[entry["id"]] for entry in entries],
+                                            collection_name=collection_name, source_path=source, chroma_client=self.client)
+
+    def search(self, query, k):
+        return self.retrieve(query, self.client, self.embedder, collection_name=self.collection_name, top_k=k)
+
+
+def build_pipeline(name, by_source, vectors, embedder, strategy):
+    if name == "manual":
+        return ManualPipeline(by_source, vectors, embedder)
+    if name == "pinecone":
+        return PineconePipeline(by_source, vectors, embedder)
+    return ChromaPipeline(by_source, vectors, embedder, collection_name=f"bench-{strategy}")
+
+
+def evaluate(pipeline, corpus, questions, k, rerank_candidates=None, rerank_budget_ms=None):
+    """Recall/MRR/latency of one pipeline; with `rerank_candidates`, of its re-ranked results."""
+    ids = {(entry["source"], entry["text"]): entry["id"] for entry in corpus}
+    recalls, rrs, latencies, rerank_latencies = [], [], [], []
+    if rerank_candidates:
+        import reranker
+        reranker.clear_cache()  # Scores cached by another pipeline would hide the rerank cost
+    for question in questions:
+        start = time.perf_counter()
+        with quiet():
+            hits = pipeline.search(question["question"], max(k, rerank_candidates or 0))
+        latencies.append(time.perf_counter() - start)
+
+        if rerank_candidates:
+            start = time.perf_counter()
+            with quiet():
+                hits = reranker.rerank(question["question"], hits, top_n=k, latency_budget_ms=rerank_budget_ms)
+            rerank_latencies.append(time.perf_counter() - start)
+
+        ranked = [ids.get((hit.get("source"), hit["text"])) for hit in hits[:k]]
+        relevant = relevant_ids(corpus, question)
+        recalls.append(recall_at_k(ranked, relevant, k))
+        rrs.append(reciprocal_rank(ranked, relevant) if relevant else None)
+
+    result = {
+        f"recall_at_{k}": mean(recalls),
+        "mrr": mean(rrs),
+        "answerable_questions": sum(r is not None for r in recalls),
+        "latency": latency_summary(latencies)
+    }
+    if rerank_candidates:
+        result["rerank_latency"] = latency_summary(rerank_latencies)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--markdown-dir", required=True, help="Local copy of outputs/ (parsed Markdown)")
+    parser.add_argument("--strategies", nargs="+", default=DEFAULT_STRATEGIES, choices=list(CHUNKING_STRATEGIES))
+    parser.add_argument("--pipelines", nargs="+", default=list(PIPELINES), choices=PIPELINES)
+    parser.add_argument("--chunk-size", type=int, default=None, help="Default: each strategy's own")
+    parser.add_argument("--embedder", default="hashing", choices=["hashing", "minilm"])
+    parser.add_argument("-k", type=int, default=5)
+    parser.add_argument("--rerank", action="store_true", help="Re-rank a wider candidate set with the cross-encoder")
+    parser.add_argument("--rerank-candidates", type=int, default=50)
+    parser.add_argument("--rerank-budget-ms", type=float, default=0, help="Rerank latency budget (default: none)")
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    documents = load_markdown_corpus(args.markdown_dir)
+    questions = load_questions()
+    if not documents:
+        raise SystemExit(f"No Markdown files found under {args.markdown_dir}")
+
+    if args.rerank:
+        from reranker import get_cross_encoder
+        get_cross_encoder()  # Load before timing
+
+    if args.embedder == "minilm":
+        from embedding_models import get_hf_embeddings
+        embedder = get_hf_embeddings()
+    else:
+        embedder = HashingEmbeddings()
+
+    results = []
+    for strategy in args.strategies:
+        corpus, by_source = build_corpus(documents, strategy, args.chunk_size)
+        start = time.perf_counter()
+        vectors = dict(zip([entry["id"] for entry in corpus], embedder.embed_documents([entry["text"] for entry in corpus])))
+        embed_seconds = time.perf_counter() - start
+        print(f"📐 {strategy}: {len(corpus)} chunks from {len(documents)} documents (embedded in {embed_seconds:.1f}s)")
+
+        for name in args.pipelines:
+            start = time.perf_counter()
+            try:
+                with quiet():
+                    pipeline = build_pipeline(name, by_source, vectors, embedder, strategy)
+            except ImportError as e:
+                print(f"⚠️ Skipping {name}: {e}")
+                results.append({"pipeline": name, "strategy": strategy, "skipped": str(e)})
+                continue
+            index_seconds = time.perf_counter() - start
+
+            result = {"pipeline": name, "strategy": strategy, "chunks": len(corpus),
+                      "index_seconds": round(index_seconds, 3),
+                      **evaluate(pipeline, corpus, questions, args.k, args.rerank_candidates if args.rerank else None,
+                                 args.rerank_budget_ms)}
+            results.append(result)
+            rerank_note = f"  rerank p50={result['rerank_latency'].get('p50_ms', 0):.2f} ms" if args.rerank else ""
+            print(f"  {name:9s} recall@{args.k}={result[f'recall_at_{args.k}']}  mrr={result['mrr']}  "
+                  f"p50={result['latency'].get('p50_ms', 0):.2f} ms  p95={result['latency'].get('p95_ms', 0):.2f} ms  "
+                  f"qps={result['latency'].get('qps')}{rerank_note}")
+
+    write_results("retrieval", {
+        "embedder": args.embedder,
+        "k": args.k,
+        "rerank": {"model": RERANK_MODEL, "candidates": args.rerank_candidates, "budget_ms": args.rerank_budget_ms} if args.rerank else None,
+        "chunk_size": args.chunk_size,
+        "documents": len(documents),
+        "questions": len(questions),
+        "results": results
+    }, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Semantic chunking throughput on CPU, on the parsed filings.
+
+Measures sentence embedding throughput (sentences/sec) at several batch sizes with the local
+all-MiniLM-L6-v2 model, then runs the "semantic" chunker end to end and reports sentences/sec,
+chunks produced and their token sizes. The first (untimed) document warms the model up.
+No API calls are made.
+
+Run from backend/:
+    python -m benchmarks.bench_semantic_chunking --markdown-dir ./outputs --batch-sizes 32 64 128 256
+"""
+import argparse
+import time
+import numpy as np
+from chunking import TokenizedText, sentence_spans, chunk_semantic, adjacent_distances
+from embedding_models import embed_sentences, get_hf_embeddings
+from benchmarks.common import load_markdown_corpus, write_results
+
+
+def document_sentences(documents):
+    """Tokenizes each document once and splits it into sentences."""
+    prepared = []
+    for path, text in documents.items():
+        doc = TokenizedText(text)
+        prepared.append((path, doc, [text[start:end] for start, end in sentence_spans(text)]))
+    return prepared
+
+
+def bench_batch_size(prepared, batch_size):
+    sentences = [sentence for _, _, doc_sentences in prepared for sentence in doc_sentences]
+    start = time.perf_counter()
+    embeddings = embed_sentences(sentences, batch_size=batch_size)
+    embed_seconds = time.perf_counter() - start
+
+    # Adjacent-sentence distances for every document, vectorized per document
+    start = time.perf_counter()
+    offset = 0
+    for _, _, doc_sentences in prepared:
+        adjacent_distances(embeddings[offset:offset + len(doc_sentences)])
+        offset += len(doc_sentences)
+    distance_seconds = time.perf_counter() - start
+
+    return {
+        "batch_size": batch_size,
+        "sentences": len(sentences),
+        "embed_seconds": round(embed_seconds, 3),
+        "sentences_per_sec": round(len(sentences) / embed_seconds, 1) if embed_seconds else None,
+        "distance_ms": round(distance_seconds * 1000, 3)
+    }
+
+
+def bench_end_to_end(prepared, max_tokens, batch_size):
+    sentences, token_counts = 0, []
+    start = time.perf_counter()
+    for _, doc, doc_sentences in prepared:
+        chunks = chunk_semantic(doc, max_tokens=max_tokens, batch_size=batch_size)
+        sentences += len(doc_sentences)
+        token_counts.extend(chunk["token_count"] for chunk in chunks)
+    elapsed = time.perf_counter() - start
+
+    return {
+        "max_tokens": max_tokens,
+        "batch_size": batch_size,
+        "seconds": round(elapsed, 3),
+        "sentences_per_sec": round(sentences / elapsed, 1) if elapsed else None,
+        "chunks": len(token_counts),
+        "chunk_tokens": {
+            "mean": float(np.mean(token_counts)) if token_counts else None,
+            "p50": float(np.percentile(token_counts, 50)) if token_counts else None,
+            "max": int(max(token_counts)) if token_counts else None
+        }
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--markdown-dir", required=True, help="Local copy of outputs/ (parsed Markdown)")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[32, 64, 128, 256])
+    parser.add_argument("--max-tokens", type=int, default=512)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    documents = load_markdown_corpus(args.markdown_dir)
+    if not documents:
+        raise SystemExit(f"No Markdown files found under {args.markdown_dir}")
+
+    prepared = document_sentences(documents)
+    print(f"📐 {len(prepared)} documents, {sum(len(s) for _, _, s in prepared)} sentences")
+
+    # Load the model and run one forward pass before timing anything
+    get_hf_embeddings()
+    embed_sentences(prepared[0][2][:64])
+
+    batch_results = []
+    for batch_size in args.batch_sizes:
+        result = bench_batch_size(prepared, batch_size)
+        batch_results.append(result)
+        print(f"  batch={batch_size:4d}  {result['sentences_per_sec']} sentences/sec  distances={result['distance_ms']} ms")
+
+    best = max(batch_results, key=lambda r: r["sentences_per_sec"] or 0)["batch_size"]
+    end_to_end = bench_end_to_end(prepared, args.max_tokens, best)
+    print(f"  semantic chunking (batch={best}): {end_to_end['sentences_per_sec']} sentences/sec, "
+          f"{end_to_end['chunks']} chunks, mean {end_to_end['chunk_tokens']['mean']} tokens")
+
+    write_results("semantic_chunking", {
+        "documents": len(prepared),
+        "batch_sizes": batch_results,
+        "end_to_end": end_to_end
+    }, args.output)
+
+
+if __name__ == "__main__":
+    main()
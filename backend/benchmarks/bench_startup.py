@@ -0,0 +1,124 @@
+"""
+Import-time cost of the backend, with the network blocked.
+
+Each module is imported in a fresh interpreter with every socket connection and DNS lookup
+blocked and recorded. The benchmark fails (exit code 1) if importing anything tries to reach
+the network. With --first-use it also chunks a sample document after the import, still offline,
+which only succeeds when punkt and the tiktoken BPE file are available locally
+(NLTK_DATA / TIKTOKEN_CACHE_DIR, as baked into the Docker image).
+
+Run from backend/:
+    python -m benchmarks.bench_startup --modules chunking main --first-use
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from benchmarks.common import write_results
+
+DEFAULT_MODULES = ["chunking", "main"]
+SAMPLE_TEXT = "NVIDIA reported record revenue. Data Center revenue grew strongly. " * 50
+# Modules whose presence after import means a heavy dependency was loaded eagerly
+WATCHED_MODULES = ["nltk", "tiktoken", "langchain", "torch", "sentence_transformers"]
+
+
+def describe(error):
+    """One-line description of an exception (nltk's LookupError messages span a dozen lines)."""
+    return f"{type(error).__name__}: {' '.join(str(error).split())[:300]}"
+
+
+def block_network(attempts):
+    """Replaces socket connects and DNS lookups with stubs that record the target and raise."""
+    def blocked(kind):
+        def stub(*args, **kwargs):
+            target = args[1] if kind == "connect" and len(args) > 1 else args[0] if args else None
+            attempts.append({"call": kind, "target": repr(target)})
+            raise OSError(f"network blocked by bench_startup ({kind} {target!r})")
+        return stub
+
+    socket.socket.connect = blocked("connect")
+    socket.socket.connect_ex = blocked("connect")
+    socket.create_connection = blocked("create_connection")
+    socket.getaddrinfo = blocked("getaddrinfo")
+
+
+def child(module, first_use):
+    """Runs inside the fresh interpreter: imports `module` offline and prints one JSON result line."""
+    attempts = []
+    block_network(attempts)
+    result = {"module": module}
+
+    start = time.perf_counter()
+    try:
+        __import__(module)
+        result["import_seconds"] = round(time.perf_counter() - start, 3)
+    except BaseException as e:  # Report anything, including SystemExit raised by the module
+        result["import_seconds"] = round(time.perf_counter() - start, 3)
+        result["error"] = describe(e)
+    result["network_attempts_on_import"] = list(attempts)
+    result["loaded_on_import"] = [name for name in WATCHED_MODULES if name in sys.modules]
+
+    if first_use and "error" not in result:
+        from chunking import chunk_text
+        before = len(attempts)
+        start = time.perf_counter()
+        try:
+            for strategy in ("fixed", "sentence"):
+                chunk_text(SAMPLE_TEXT, strategy)
+        except BaseException as e:
+            result["first_use_error"] = describe(e)
+        result["first_use_seconds"] = round(time.perf_counter() - start, 3)
+        result["network_attempts_on_first_use"] = attempts[before:]
+
+    print(json.dumps(result))
+
+
+def run_module(module, first_use):
+    command = [sys.executable, "-m", "benchmarks.bench_startup", "--child", module]
+    if first_use:
+        command.append("--first-use")
+    completed = subprocess.run(command, capture_output=True, text=True, cwd=os.getcwd())
+    lines = [line for line in completed.stdout.splitlines() if line.startswith("{")]
+    if not lines:
+        return {"module": module, "error": f"child exited with {completed.returncode}: {completed.stderr.strip()[-500:]}"}
+    return json.loads(lines[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modules", nargs="+", default=DEFAULT_MODULES)
+    parser.add_argument("--first-use", action="store_true", help="Also chunk a sample document offline after importing")
+    parser.add_argument("--child", default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child, args.first_use)
+        return
+
+    results = [run_module(module, args.first_use) for module in args.modules]
+    offline = True
+    for result in results:
+        attempts = result.get("network_attempts_on_import", [])
+        offline = offline and not attempts and "error" not in result
+        status = "❌" if attempts or "error" in result else "✅"
+        print(f"{status} import {result['module']}: {result.get('import_seconds')}s, "
+              f"{len(attempts)} network attempts, eager: {result.get('loaded_on_import')}")
+        if "error" in result:
+            print(f"   {result['error']}")
+        if args.first_use and "first_use_seconds" in result:
+            first_use_attempts = result.get("network_attempts_on_first_use", [])
+            offline = offline and not first_use_attempts and "first_use_error" not in result
+            print(f"   first use: {result['first_use_seconds']}s, {len(first_use_attempts)} network attempts"
+                  + (f" ({result['first_use_error']})" if "first_use_error" in result else ""))
+
+    write_results("startup", {"offline": offline, "results": results}, args.output)
+    if not offline:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+import json
+import os
+import subprocess
+import time
+from datetime import datetime, timezone
+import numpy as np
+from partitions import partition_from_path
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+QUESTIONS_PATH = os.path.join(BENCHMARKS_DIR, "filings_questions.json")
+RESULTS_DIR = os.path.join(BENCHMARKS_DIR, "results")
+
+
+def load_questions(path=QUESTIONS_PATH):
+    """Loads the labeled filings question set."""
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)["questions"]
+
+
+def load_chunked_corpus(chunks_dir):
+    """
+    Loads every chunked JSON file (the `chunked_outputs/` layout written by chunking.py) under a
+    local directory. Returns one dict per chunk with a stable id, its text, source file and partition.
+    """
+    corpus = []
+    for root, _, files in os.walk(chunks_dir):
+        for name in sorted(files):
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(root, name)
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            source = os.path.relpath(path, chunks_dir)
+            for i, chunk in enumerate(data.get("chunks", [])):
+                text = chunk.get("content", "") if isinstance(chunk, dict) else chunk
+                if text:
+                    corpus.append({
+                        "id": f"{source}#{i}",
+                        "text": text,
+                        "source": source,
+                        "partition": partition_from_path(source)
+                    })
+    return corpus
+
+
+def load_markdown_corpus(markdown_dir):
+    """Loads every parsed Markdown document (the `outputs/` layout) under a local directory as {path: text}."""
+    documents = {}
+    for root, _, files in os.walk(markdown_dir):
+        for name in sorted(files):
+            if name.endswith(".md"):
+                path = os.path.join(root, name)
+                with open(path, encoding="utf-8") as f:
+                    documents[os.path.relpath(path, markdown_dir)] = f.read()
+    return documents
+
+
+def is_relevant(chunk, question):
+    """A chunk is relevant if it contains every labeled term and (when labeled) comes from the question's partition."""
+    text = chunk["text"].lower()
+    if not all(term.lower() in text for term in question["relevant_terms"]):
+        return False
+    wanted = question.get("partition")
+    return not wanted or not chunk.get("partition") or chunk["partition"] == wanted
+
+
+def relevant_ids(corpus, question):
+    return {chunk["id"] for chunk in corpus if is_relevant(chunk, question)}
+
+
+def recall_at_k(ranked_ids, relevant, k):
+    """Fraction of the relevant set found in the top k (capped by k so a large relevant set can still reach 1.0)."""
+    if not relevant:
+        return None
+    hits = len(set(ranked_ids[:k]) & relevant)
+    return hits / min(len(relevant), k)
+
+
+def reciprocal_rank(ranked_ids, relevant):
+    for rank, chunk_id in enumerate(ranked_ids, start=1):
+        if chunk_id in relevant:
+            return 1.0 / rank
+    return 0.0
+
+
+def mean(values):
+    values = [v for v in values if v is not None]
+    return float(np.mean(values)) if values else None
+
+
+def latency_summary(seconds):
+    """p50/p95/p99/mean latency in milliseconds plus queries per second for a list of per-query timings."""
+    if not seconds:
+        return {}
+    ms = np.asarray(seconds) * 1000
+    return {
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p95_ms": float(np.percentile(ms, 95)),
+        "p99_ms": float(np.percentile(ms, 99)),
+        "mean_ms": float(ms.mean()),
+        "qps": float(len(ms) / (ms.sum() / 1000)) if ms.sum() else None
+    }
+
+
+def timed(fn, *args, **kwargs):
+    """Runs fn and returns (result, elapsed seconds)."""
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=BENCHMARKS_DIR, text=True).strip()
+    except Exception:
+        return None
+
+
+def write_results(name, payload, output=None):
+    """Writes a benchmark result JSON (stamped with time and git commit) so runs can be diffed between commits."""
+    output = output or os.path.join(RESULTS_DIR, f"{name}.json")
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    payload = {
+        "benchmark": name,
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        **payload
+    }
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(payload, f, indent=4, sort_keys=True)
+    print(f"✅ Results written to {output}")
+    return output
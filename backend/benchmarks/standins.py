@@ -0,0 +1,134 @@
+"""
+Offline stand-ins for the hosted services, so benchmarks run without network access or API keys.
+
+HashingEmbeddings replaces OpenAI / MiniLM embeddings, InMemoryPineconeIndex a Pinecone index,
+MockOCRClient the Mistral OCR client and MockEmbeddingsAPI `openai.embeddings`. Each implements just
+the methods the backend code calls. Scores from the hashing embedder are lexical, not semantic:
+compare pipelines and chunking strategies with it, not absolute quality.
+"""
+import re
+import time
+import zlib
+from types import SimpleNamespace
+import numpy as np
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+class HashingEmbeddings:
+    """Hashed unigram + bigram counts, L2-normalized. Deterministic across processes, nothing to download."""
+
+    def __init__(self, dim=384):
+        self.dim = dim
+
+    def _embed(self, text):
+        vector = np.zeros(self.dim, dtype=np.float32)
+        tokens = TOKEN_PATTERN.findall(text.lower())
+        for feature in tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]:
+            bucket = zlib.crc32(feature.encode("utf-8"))
+            vector[bucket % self.dim] += 1.0 if bucket & 0x80000000 else -1.0  # Signed hashing keeps collisions unbiased
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def embed_query(self, text):
+        return self._embed(text).tolist()
+
+    def embed_documents(self, texts):
+        return [self._embed(text).tolist() for text in texts]
+
+
+def matches_filter(metadata, metadata_filter):
+    """Pinecone-style metadata filter: {field: value} or {field: {"$eq": value}} / {"$in": [...]}."""
+    for field, condition in (metadata_filter or {}).items():
+        value = metadata.get(field)
+        if isinstance(condition, dict):
+            if "$eq" in condition and value != condition["$eq"]:
+                return False
+            if "$in" in condition and value not in condition["$in"]:
+                return False
+        elif value != condition:
+            return False
+    return True
+
+
+class InMemoryPineconeIndex:
+    """Brute-force cosine stand-in for a Pinecone index: upsert, query and describe_index_stats per namespace."""
+
+    def __init__(self):
+        self.namespaces = {}  # namespace -> {id: (unit vector, metadata)}
+        self._matrices = {}  # namespace -> (ids, matrix, metadatas), rebuilt after an upsert
+
+    def upsert(self, vectors, namespace=""):
+        store = self.namespaces.setdefault(namespace or "", {})
+        for vector in vectors:
+            values = np.asarray(vector["values"], dtype=np.float32)
+            norm = np.linalg.norm(values)
+            store[vector["id"]] = (values / norm if norm else values, vector.get("metadata", {}))
+        self._matrices.pop(namespace or "", None)
+        return {"upserted_count": len(vectors)}
+
+    def describe_index_stats(self):
+        return SimpleNamespace(namespaces={ns: {"vector_count": len(store)} for ns, store in self.namespaces.items()})
+
+    def _matrix(self, namespace):
+        if namespace not in self._matrices:
+            store = self.namespaces.get(namespace, {})
+            ids = list(store)
+            matrix = np.stack([store[i][0] for i in ids]) if ids else np.zeros((0, 1), dtype=np.float32)
+            self._matrices[namespace] = (ids, matrix, [store[i][1] for i in ids])
+        return self._matrices[namespace]
+
+    def query(self, vector, top_k=10, namespace="", filter=None, include_metadata=True):
+        ids, matrix, metadatas = self._matrix(namespace or "")
+        if not ids:
+            return SimpleNamespace(matches=[])
+
+        scores = matrix @ np.asarray(vector, dtype=np.float32)
+        if filter:
+            allowed = np.array([matches_filter(metadata, filter) for metadata in metadatas])
+            scores = np.where(allowed, scores, -np.inf)
+
+        top = np.argsort(-scores)[:top_k]
+        return SimpleNamespace(matches=[
+            SimpleNamespace(id=ids[i], score=float(scores[i]), metadata=metadatas[i] if include_metadata else None)
+            for i in top if np.isfinite(scores[i])
+        ])
+
+
+class MockOCRClient:
+    """
+    Stands in for the Mistral client in mistral_ocr_local: `ocr.process` returns the pages registered
+    for a document URL (e.g. text extracted with PyMuPDF), after an optional simulated per-page latency.
+    """
+
+    def __init__(self, pages_by_url, latency_per_page=0.0):
+        self.pages_by_url = pages_by_url
+        self.latency_per_page = latency_per_page
+        self.ocr = SimpleNamespace(process=self.process)
+
+    def process(self, document, model=None, include_image_base64=False):
+        pages = self.pages_by_url[document.document_url]
+        if self.latency_per_page:
+            time.sleep(self.latency_per_page * len(pages))
+        return SimpleNamespace(pages=[SimpleNamespace(index=i, markdown=markdown) for i, markdown in enumerate(pages)])
+
+
+class MockEmbeddingsAPI:
+    """
+    Stands in for `openai.embeddings`: `create` returns hashing embeddings of the requested size,
+    after an optional simulated per-request latency, and counts requests and inputs.
+    """
+
+    def __init__(self, dims_by_model, latency_per_request=0.0):
+        self.dims_by_model = dims_by_model
+        self.latency_per_request = latency_per_request
+        self.requests = 0
+        self.inputs = 0
+
+    def create(self, input, model, dimensions=None):
+        self.requests += 1
+        self.inputs += len(input)
+        if self.latency_per_request:
+            time.sleep(self.latency_per_request)
+        embedder = HashingEmbeddings(dim=dimensions or self.dims_by_model[model])
+        return SimpleNamespace(data=[SimpleNamespace(embedding=vector) for vector in embedder.embed_documents(input)])
@@ -1,25 +1,36 @@
 import json
+import chromadb
 from langchain.vectorstores import Chroma
-from langchain.embeddings.huggingface import HuggingFaceEmbeddings
 from langchain.schema import Document
+from partitions import partition_from_path, chroma_collection_name, tier_collection_base
+from embedding_models import get_hf_embeddings, chunk_content, chunk_position
+from sections import section_fields
 
-def index_json_chromadb(json_content, collection_name="json-index", persist_directory="./chroma_langchain_db"):
+def index_json_chromadb(json_content, collection_name="json-index", persist_directory="./chroma_langchain_db",
+                        source_path=None, partition=None):
     """
     Index JSON content (as a string) into ChromaDB.
 
     Args:
         json_content (str): The JSON content as a string.
-        collection_name (str): Name of the ChromaDB collection.
+        collection_name (str): Base name of the ChromaDB collection.
         persist_directory (str): Directory where the ChromaDB database is stored.
+        source_path (str, optional): GCS path of the chunked file, used to derive the partition.
+        partition (str, optional): Year-quarter partition (default: derived from source_path).
 
     Returns:
         Chroma: The indexed ChromaDB vector store.
     """
-    
+
+    # ✅ Each year/quarter partition gets its own collection
+    if partition is None:
+        partition = partition_from_path(source_path)
+    collection_name = chroma_collection_name(collection_name, partition)
+
     # ✅ Initialize ChromaDB
     vector_store = Chroma(
         collection_name=collection_name,
-        embedding_function=HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2"),
+        embedding_function=get_hf_embeddings(),
         persist_directory=persist_directory
     )
 
@@ -36,13 +47,18 @@ def index_json_chromadb(json_content, collection_name="json-index", persist_dire
     if 'chunks' not in data or not isinstance(data['chunks'], list):
         raise ValueError("❌ No valid chunks found in the JSON content.")
     
-    chunks = [chunk if isinstance(chunk, str) else chunk.get("content", "") for chunk in data["chunks"]]
+    chunks = data["chunks"]
     
     if not chunks:
         raise ValueError("❌ No content found in the JSON chunks.")
 
     # ✅ Convert chunks to LangChain Documents
-    documents = [Document(page_content=chunk, metadata={"source": "in-memory"}) for chunk in chunks if chunk]
+    metadata = {"source": source_path or "in-memory"}
+    if partition:
+        metadata["partition"] = partition
+
+    documents = [Document(page_content=chunk_content(chunk), metadata={**metadata, **section_fields(chunk), **chunk_position(chunk)})
+                 for chunk in chunks if chunk_content(chunk)]
 
     # ✅ Insert documents into ChromaDB
     if documents:
@@ -52,3 +68,50 @@ def index_json_chromadb(json_content, collection_name="json-index", persist_dire
         print("⚠️ No chunks were indexed. Check if the JSON content contains text.")
 
     return vector_store
+
+
+def upsert_embedded_chunks_chromadb(chunks, embeddings, collection_name="json-index", persist_directory="./chroma_langchain_db",
+                                    source_path=None, partition=None, chroma_client=None, tier="chunks"):
+    """
+    Upserts chunks whose embeddings were already computed (e.g. by the ingestion pipeline) into ChromaDB,
+    into the same per-partition collection `index_json_chromadb` writes to.
+
+    Args:
+        chunks (list[str or dict]): Chunk texts or chunk records (section metadata is kept).
+        embeddings (list[list[float]]): One all-MiniLM-L6-v2 embedding per chunk.
+        collection_name (str): Base name of the ChromaDB collection.
+        persist_directory (str): Directory where the ChromaDB database is stored.
+        source_path (str, optional): GCS path the chunks came from, used for ids and the partition.
+        partition (str, optional): Year-quarter partition (default: derived from source_path).
+        chroma_client (optional): An existing chromadb client to write through instead of opening `persist_directory`.
+        tier (str): "chunks", or "summaries" to write section/document summaries to the summary tier's collections.
+
+    Returns:
+        int: Number of chunks upserted.
+    """
+    if len(chunks) != len(embeddings):
+        raise ValueError("❌ Every chunk needs exactly one embedding.")
+
+    if partition is None:
+        partition = partition_from_path(source_path)
+    collection_name = chroma_collection_name(tier_collection_base(collection_name, tier), partition)
+
+    source = source_path or "in-memory"
+    metadata = {"source": source}
+    if partition:
+        metadata["partition"] = partition
+
+    rows = [(f"{source}#{i}", chunk_content(chunk), list(embedding), {**metadata, **section_fields(chunk), **chunk_position(chunk)})
+            for i, (chunk, embedding) in enumerate(zip(chunks, embeddings)) if chunk_content(chunk)]
+    if not rows:
+        print("⚠️ No chunks were indexed. Check if the JSON content contains text.")
+        return 0
+
+    # ✅ Stable ids: re-ingesting a file overwrites its chunks instead of duplicating them
+    chroma_client = chroma_client or chromadb.PersistentClient(path=persist_directory)
+    collection = chroma_client.get_or_create_collection(name=collection_name)
+    ids, documents, vectors, metadatas = zip(*rows)
+    collection.upsert(ids=list(ids), documents=list(documents), embeddings=list(vectors), metadatas=list(metadatas))
+
+    print(f"✅ Upserted {len(ids)} chunks into ChromaDB ({collection_name}).")
+    return len(ids)
@@ -1,61 +1,168 @@
 import os
+import re
 import json
-import nltk
-import tiktoken  # Import OpenAI's tokenizer for better chunking
-from nltk.tokenize import sent_tokenize
+from bisect import bisect_left
+from functools import lru_cache
+import numpy as np
 from io import BytesIO
 from gcs_utils import upload_to_gcs  # Import the upload function
-from langchain.text_splitter import RecursiveCharacterTextSplitter
+from embedding_models import embed_sentences, SENTENCE_BATCH_SIZE
+from sections import section_metadata, is_section_heading, PART_HEADING_PATTERN, ITEM_HEADING_PATTERN
+from provenance import add_provenance
+from tracing import span
 
-nltk.download('punkt')
-
-# Initialize tokenizer for accurate token count
-tokenizer = tiktoken.encoding_for_model("text-embedding-ada-002")
+# nltk, tiktoken and LangChain are imported on first use, so importing this module (and main.py) stays
+# fast and never touches the network. The Docker image bakes punkt into NLTK_DATA and the tiktoken BPE
+# file into TIKTOKEN_CACHE_DIR at build time; elsewhere they are downloaded once, on first use.
+TOKENIZER_MODEL = "text-embedding-ada-002"
+PUNKT_RESOURCES = ("punkt_tab", "punkt")  # nltk >= 3.8.2 reads punkt_tab; older releases read punkt
 MAX_TOKENS = 8192  # Maximum token limit for OpenAI embeddings
 
+SPLIT_CHUNK_TOKENS = 300  # Window size used when an oversized chunk has to be split further
+
+@lru_cache(maxsize=1)
+def get_tokenizer():
+    """The tiktoken encoder used for every token count, built once per process."""
+    import tiktoken  # Import OpenAI's tokenizer for better chunking
+    return tiktoken.encoding_for_model(TOKENIZER_MODEL)
+
+@lru_cache(maxsize=1)
+def get_sentence_tokenizer():
+    """nltk's sent_tokenize, with the punkt model located (or, outside the image, downloaded) on first use."""
+    import nltk
+    from nltk.tokenize import sent_tokenize
+
+    for resource in PUNKT_RESOURCES:
+        try:
+            nltk.data.find(f"tokenizers/{resource}")
+            return sent_tokenize
+        except LookupError:
+            continue
+
+    print("⚠️ punkt not found in NLTK_DATA, downloading it...")
+    for resource in PUNKT_RESOURCES:
+        nltk.download(resource, quiet=True)
+    return sent_tokenize
+
 def count_tokens(text):
     """Returns the number of tokens in a given text."""
-    return len(tokenizer.encode(text))
+    return len(get_tokenizer().encode(text))
+
+class TokenizedText:
+    """
+    A document encoded once, with every token mapped back to the character offset it starts at.
+    Chunkers slice the original text by these offsets instead of decoding or re-encoding each piece,
+    and token counts for any character span come from a binary search over the offsets.
+    """
+
+    def __init__(self, text):
+        self.text = text
+        tokenizer = get_tokenizer()
+        self.tokens = tokenizer.encode(text)
+        _, self.offsets = tokenizer.decode_with_offsets(self.tokens)
+
+    def __len__(self):
+        return len(self.tokens)
+
+    def char_offset(self, token_index):
+        """Character offset where token `token_index` starts (end of text past the last token)."""
+        return self.offsets[token_index] if token_index < len(self.tokens) else len(self.text)
+
+    def token_index(self, char_offset):
+        """Index of the first token starting at or after `char_offset`."""
+        return bisect_left(self.offsets, char_offset)
+
+    def chunk(self, token_start, token_end):
+        """Chunk covering tokens [token_start, token_end)."""
+        char_start, char_end = self.char_offset(token_start), self.char_offset(token_end)
+        return make_chunk(self.text[char_start:char_end], token_end - token_start, char_start, char_end)
+
+    def chunk_for_chars(self, char_start, char_end):
+        """Chunk covering characters [char_start, char_end), trimmed of surrounding whitespace."""
+        span = self.text[char_start:char_end]
+        char_start += len(span) - len(span.lstrip())
+        char_end -= len(span) - len(span.rstrip())
+        if char_end <= char_start:
+            return None
+        token_count = self.token_index(char_end) - self.token_index(char_start)
+        return make_chunk(self.text[char_start:char_end], token_count, char_start, char_end)
+
+    def windows(self, chunk_size, step, token_start=0, token_end=None):
+        """Fixed windows of `chunk_size` tokens every `step` tokens over [token_start, token_end)."""
+        token_end = len(self.tokens) if token_end is None else token_end
+        return [self.chunk(i, min(i + chunk_size, token_end)) for i in range(token_start, token_end, step)]
+
+def make_chunk(content, token_count, char_start=None, char_end=None):
+    """
+    Chunk record written to chunked_outputs/: the text plus its precomputed token count and,
+    when known, its character span in the source document.
+    """
+    return {"content": content, "token_count": token_count, "char_start": char_start, "char_end": char_end}
+
+def as_tokenized(text):
+    return text if isinstance(text, TokenizedText) else TokenizedText(text)
 
 # LangChain Chunking Function (Modified to handle raw text)
 def langchain_chunking(text, chunk_size=512, chunk_overlap=50):
     """Uses LangChain's RecursiveCharacterTextSplitter to chunk the text."""
-    if not text:
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+    doc = as_tokenized(text)
+    if not doc.text:
         raise ValueError("Text input cannot be empty.")
     
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
-    return text_splitter.split_text(text)
+    # add_start_index records where each piece came from, so its token count can be read off the document's offsets
+    text_splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap, add_start_index=True)
+    pieces = text_splitter.create_documents([doc.text])
+    chunks = []
+    for piece in pieces:
+        start = piece.metadata["start_index"]
+        chunk = doc.chunk_for_chars(start, start + len(piece.page_content))
+        if chunk:
+            chunks.append(chunk)
+    return chunks
 
 # 1. Fixed-size chunking (between 200-400 tokens)
 def chunk_fixed_size(text, chunk_size=300):
     """Splits text into fixed-size token chunks (not word-based)."""
-    tokens = tokenizer.encode(text)
-    return [tokenizer.decode(tokens[i:i + chunk_size]) for i in range(0, len(tokens), chunk_size)]
+    return as_tokenized(text).windows(chunk_size, chunk_size)
+
+def sentence_spans(text):
+    """(start, end) character spans of the sentences in `text`, in order."""
+    spans = []
+    cursor = 0
+    for sentence in get_sentence_tokenizer()(text):
+        sentence_start = text.find(sentence, cursor)
+        if sentence_start < 0:  # sent_tokenize normally returns exact substrings; skip anything it rewrote
+            continue
+        cursor = sentence_start + len(sentence)
+        spans.append((sentence_start, cursor))
+    return spans
 
 # 2. Semantic-based chunking (split at sentence boundaries)
 def chunk_by_sentences(text, max_tokens=400):
     """Chunks text by sentence while ensuring token limit per chunk."""
-    sentences = sent_tokenize(text)
-    chunks, current_chunk = [], ""
+    doc = as_tokenized(text)
+    chunks = []
+    chunk_start = chunk_end = None
 
-    for sentence in sentences:
-        if count_tokens(current_chunk + sentence) <= max_tokens:
-            current_chunk += " " + sentence
-        else:
-            chunks.append(current_chunk.strip())
-            current_chunk = sentence  # Start new chunk
+    for sentence_start, sentence_end in sentence_spans(doc.text):
+        if chunk_start is None:
+            chunk_start = sentence_start
+        elif doc.token_index(sentence_end) - doc.token_index(chunk_start) > max_tokens:
+            chunks.append(doc.chunk_for_chars(chunk_start, chunk_end))
+            chunk_start = sentence_start  # Start new chunk
+        chunk_end = sentence_end
 
-    if current_chunk:
-        chunks.append(current_chunk.strip())
+    if chunk_start is not None:
+        chunks.append(doc.chunk_for_chars(chunk_start, chunk_end))
 
-    return chunks
+    return [chunk for chunk in chunks if chunk]
 
 # 3. Sliding window chunking (overlapping chunks)
 def chunk_sliding_window(text, chunk_size=300, overlap=50):
     """Creates overlapping chunks using tokens (prevents loss of data)."""
-    tokens = tokenizer.encode(text)
     step = chunk_size - overlap  # Ensure overlap consistency
-    return [tokenizer.decode(tokens[i: i + chunk_size]) for i in range(0, len(tokens), step) if i < len(tokens)]
+    return as_tokenized(text).windows(chunk_size, step)
 
 # 4. Recursive chunking (hierarchical splitting with token validation)
 def chunk_recursive(text, chunk_size=300, overlap=50, separators=["\n\n", ".", "?", "!", "\n", " "]):
@@ -63,76 +170,336 @@ def chunk_recursive(text, chunk_size=300, overlap=50, separators=["\n\n", ".", "
     Recursively chunks text based on logical separators while ensuring minimal overlap.
     Adjusted for structured text like reports & long-form documents.
     """
-    if count_tokens(text) <= chunk_size:
-        return [text]
+    doc = as_tokenized(text)
+    if len(doc) <= chunk_size:
+        chunk = doc.chunk_for_chars(0, len(doc.text))
+        return [chunk] if chunk else []
 
     for separator in separators:
-        parts = text.split(separator)
-        chunks, temp_chunk = [], ""
+        chunks = []
+        temp_start = part_start = 0
 
-        for part in parts:
-            if count_tokens(temp_chunk + part) <= chunk_size:
-                temp_chunk += part + separator
-            else:
-                chunks.append(temp_chunk.strip())
-                temp_chunk = part + separator
+        # Group consecutive separator-delimited parts while the group stays within chunk_size tokens
+        while part_start <= len(doc.text):
+            part_end = doc.text.find(separator, part_start)
+            part_end = len(doc.text) if part_end < 0 else part_end + len(separator)
+            if part_start > temp_start and doc.token_index(part_end) - doc.token_index(temp_start) > chunk_size:
+                chunks.append(doc.chunk_for_chars(temp_start, part_start))
+                temp_start = part_start
+            part_start = part_end + (part_end == len(doc.text))
 
-        if temp_chunk:
-            chunks.append(temp_chunk.strip())
+        chunks.append(doc.chunk_for_chars(temp_start, len(doc.text)))
+        chunks = [chunk for chunk in chunks if chunk]
 
         # If all chunks are valid, return them
-        if all(count_tokens(chunk) <= chunk_size for chunk in chunks):
+        if all(chunk["token_count"] <= chunk_size for chunk in chunks):
             return chunks
 
     # Fallback: Fixed-size chunking if no valid split is found
     print("⚠️ Using fixed-size chunking as fallback.")
-    return chunk_fixed_size(text, chunk_size)
+    return chunk_fixed_size(doc, chunk_size)
+
+# 5. Markdown structure chunking (headings, Item N. sections and tables)
+MARKDOWN_HEADING_PATTERN = re.compile(r"^(#{1,6})\s+(.+?)\s*#*\s*$")
+TABLE_ROW_PATTERN = re.compile(r"^\s*\|")
+TABLE_SEPARATOR_PATTERN = re.compile(r"^\s*\|?\s*:?-{3,}")
+MAX_SECTION_HEADING_CHARS = 200  # Longer "Item ..." lines are prose that happens to mention an item
+
+def heading_level(title, markdown_heading=None):
+    """
+    PART headings rank 1 and Item headings 2, whether or not the parser marked them up with #s;
+    every other Markdown heading nests below them by its # count.
+    """
+    if PART_HEADING_PATTERN.match(title):
+        return 1
+    if ITEM_HEADING_PATTERN.match(title):
+        return 2
+    return 2 + (len(markdown_heading.group(1)) if markdown_heading else 1)
+
+def markdown_blocks(text):
+    """
+    Splits Markdown into blocks: ("heading", level, title, start, end), ("table", None, row_spans, start, end)
+    and ("paragraph", None, None, start, end). Plain-text "PART II" / "Item 7." lines from parsed filings
+    count as headings too.
+    """
+    blocks = []
+    kind, block_start, rows = None, 0, []
+    offset = 0
+
+    def close(end):
+        if kind == "table":
+            blocks.append(("table", None, list(rows), block_start, end))
+        elif kind == "paragraph":
+            blocks.append(("paragraph", None, None, block_start, end))
+
+    for line in text.splitlines(keepends=True):
+        start, end = offset, offset + len(line)
+        offset = end
+        stripped = line.strip()
+
+        heading = MARKDOWN_HEADING_PATTERN.match(stripped)
+        if heading or (len(stripped) <= MAX_SECTION_HEADING_CHARS and is_section_heading(stripped)):
+            close(start)
+            title = (heading.group(2) if heading else stripped).strip("*_ ")
+            blocks.append(("heading", heading_level(title, heading), title, start, end))
+            kind = None
+        elif not stripped:
+            close(start)
+            kind = None
+        elif TABLE_ROW_PATTERN.match(line):
+            if kind != "table":
+                close(start)
+                kind, block_start, rows = "table", start, []
+            rows.append((start, end))
+        elif kind != "paragraph":
+            close(start)
+            kind, block_start = "paragraph", start
+
+    close(offset)
+    return blocks
+
+def split_table(doc, rows, max_tokens, metadata):
+    """
+    Splits a table that doesn't fit in one chunk into groups of whole rows, repeating the header
+    row (and its |---| separator) at the top of every group so each piece is a readable table.
+    Character spans cover the group's own rows; the repeated header is not part of the span.
+    """
+    header_rows = 2 if len(rows) > 1 and TABLE_SEPARATOR_PATTERN.match(doc.text[rows[1][0]:rows[1][1]]) else 1
+    header_start, header_end = rows[0][0], rows[header_rows - 1][1]
+    header = doc.text[header_start:header_end]
+    header_tokens = doc.token_index(header_end) - doc.token_index(header_start)
+
+    chunks, group_start, group_end = [], None, None
+
+    def emit():
+        token_count = header_tokens + doc.token_index(group_end) - doc.token_index(group_start)
+        chunk = make_chunk(header + doc.text[group_start:group_end].rstrip(), token_count, group_start, group_end)
+        chunks.append({**chunk, **metadata})
+
+    for row_start, row_end in rows[header_rows:]:
+        if group_start is not None and header_tokens + doc.token_index(row_end) - doc.token_index(group_start) > max_tokens:
+            emit()
+            group_start = None
+        if group_start is None:
+            group_start = row_start
+        group_end = row_end
+
+    if group_start is not None:
+        emit()
+    return chunks
+
+def chunk_markdown_structure(text, max_tokens=512):
+    """
+    Chunks Markdown along its structure: a new chunk starts at every heading (including "PART" and
+    "Item N." lines), paragraphs are packed up to `max_tokens`, and tables are never cut mid-row —
+    a table that fits stays whole, a larger one is split into row groups with the header repeated.
+    Every chunk carries section metadata (section_path, section_item, section_topic) for filtering.
+    """
+    doc = as_tokenized(text)
+    chunks, path = [], []  # path: [(level, title), ...] from the outermost heading in
+    pending = {"start": None, "end": None, "has_body": False}
+
+    def tokens(start, end):
+        return doc.token_index(end) - doc.token_index(start)
+
+    def metadata():
+        return section_metadata([title for _, title in path])
+
+    def flush():
+        # A heading directly followed by another heading has no body; its title lives on in section_path
+        if pending["start"] is not None and pending["has_body"]:
+            chunk = doc.chunk_for_chars(pending["start"], pending["end"])
+            if chunk:
+                chunks.append({**chunk, **metadata()})
+        pending.update(start=None, end=None, has_body=False)
+
+    for kind, level, detail, start, end in markdown_blocks(doc.text):
+        if kind == "heading":
+            flush()
+            path = [entry for entry in path if entry[0] < level] + [(level, detail)]
+            pending.update(start=start, end=end)  # The heading text opens its section's first chunk
+            continue
+
+        if tokens(start, end) > max_tokens:
+            flush()
+            if kind == "table":
+                chunks.extend(split_table(doc, detail, max_tokens, metadata()))
+            else:
+                chunks.extend({**chunk, **metadata()} for chunk in
+                              doc.windows(max_tokens, max_tokens, doc.token_index(start), doc.token_index(end)))
+            continue
+
+        if pending["start"] is not None and pending["has_body"] and tokens(pending["start"], end) > max_tokens:
+            flush()
+        if pending["start"] is None:
+            pending["start"] = start
+        elif not pending["has_body"] and tokens(pending["start"], end) > max_tokens:
+            pending["start"] = start  # Heading + block would overflow: the heading survives in section_path
+        pending.update(end=end, has_body=True)
+
+    flush()
+    return chunks
+
+# 6. Embedding-based semantic chunking (cut where adjacent sentences drift apart in meaning)
+SEMANTIC_BREAKPOINT_PERCENTILE = 95  # Distances above this percentile of the document's distances count as topic shifts
+
+def adjacent_distances(embeddings):
+    """Cosine distance between each pair of consecutive rows of a unit-vector matrix (length n - 1)."""
+    return 1.0 - np.einsum("ij,ij->i", embeddings[:-1], embeddings[1:])
+
+def semantic_boundaries(distances, token_starts, token_ends, max_tokens, threshold):
+    """
+    Picks chunk boundaries as (first_sentence, end_sentence) pairs. From each start, the chunk may
+    grow as far as the token budget allows; it is cut at the first distance peak above `threshold`
+    inside that window, or, if there is none and the budget runs out, at the largest distance late in the window.
+    """
+    n = len(token_starts)
+    boundaries = []
+    start = 0
+    while start < n:
+        # Furthest end (exclusive) that keeps sentences [start, end) within budget; always at least one sentence
+        limit = int(np.searchsorted(token_ends, token_starts[start] + max_tokens, side="right"))
+        limit = min(max(limit, start + 1), n)
+        # distances[i] sits between sentence i and i + 1, so cutting at it ends the chunk at i + 1
+        window = distances[start:limit - 1]
+        peaks = np.flatnonzero(window > threshold)
+        if peaks.size:
+            end = start + int(peaks[0]) + 1
+        elif limit == n or not window.size:
+            end = limit
+        else:
+            # No topic shift before the budget runs out: cut at the strongest boundary in the back half of
+            # the window (latest on ties) so a forced cut never leaves a tiny chunk behind
+            back_half = window[len(window) // 2:][::-1]
+            end = start + len(window) - int(np.argmax(back_half))
+        boundaries.append((start, end))
+        start = end
+    return boundaries
+
+def chunk_semantic(text, max_tokens=512, breakpoint_percentile=SEMANTIC_BREAKPOINT_PERCENTILE, batch_size=SENTENCE_BATCH_SIZE):
+    """
+    Splits text into sentences, embeds them all in large batches with the local MiniLM model, and
+    cuts chunks where consecutive sentences are furthest apart in meaning, never exceeding `max_tokens`.
+    A single sentence longer than the budget is split into token windows.
+    """
+    doc = as_tokenized(text)
+    spans = sentence_spans(doc.text)
+    if not spans:
+        return []
+
+    embeddings = embed_sentences([doc.text[start:end] for start, end in spans], batch_size=batch_size)
+    distances = adjacent_distances(embeddings)
+    threshold = float(np.percentile(distances, breakpoint_percentile)) if distances.size else 0.0
+
+    token_starts = np.array([doc.token_index(start) for start, _ in spans])
+    token_ends = np.array([doc.token_index(end) for _, end in spans])
+
+    chunks = []
+    for first, end in semantic_boundaries(distances, token_starts, token_ends, max_tokens, threshold):
+        if token_ends[end - 1] - token_starts[first] > max_tokens:
+            chunks.extend(doc.windows(max_tokens, max_tokens, int(token_starts[first]), int(token_ends[end - 1])))
+        else:
+            chunks.append(doc.chunk_for_chars(spans[first][0], spans[end - 1][1]))
+    return [chunk for chunk in chunks if chunk]
 
 # ✅ New Function: Ensure all chunks are within the token limit
-def validate_and_split_chunks(chunks, max_tokens=MAX_TOKENS):
-    """Ensures no chunk exceeds the max token limit by splitting further if needed."""
+def validate_and_split_chunks(chunks, max_tokens=MAX_TOKENS, doc=None):
+    """
+    Ensures no chunk exceeds the max token limit by splitting further if needed.
+    Reads each chunk's precomputed token count; an oversized chunk is split into token windows
+    over the document's existing tokenization (`doc`), so nothing is encoded again. Plain-string
+    chunks (older callers) are encoded once here.
+    """
     valid_chunks = []
 
     for chunk in chunks:
-        if count_tokens(chunk) > max_tokens:
-            print(f"⚠️ Chunk too large ({count_tokens(chunk)} tokens), splitting further...")
-            valid_chunks.extend(chunk_recursive(chunk, chunk_size=300))  # Recursive splitting
+        if isinstance(chunk, str):
+            # No span in the document: windows are taken over the chunk's own tokens, without offsets
+            source = TokenizedText(chunk)
+            pieces = [make_chunk(chunk, len(source))] if len(source) <= max_tokens else [
+                make_chunk(piece["content"], piece["token_count"])
+                for piece in source.windows(SPLIT_CHUNK_TOKENS, SPLIT_CHUNK_TOKENS)
+            ]
+        elif chunk["token_count"] <= max_tokens:
+            pieces = [chunk]
+        elif doc is not None and chunk.get("char_start") is not None:
+            token_start, token_end = doc.token_index(chunk["char_start"]), doc.token_index(chunk["char_end"])
+            pieces = doc.windows(SPLIT_CHUNK_TOKENS, SPLIT_CHUNK_TOKENS, token_start, token_end)
         else:
-            valid_chunks.append(chunk)
+            pieces = [make_chunk(piece["content"], piece["token_count"])
+                      for piece in chunk_fixed_size(chunk["content"], SPLIT_CHUNK_TOKENS)]
+
+        if len(pieces) > 1:
+            print(f"⚠️ Chunk too large ({sum(piece['token_count'] for piece in pieces)} tokens), splitting further...")
+        valid_chunks.extend(pieces)
 
     return valid_chunks
 
-def process_and_upload_chunked_data(text, destination_blob_name, strategy="fixed", chunk_size=512, chunk_overlap=50):
-    """Process text with the selected chunking strategy and upload chunked data to GCS."""
-    
-    # Mapping of strategies to the corresponding functions
-    chunking_strategies = {
-        "fixed": chunk_fixed_size,
-        "sentence": chunk_by_sentences,
-        "sliding": chunk_sliding_window,
-        "recursive": chunk_recursive,
-        "langchain": langchain_chunking  # Add LangChain option
-    }
-
-    if strategy not in chunking_strategies:
+# Mapping of strategies to the corresponding functions
+CHUNKING_STRATEGIES = {
+    "fixed": chunk_fixed_size,
+    "sentence": chunk_by_sentences,
+    "sliding": chunk_sliding_window,
+    "recursive": chunk_recursive,
+    "langchain": langchain_chunking,  # Add LangChain option
+    "markdown": chunk_markdown_structure,
+    "semantic": chunk_semantic
+}
+
+# Keyword names each strategy uses for the chunk size / overlap (None: the strategy has no overlap)
+STRATEGY_PARAMS = {
+    "fixed": ("chunk_size", None),
+    "sentence": ("max_tokens", None),
+    "sliding": ("chunk_size", "overlap"),
+    "recursive": ("chunk_size", "overlap"),
+    "langchain": ("chunk_size", "chunk_overlap"),  # Characters, not tokens
+    "markdown": ("max_tokens", None),
+    "semantic": ("max_tokens", None)
+}
+
+def chunk_text(text, strategy="fixed", chunk_size=None, chunk_overlap=None):
+    """
+    Chunks text with the selected strategy and splits any chunk over the embedding token limit.
+    `chunk_size`/`chunk_overlap` override the strategy's own defaults when given. `text` may be a
+    TokenizedText, so several configurations can share one tokenization of the same document.
+    Every returned chunk carries its token count, character and byte span, and page range when the
+    text has page markers (see provenance.py).
+    """
+    if strategy not in CHUNKING_STRATEGIES:
         raise ValueError(f"Unknown strategy: {strategy}")
     
-    # Chunk the data using the selected strategy
-    if strategy == "langchain":
-        # LangChain strategy processes raw text
-        chunked_data = langchain_chunking(text, chunk_size, chunk_overlap)
-    else:
-        # Other strategies process text directly
-        chunked_data = chunking_strategies[strategy](text)
-    
-    # ✅ Validate and split oversized chunks
-    chunked_data = validate_and_split_chunks(chunked_data)
+    with span("chunk", {"chunk.strategy": strategy, "chunk.size": chunk_size, "chunk.overlap": chunk_overlap,
+                        "chunk.pretokenized": isinstance(text, TokenizedText),
+                        "cache.tokenizer_hit": get_tokenizer.cache_info().currsize > 0}) as chunk_span:
+        doc = as_tokenized(text)
+
+        size_param, overlap_param = STRATEGY_PARAMS[strategy]
+        kwargs = {}
+        if chunk_size is not None:
+            kwargs[size_param] = chunk_size
+        if chunk_overlap is not None and overlap_param:
+            kwargs[overlap_param] = chunk_overlap
 
+        # Chunk the data using the selected strategy
+        chunked_data = CHUNKING_STRATEGIES[strategy](doc, **kwargs)
+        
+        # ✅ Validate and split oversized chunks
+        chunks = validate_and_split_chunks(chunked_data, doc=doc)
+        add_provenance(doc.text, chunks)
+        chunk_span.set_attributes({"chunk.input_tokens": len(doc), "chunk.count": len(chunks)})
+    return chunks
+
+def chunked_blob_name(destination_blob_name):
+    """GCS path of a chunked JSON output (the source name with a .json extension)."""
+    return os.path.splitext(destination_blob_name)[0] + ".json"
+
+def upload_chunked_data(chunked_data, destination_blob_name):
+    """Uploads a list of chunks to GCS as {"chunks": [...]} and returns the file URL."""
     # Prepare output as JSON structure
     chunked_json = {"chunks": chunked_data}
     
     # Prepare the file name and convert chunked data to JSON string
-    destination_blob_name = os.path.splitext(destination_blob_name)[0] + ".json"
+    destination_blob_name = chunked_blob_name(destination_blob_name)
     chunked_json_str = json.dumps(chunked_json, ensure_ascii=False, indent=4)
     
     # Convert the string to bytes for uploading
@@ -146,3 +513,8 @@ def process_and_upload_chunked_data(text, destination_blob_name, strategy="fixed
     except Exception as e:
         print(f"❌ Error uploading to GCS: {e}")
         raise ValueError(f"Error uploading to GCS: {e}")
+
+def process_and_upload_chunked_data(text, destination_blob_name, strategy="fixed", chunk_size=None, chunk_overlap=None):
+    """Process text with the selected chunking strategy and upload chunked data to GCS."""
+    chunked_data = chunk_text(text, strategy, chunk_size, chunk_overlap)
+    return upload_chunked_data(chunked_data, destination_blob_name)
@@ -0,0 +1,166 @@
+"""
+Assembles the LLM context from retrieved chunks within a token budget.
+
+Retrieved chunks often overlap (sliding windows, or neighbouring chunks of the same filing), so
+joining them verbatim pays for the same tokens more than once. Chunks are taken best score first.
+Each one only contributes the part of its source document that isn't already in the context,
+using the character span stored on the chunk. A chunk is added only if that new part still fits
+the budget. Overlapping and adjacent pieces of one document are merged back into a single passage.
+Chunks without a stored span (older indexes) are deduplicated by text, against everything already
+in the context.
+"""
+import os
+import re
+from chunking import count_tokens
+from tracing import span
+from provenance import PAGE_MARKER_PATTERN
+
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "3000"))
+CONTEXT_SEPARATOR = "\n\n"
+
+WHITESPACE_RUN_PATTERN = re.compile(r"[ \t]{2,}")
+BLANK_LINES_PATTERN = re.compile(r"\n\s*\n\s*\n+")
+
+
+def compress_whitespace(text):
+    """
+    Collapses runs of spaces/tabs and of blank lines, which cost tokens without carrying content,
+    and drops the parsers' page markers (kept in the chunks only for citations).
+    """
+    text = PAGE_MARKER_PATTERN.sub("", text)
+    return BLANK_LINES_PATTERN.sub("\n\n", WHITESPACE_RUN_PATTERN.sub(" ", text)).strip()
+
+
+def has_span(chunk):
+    return chunk.get("source") is not None and chunk.get("char_start") is not None and chunk.get("char_end") is not None
+
+
+def uncovered_ranges(start, end, covered):
+    """Parts of [start, end) not inside any of the (sorted, disjoint) `covered` ranges."""
+    ranges, position = [], start
+    for covered_start, covered_end in covered:
+        if covered_end <= position or covered_start >= end:
+            continue
+        if covered_start > position:
+            ranges.append((position, covered_start))
+        position = max(position, covered_end)
+    if position < end:
+        ranges.append((position, end))
+    return ranges
+
+
+def add_range(covered, start, end):
+    """Inserts [start, end) into sorted disjoint ranges, merging overlapping and touching ones."""
+    merged = []
+    for covered_start, covered_end in sorted(covered + [(start, end)]):
+        if merged and covered_start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], covered_end))
+        else:
+            merged.append((covered_start, covered_end))
+    return merged
+
+
+def merge_passages(pieces):
+    """
+    Joins the selected chunks of one document into passages: pieces whose spans overlap or touch
+    become one passage, with the overlapping text included once.
+    """
+    passages = []
+    for piece in sorted(pieces, key=lambda piece: piece["char_start"]):
+        if passages and piece["char_start"] <= passages[-1]["char_end"]:
+            passage = passages[-1]
+            if piece["char_end"] > passage["char_end"]:
+                passage["text"] += piece["text"][passage["char_end"] - piece["char_start"]:]
+                passage["char_end"] = piece["char_end"]
+            passage["score"] = max(passage["score"], piece["score"])
+        else:
+            passages.append({"char_start": piece["char_start"], "char_end": piece["char_end"],
+                             "text": piece["text"], "score": piece["score"]})
+    return passages
+
+
+def in_context(text, seen_texts, pieces_by_source):
+    """True if `text` is already in the context: in a span-less chunk, or in a merged passage."""
+    if any(text in seen for seen in seen_texts):
+        return True
+    return any(text in passage["text"] for pieces in pieces_by_source.values() for passage in merge_passages(pieces))
+
+
+def build_context(chunks, token_budget=None, separator=CONTEXT_SEPARATOR):
+    """
+    Builds the context string for an LLM call.
+
+    Args:
+        chunks (list[dict]): Retrieved chunks with `text` and `score`, plus `source`, `char_start`
+            and `char_end` when the index stores them.
+        token_budget (int, optional): Maximum context size in tiktoken tokens (default: CONTEXT_TOKEN_BUDGET).
+
+    Returns:
+        dict: `context`, its `tokens`, the `chunks` used (best first), and how it compares with
+        joining every retrieved chunk verbatim (`verbatim_tokens`): `tokens_saved` by removing
+        overlaps, duplicates and whitespace, and `tokens_over_budget` in the `over_budget` chunks
+        left out to fit the budget. `duplicates_removed` counts chunks with nothing new.
+    """
+    token_budget = token_budget or CONTEXT_TOKEN_BUDGET
+    ranked = sorted((chunk for chunk in chunks if chunk.get("text")), key=lambda chunk: chunk.get("score") or 0, reverse=True)
+
+    with span("context.build", {"context.candidates": len(ranked), "context.budget": token_budget}) as context_span:
+        covered = {}  # source -> sorted disjoint char ranges already in the context
+        seen_texts = []
+        selected, pieces_by_source, loose = [], {}, []
+        used_tokens, duplicates, over_budget, over_budget_tokens = 0, 0, 0, 0
+
+        for chunk in ranked:
+            text = chunk["text"]
+            if has_span(chunk) and chunk["char_end"] - chunk["char_start"] == len(text):
+                source, start = chunk["source"], chunk["char_start"]
+                new_ranges = uncovered_ranges(start, chunk["char_end"], covered.get(source, []))
+                new_text = "".join(text[range_start - start:range_end - start] for range_start, range_end in new_ranges)
+            else:
+                source, new_ranges = None, None
+                new_text = "" if in_context(text, seen_texts, pieces_by_source) else text
+
+            if not new_text.strip():
+                duplicates += 1
+                continue
+            new_tokens = count_tokens(new_text)
+            if used_tokens + new_tokens > token_budget:
+                over_budget += 1
+                over_budget_tokens += chunk.get("token_count") or count_tokens(text)
+                continue
+
+            used_tokens += new_tokens
+            selected.append(chunk)
+            if new_ranges is None:
+                seen_texts.append(text)
+                loose.append({"text": text, "score": chunk.get("score") or 0})
+            else:
+                for range_start, range_end in new_ranges:
+                    covered[source] = add_range(covered.get(source, []), range_start, range_end)
+                pieces_by_source.setdefault(source, []).append({**chunk, "score": chunk.get("score") or 0})
+
+        # Passages in order of their best chunk's score; text within a passage stays in document order
+        passages = [passage for pieces in pieces_by_source.values() for passage in merge_passages(pieces)] + loose
+        passages.sort(key=lambda passage: passage["score"], reverse=True)
+        context = separator.join(compress_whitespace(passage["text"]) for passage in passages)
+
+        tokens = count_tokens(context) if context else 0
+        verbatim_tokens = sum(chunk.get("token_count") or count_tokens(chunk["text"]) for chunk in ranked)
+        result = {
+            "context": context,
+            "tokens": tokens,
+            "chunks": selected,
+            "passages": len(passages),
+            "verbatim_tokens": verbatim_tokens,
+            # Chunks left out for the budget aren't savings: they're reported on their own
+            "tokens_saved": verbatim_tokens - over_budget_tokens - tokens,
+            "tokens_over_budget": over_budget_tokens,
+            "duplicates_removed": duplicates,
+            "over_budget": over_budget
+        }
+        context_span.set_attributes({f"context.{key}": value for key, value in result.items() if isinstance(value, int)})
+
+    print(f"🧮 Context: {tokens} tokens from {len(selected)}/{len(ranked)} chunks "
+          f"({result['tokens_saved']} tokens saved, {duplicates} duplicates removed, "
+          f"{over_budget} chunks with {over_budget_tokens} tokens over budget)")
+    return result
@@ -0,0 +1,246 @@
+import hashlib
+import heapq
+import io
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from google.api_core.exceptions import NotFound
+from gcs_utils import get_file_content, download_file_from_gcs
+from search import get_embedding, normalize_rows, extract_chunk_records, records_embedding_config
+from embedding_models import resolve_embedding_config, check_dimensions
+from partitions import partition_from_path
+from gen_embedding import list_embedding_artifacts, rerank_sidecar_name, EMBEDDINGS_PREFIX
+from quantization import quantize_int8, int8_scores, top_k_indices, recall_impact, DEFAULT_RERANK_FACTOR, SEARCH_QUANTIZATION
+from tracing import span, in_current_context
+
+DEFAULT_MAX_WORKERS = 8
+
+# In-memory representation of cached artifacts (SEARCH_QUANTIZATION): "none" keeps float32 matrices
+# resident, "int8" keeps int8 codes resident and re-ranks the top candidates from a float32 memmap.
+# The memmaps need a disk-backed RERANK_CACHE_DIR: pages of a file on tmpfs (Cloud Run's filesystem,
+# a Memory-medium emptyDir) count as container memory, which would undo the saving.
+RERANK_CACHE_DIR = os.getenv("RERANK_CACHE_DIR")
+MEMORY_FILESYSTEMS = {"tmpfs", "ramfs"}
+
+# Parsed artifacts keyed by file name -> ((GCS generation, mode), artifact); a new generation invalidates the entry
+_artifact_cache = {}
+_cache_lock = threading.Lock()
+
+
+def quarter_tag(quarter):
+    """Normalizes "Q3 2023" / "2023-Q3" / "Q3_2023" to gen_embedding's "Q3_2023" tag."""
+    if not quarter:
+        return None
+    partition = partition_from_path(quarter)
+    if not partition:
+        return quarter
+    year, q = partition.split("-")
+    return f"{q}_{year}"
+
+
+def load_float_matrix(file_name):
+    """
+    Downloads one embedding artifact and returns (normalized float32 matrix, chunk records).
+    int8-stored artifacts use their float32 sidecar when present, so re-ranking stays exact.
+    """
+    content = json.loads(get_file_content(file_name))
+    records = extract_chunk_records(content)
+    records = [record for record in records if record["embedding"] is not None]
+    vectors = [record.pop("embedding") for record in records]
+
+    if records and any("embedding_int8" in item for item in content):
+        try:
+            sidecar = np.load(io.BytesIO(download_file_from_gcs(rerank_sidecar_name(file_name))), allow_pickle=False)
+            if len(sidecar) == len(records):
+                vectors = sidecar
+        except NotFound:
+            print(f"⚠️ {file_name}: no float32 sidecar, re-ranking with dequantized vectors.")
+
+    if records:
+        records_embedding_config([{**record, "embedding": vector} for record, vector in zip(records, vectors)])
+    matrix = normalize_rows(vectors) if records else None
+    return matrix, records
+
+
+def is_memory_backed(path):
+    """True if `path` is on an in-memory filesystem according to /proc/mounts (False when unknown)."""
+    try:
+        with open("/proc/mounts") as f:
+            mounts = [line.split()[1:3] for line in f]
+    except OSError:
+        return False
+    path = os.path.realpath(path)
+    containing = [(mount_point, fs_type) for mount_point, fs_type in mounts
+                  if path == mount_point or path.startswith(mount_point.rstrip("/") + "/")]
+    if not containing:
+        return False
+    return max(containing, key=lambda mount: len(mount[0]))[1] in MEMORY_FILESYSTEMS
+
+
+def rerank_cache_dir():
+    """RERANK_CACHE_DIR, checked to be set and disk-backed; raises ValueError otherwise."""
+    if not RERANK_CACHE_DIR:
+        raise ValueError("int8 search needs RERANK_CACHE_DIR, a disk-backed directory for the float32 re-rank memmaps.")
+    if is_memory_backed(RERANK_CACHE_DIR):
+        raise ValueError(f"RERANK_CACHE_DIR ({RERANK_CACHE_DIR}) is on an in-memory filesystem, so its memmaps would "
+                         "count as container memory. Point it at a disk-backed volume.")
+    return RERANK_CACHE_DIR
+
+
+def _spill_to_memmap(file_name, generation, matrix):
+    """Writes a float32 matrix to the local re-rank cache and reopens it memory-mapped (read-only)."""
+    cache_dir = rerank_cache_dir()
+    os.makedirs(cache_dir, exist_ok=True)
+    digest = hashlib.sha1(f"{file_name}:{generation}".encode("utf-8")).hexdigest()
+    path = os.path.join(cache_dir, f"{digest}.npy")
+    if not os.path.exists(path):
+        np.save(path, matrix, allow_pickle=False)
+    return np.load(path, mmap_mode="r")
+
+
+def load_artifact(file_name, generation=None, quantization=None):
+    """
+    Loads one embedding artifact for scoring plus its chunk records.
+    Cached per GCS generation so repeated corpus searches skip the download and JSON parse.
+    """
+    quantization = quantization or SEARCH_QUANTIZATION
+
+    with span("artifact.load", {"artifact.name": file_name, "artifact.quantization": quantization}) as load_span:
+        with _cache_lock:
+            cached = _artifact_cache.get(file_name)
+        if cached and generation is not None and cached[0] == (generation, quantization):
+            load_span.set_attribute("cache.hit", True)
+            return cached[1]
+
+        load_span.set_attributes({"cache.hit": False, "cache.stale": cached is not None})
+        matrix, records = load_float_matrix(file_name)
+        load_span.set_attribute("artifact.records", len(records))
+    artifact = {
+        "records": records,
+        "quarters": np.array([record.get("quarter") or "" for record in records]),
+        "embedding_model": records[0]["embedding_model"] if records else None,
+        "embedding_dim": matrix.shape[1] if matrix is not None else None
+    }
+
+    if matrix is None:
+        artifact["matrix"] = None
+    elif quantization == "int8":
+        artifact["codes"], artifact["scales"] = quantize_int8(matrix)
+        artifact["rerank"] = _spill_to_memmap(file_name, generation, matrix)
+    else:
+        artifact["matrix"] = matrix
+
+    with _cache_lock:
+        _artifact_cache[file_name] = ((generation, quantization), artifact)
+    return artifact
+
+
+def search_artifact(file_name, generation, query_embedding, top_k, quarter=None, quantization=None,
+                    query_model=None):
+    """
+    Scores one artifact and returns its top-k as (score, file_name, position, record) tuples.
+    Raises ValueError if the artifact was embedded with a different model or dimension than the query.
+    """
+    artifact = load_artifact(file_name, generation, quantization)
+
+    if artifact["embedding_dim"] is not None:
+        if artifact["embedding_model"] != query_model:
+            raise ValueError(f"Embedding model mismatch: query uses {query_model}, file uses {artifact['embedding_model']}.")
+        check_dimensions(len(query_embedding), artifact["embedding_dim"], artifact["embedding_model"])
+
+    if "codes" in artifact:
+        # int8 pass over every row, then exact float32 re-rank of the best candidates only
+        scores = int8_scores(query_embedding, artifact["codes"], artifact["scales"])
+    elif artifact["matrix"] is not None:
+        scores = artifact["matrix"] @ query_embedding
+    else:
+        return []
+
+    if quarter is not None:
+        scores = np.where(artifact["quarters"] == quarter, scores, -np.inf)
+
+    if "codes" in artifact:
+        candidates = np.sort(top_k_indices(scores, top_k * DEFAULT_RERANK_FACTOR))
+        candidates = candidates[np.isfinite(scores[candidates])]
+        scores = np.full(len(scores), -np.inf, dtype=np.float32)
+        scores[candidates] = np.asarray(artifact["rerank"][candidates]) @ query_embedding
+
+    return [
+        (float(scores[i]), file_name, int(i), artifact["records"][i])
+        for i in top_k_indices(scores, top_k) if np.isfinite(scores[i])
+    ]
+
+
+def search_corpus(query, quarter_filter=None, top_n=5, max_workers=DEFAULT_MAX_WORKERS, prefix=EMBEDDINGS_PREFIX,
+                  quantization=None, model=None, dimensions=None):
+    """
+    Searches every embedding artifact under `embeddings/` with one query embedding.
+
+    Files are scored in parallel (numpy releases the GIL during the matrix product), each
+    worker keeps only its file's top-k, and the per-file lists are merged with a heap.
+    Files embedded with a different model/dimension than the query are skipped and reported.
+    """
+    if max_workers < 1:
+        raise ValueError("max_workers must be at least 1.")
+    if (quantization or SEARCH_QUANTIZATION) == "int8":
+        rerank_cache_dir()
+    model, dimensions = resolve_embedding_config(model, dimensions)
+    quarter = quarter_tag(quarter_filter)
+
+    artifacts = list_embedding_artifacts(prefix)
+    # Artifact names carry their quarter tag, so most files can be skipped without downloading them
+    if quarter is not None:
+        artifacts = {
+            name: generation for name, generation in artifacts.items()
+            if quarter_tag(partition_from_path(name)) in (None, quarter)
+        }
+
+    if not artifacts:
+        return {"results": [], "files_searched": 0, "skipped_files": {}}
+
+    query_embedding = normalize_rows(get_embedding(query, model=model, dimensions=dimensions))
+    skipped_files = {}
+
+    def _search(item):
+        name, generation = item
+        try:
+            return search_artifact(name, generation, query_embedding, top_n, quarter, quantization, model)
+        except Exception as e:
+            print(f"⚠️ Skipping {name}: {e}")
+            skipped_files[name] = str(e)
+            return []
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(artifacts))) as executor:
+        per_file = list(executor.map(in_current_context(_search), artifacts.items()))
+
+    top = heapq.nlargest(top_n, (hit for hits in per_file for hit in hits), key=lambda hit: hit[0])
+
+    results = [
+        {
+            "similarity": score,
+            "chunk": record["chunk"],
+            "filename": record.get("filename") or file_name,
+            "quarter": record.get("quarter"),
+            "artifact": file_name
+        }
+        for score, file_name, _, record in top
+    ]
+    print(f"🔍 Searched {len(artifacts)} files, top result scores: {[round(r['similarity'], 4) for r in results]}")
+    return {"results": results, "files_searched": len(artifacts) - len(skipped_files), "skipped_files": skipped_files}
+
+
+def quantization_report(k=10, sample_size=100, max_files=None, prefix=EMBEDDINGS_PREFIX):
+    """Recall impact and memory footprint of int8 search over the stored corpus (or its first `max_files` files)."""
+    artifacts = sorted(list_embedding_artifacts(prefix))
+    if max_files:
+        artifacts = artifacts[:max_files]
+
+    matrices = [matrix for matrix, _ in map(load_float_matrix, artifacts) if matrix is not None]
+    if not matrices:
+        return {"files": len(artifacts), "vectors": 0}
+
+    report = recall_impact(np.vstack(matrices), k=k, sample_size=sample_size)
+    report["files"] = len(artifacts)
+    return report
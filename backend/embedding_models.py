@@ -0,0 +1,179 @@
+import os
+import re
+from functools import lru_cache
+import numpy as np
+import openai
+from dotenv import load_dotenv
+from tracing import span
+from provenance import PAGE_MARKER_PATTERN
+
+load_dotenv(dotenv_path=".env")
+openai.api_key = os.getenv("OPENAI_API_KEY")
+
+# Native output size per model, and whether the API accepts a `dimensions` argument.
+# text-embedding-3 models are Matryoshka-trained: a prefix of the vector is itself a usable embedding.
+EMBEDDING_MODELS = {
+    "text-embedding-ada-002": {"dim": 1536, "matryoshka": False},
+    "text-embedding-3-small": {"dim": 1536, "matryoshka": True},
+    "text-embedding-3-large": {"dim": 3072, "matryoshka": True},
+}
+
+LEGACY_EMBEDDING_MODEL = "text-embedding-ada-002"  # What artifacts without model metadata were built with
+
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", LEGACY_EMBEDDING_MODEL)
+EMBEDDING_DIMENSIONS = int(os.getenv("EMBEDDING_DIMENSIONS", "0")) or None
+
+# Per-request limits of the embeddings API; batches are packed by the chunks' precomputed token counts
+EMBED_BATCH_MAX_TOKENS = 250_000
+EMBED_BATCH_MAX_INPUTS = 2048
+
+# Local model used by the Pinecone and ChromaDB indexes
+HF_EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+HF_EMBEDDING_DIM = 384
+SENTENCE_BATCH_SIZE = 256  # Sentences per forward pass when embedding for semantic chunking (CPU-friendly)
+
+# Where a chunk came from, stored as metadata next to it (see provenance.py)
+CHUNK_POSITION_FIELDS = ("char_start", "char_end", "byte_start", "byte_end", "page_start", "page_end", "token_count")
+PAGE_MARKER_LINE_PATTERN = re.compile(PAGE_MARKER_PATTERN.pattern + r"\n?")
+
+
+def embedding_text(text):
+    """
+    A chunk's text as it is embedded: without the parsers' page markers, which would only add noise
+    to the vector. The stored chunk keeps them, so its span still matches the Markdown.
+    """
+    return PAGE_MARKER_LINE_PATTERN.sub("", text).strip() or text
+
+
+@lru_cache(maxsize=1)
+def get_hf_embeddings():
+    """
+    Loads the sentence-transformers model once per process and shares it between indexers.
+    Documents are embedded without page markers (see embedding_text), also when LangChain embeds them.
+    """
+    from langchain.embeddings.huggingface import HuggingFaceEmbeddings
+
+    class ChunkEmbeddings(HuggingFaceEmbeddings):
+        def embed_documents(self, texts):
+            return super().embed_documents([embedding_text(text) for text in texts])
+
+    # Only traced on a cache miss: a load span under a request means the model was loaded for it
+    with span("embed.load_model", {"embedding.model": HF_EMBEDDING_MODEL}):
+        return ChunkEmbeddings(model_name=HF_EMBEDDING_MODEL)
+
+
+def embed_sentences(sentences, batch_size=SENTENCE_BATCH_SIZE):
+    """
+    Embeds many short texts with the local model in large batches and returns an (n, 384) float32
+    matrix of unit vectors, so row dot products are cosine similarities. Reuses the indexers' model.
+    """
+    if not sentences:
+        return np.zeros((0, HF_EMBEDDING_DIM), dtype=np.float32)
+    # The LangChain wrapper encodes with the default batch size; call the underlying SentenceTransformer directly
+    encoder = get_hf_embeddings().client
+    with span("embed.sentences", {"embedding.provider": "huggingface", "embedding.model": HF_EMBEDDING_MODEL, "embedding.inputs": len(sentences),
+                                  "embedding.batch_size": batch_size}):
+        vectors = encoder.encode([embedding_text(sentence) for sentence in sentences], batch_size=batch_size, convert_to_numpy=True,
+                                 normalize_embeddings=True, show_progress_bar=False)
+    return np.asarray(vectors, dtype=np.float32)
+
+
+def resolve_embedding_config(model=None, dimensions=None):
+    """
+    Validates a model/dimension pair and fills in defaults.
+    Returns (model, dim) where dim is the size of the vectors the model will return.
+    """
+    model = model or EMBEDDING_MODEL
+    dimensions = dimensions if dimensions is not None else (EMBEDDING_DIMENSIONS if model == EMBEDDING_MODEL else None)
+
+    if model not in EMBEDDING_MODELS:
+        raise ValueError(f"Unknown embedding model: {model}")
+
+    spec = EMBEDDING_MODELS[model]
+    if dimensions is None or dimensions == spec["dim"]:
+        return model, spec["dim"]
+
+    if not spec["matryoshka"]:
+        raise ValueError(f"{model} has a fixed output size of {spec['dim']} and cannot return {dimensions} dimensions.")
+    if not 0 < dimensions < spec["dim"]:
+        raise ValueError(f"{model} supports 1-{spec['dim']} dimensions, got {dimensions}.")
+    return model, dimensions
+
+
+def embed_texts(texts, model=None, dimensions=None):
+    """Embeds a list of texts (without page markers) in one API call with the given model and output size."""
+    model, dim = resolve_embedding_config(model, dimensions)
+    kwargs = {"dimensions": dim} if dim != EMBEDDING_MODELS[model]["dim"] else {}
+    with span("embed.openai", {"embedding.provider": "openai", "embedding.model": model, "embedding.dim": dim, "embedding.inputs": len(texts)}) as embed_span:
+        response = openai.embeddings.create(input=[embedding_text(text) for text in texts], model=model, **kwargs)
+        usage = getattr(response, "usage", None)
+        embed_span.set_attribute("embedding.tokens", getattr(usage, "total_tokens", None))
+    return [item.embedding for item in response.data]
+
+
+def chunk_content(chunk):
+    """Text of a chunk, whether it is a plain string or a chunk record from chunking.py."""
+    return chunk.get("content", "") if isinstance(chunk, dict) else chunk
+
+
+def chunk_position(chunk):
+    """
+    Character and byte span in the source document, page range and token count stored on a chunk
+    record, as metadata to keep next to the chunk in every store ({} for plain-string chunks; unknown
+    values are left out).
+    """
+    if not isinstance(chunk, dict):
+        return {}
+    return {key: chunk[key] for key in CHUNK_POSITION_FIELDS if chunk.get(key) is not None}
+
+
+def chunk_token_count(chunk):
+    """
+    Token count stored on a chunk record by the chunker. Plain-string chunks (older chunked files)
+    fall back to a conservative estimate instead of being re-tokenized.
+    """
+    if isinstance(chunk, dict) and chunk.get("token_count") is not None:
+        return chunk["token_count"]
+    return len(chunk_content(chunk)) // 3 + 1
+
+
+def token_batches(token_counts, max_tokens=EMBED_BATCH_MAX_TOKENS, max_inputs=EMBED_BATCH_MAX_INPUTS):
+    """Yields (start, end) index ranges whose summed token counts fit in one embeddings request."""
+    start, batch_tokens = 0, 0
+    for i, count in enumerate(token_counts):
+        if i > start and (batch_tokens + count > max_tokens or i - start >= max_inputs):
+            yield start, i
+            start, batch_tokens = i, 0
+        batch_tokens += count
+    if start < len(token_counts):
+        yield start, len(token_counts)
+
+
+def embed_chunks(chunks, model=None, dimensions=None):
+    """Embeds chunks (strings or chunk records) in as few API calls as the per-request token limit allows."""
+    texts = [chunk_content(chunk) for chunk in chunks]
+    embeddings = []
+    for start, end in token_batches([chunk_token_count(chunk) for chunk in chunks]):
+        embeddings.extend(embed_texts(texts[start:end], model=model, dimensions=dimensions))
+    return embeddings
+
+
+def truncate_embedding(embedding, dimensions):
+    """
+    Matryoshka truncation: keep the first `dimensions` values and re-normalize.
+    Only meaningful for Matryoshka-trained models (text-embedding-3-*); works on a vector or a matrix.
+    """
+    truncated = np.asarray(embedding, dtype=np.float32)[..., :dimensions]
+    norms = np.linalg.norm(truncated, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return truncated / norms
+
+
+def check_dimensions(query_dim, chunk_dim, chunk_model=None):
+    """Refuses to compare vectors of different sizes (i.e. built with a different model or dimension setting)."""
+    if query_dim != chunk_dim:
+        source = f" ({chunk_model})" if chunk_model else ""
+        raise ValueError(
+            f"Embedding dimension mismatch: query has {query_dim} dims but stored chunks{source} have {chunk_dim}. "
+            "Re-embed the file or query with the same model and dimensions."
+        )
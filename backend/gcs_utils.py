@@ -1,24 +1,66 @@
 from google.cloud import storage
+from google.api_core.exceptions import PreconditionFailed
 from fastapi.responses import StreamingResponse
 import io
+import json
+import os
+# The backend imports its modules flat; the root scrapers import this one as backend.gcs_utils
+try:
+    from tracing import span
+except ImportError:
+    from backend.tracing import span
 
 # Set your GCS bucket name
 BUCKET_NAME = "pdfstorage_1"
 
-# Initialize the GCS client
-storage_client = storage.Client()
-bucket = storage_client.bucket(BUCKET_NAME)
+# "gcs" (default) or "local": a directory on disk with the same layout, for offline runs and benchmarks
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "gcs")
+LOCAL_STORAGE_DIR = os.getenv("LOCAL_STORAGE_DIR", "./local_storage")
 
-def upload_to_gcs(file_stream, destination_blob_name: str, content_type: str = "text/markdown") -> str:
+if STORAGE_BACKEND == "local":
+    try:
+        from local_storage import LocalBucket
+    except ImportError:
+        from backend.local_storage import LocalBucket
+    bucket = LocalBucket(LOCAL_STORAGE_DIR)
+elif STORAGE_BACKEND == "gcs":
+    # Initialize the GCS client
+    storage_client = storage.Client()
+    bucket = storage_client.bucket(BUCKET_NAME)
+else:
+    raise ValueError(f"Unknown STORAGE_BACKEND: {STORAGE_BACKEND}. Choose from gcs, local.")
+
+def blob_url(blob_name: str) -> str:
+    """URL of a stored file: its public GCS URL, or a file:// URL with the local backend."""
+    if STORAGE_BACKEND == "local":
+        return bucket.blob(blob_name).public_url
+    return f"https://storage.googleapis.com/{BUCKET_NAME}/{blob_name}"
+
+def upload_to_gcs(file_stream, destination_blob_name: str, content_type: str = "text/markdown", metadata: dict = None) -> str:
     """Uploads an in-memory file to Google Cloud Storage and returns the file URL."""
     
     # Ensure the file is saved directly under the `outputs/` folder
     destination_blob_name = f"{destination_blob_name}"  # No need for pdf_files/ folder
     
     blob = bucket.blob(destination_blob_name)
-    blob.upload_from_file(file_stream, content_type=content_type)
+    if metadata:
+        blob.metadata = {key: str(value) for key, value in metadata.items()}  # Custom metadata values must be strings
+    with span("gcs.upload", {"gcs.blob": destination_blob_name}) as upload_span:
+        start = file_stream.tell()
+        blob.upload_from_file(file_stream, content_type=content_type)
+        upload_span.set_attribute("gcs.bytes", file_stream.tell() - start)
     
-    return f"https://storage.googleapis.com/{BUCKET_NAME}/{destination_blob_name}"
+    return blob_url(destination_blob_name)
+
+def open_gcs_writer(destination_blob_name: str, content_type: str = "application/pdf", chunk_size: int = 8 * 1024 * 1024):
+    """
+    Opens a file-like writer backed by a GCS resumable upload; each `chunk_size` bytes written
+    are sent as one upload request, so large files never have to be held in memory.
+    Returns (writer, file URL); the upload is finalized when the writer is closed.
+    """
+    blob = bucket.blob(destination_blob_name)
+    writer = blob.open("wb", content_type=content_type, chunk_size=chunk_size)
+    return writer, blob_url(destination_blob_name)
 
 def list_files_in_gcs(folder_name: str = ""):
     """Lists all files in the specified folder in the GCS bucket."""
@@ -26,18 +68,85 @@ def list_files_in_gcs(folder_name: str = ""):
     # Filter by folder prefix
     prefix = f"{folder_name}/" if folder_name else ""
     
-    files = [blob.name for blob in bucket.list_blobs(prefix=prefix)]
+    with span("gcs.list", {"gcs.prefix": prefix}) as list_span:
+        files = [blob.name for blob in bucket.list_blobs(prefix=prefix)]
+        list_span.set_attribute("gcs.files", len(files))
     
     return files
 
+def list_blob_generations(folder_name: str = ""):
+    """Lists files in the specified folder with their GCS generation (changes on every overwrite)."""
+    prefix = f"{folder_name}/" if folder_name else ""
+    with span("gcs.list", {"gcs.prefix": prefix}) as list_span:
+        generations = {blob.name: blob.generation for blob in bucket.list_blobs(prefix=prefix)}
+        list_span.set_attribute("gcs.files", len(generations))
+    return generations
+
+def get_blob_info(file_name: str):
+    """
+    Returns the stored generation, size, base64 MD5 and custom metadata of a file,
+    or None if it doesn't exist. Only fetches object metadata, not content.
+    """
+    with span("gcs.get_metadata", {"gcs.blob": file_name}) as metadata_span:
+        blob = bucket.get_blob(file_name)
+        metadata_span.set_attribute("gcs.found", blob is not None)
+    if blob is None:
+        return None
+    return {
+        "generation": blob.generation,
+        "size": blob.size,
+        "md5_hash": blob.md5_hash,
+        "metadata": blob.metadata or {}
+    }
+
+def read_json_from_gcs(file_name: str):
+    """Reads a JSON file from GCS. Returns (data, generation), or (None, None) if it doesn't exist."""
+    with span("gcs.download", {"gcs.blob": file_name}) as download_span:
+        blob = bucket.get_blob(file_name)
+        if blob is None:
+            download_span.set_attribute("gcs.found", False)
+            return None, None
+        download_span.set_attribute("gcs.bytes", blob.size)
+        text = blob.download_as_text()
+    return json.loads(text), blob.generation
+
+def write_json_to_gcs(data, file_name: str, if_generation_match: int = None):
+    """
+    Writes a JSON file to GCS. With `if_generation_match` the write only succeeds if the stored
+    file is still at that generation (0 = must not exist yet), so concurrent writers can't
+    silently overwrite each other; returns False when that precondition fails.
+    """
+    blob = bucket.blob(file_name)
+    payload = json.dumps(data, indent=4).encode("utf-8")
+    with span("gcs.upload", {"gcs.blob": file_name, "gcs.bytes": len(payload)}) as upload_span:
+        try:
+            blob.upload_from_string(payload, content_type="application/json", if_generation_match=if_generation_match)
+        except PreconditionFailed:
+            upload_span.set_attribute("gcs.precondition_failed", True)
+            return False
+    return True
+
 def get_file_content(file_name):
     """Fetches the content of a markdown file from GCS."""
     blob = bucket.blob(file_name)
-    return blob.download_as_text()
+    with span("gcs.download", {"gcs.blob": file_name}) as download_span:
+        data = blob.download_as_bytes()
+        download_span.set_attribute("gcs.bytes", len(data))
+    return data.decode("utf-8")
+
+def download_byte_range(file_name, start, end):
+    """Fetches bytes [start, end) of a file with one ranged read (fewer if the file ends first)."""
+    blob = bucket.blob(file_name)
+    with span("gcs.download", {"gcs.blob": file_name, "gcs.range_start": start, "gcs.range_end": end}) as download_span:
+        data = blob.download_as_bytes(start=start, end=end - 1)  # GCS ranges include the end byte
+        download_span.set_attribute("gcs.bytes", len(data))
+    return data
 
 def download_file_from_gcs(file_name):
     """Fetches the file from GCS and returns its content as bytes."""
     blob = bucket.blob(file_name)
-    file_data = blob.download_as_bytes()  # Fetch the file as bytes
+    with span("gcs.download", {"gcs.blob": file_name}) as download_span:
+        file_data = blob.download_as_bytes()  # Fetch the file as bytes
+        download_span.set_attribute("gcs.bytes", len(file_data))
     
     return file_data  # Return the file content as bytes
@@ -4,7 +4,11 @@ import re
 import os
 from dotenv import load_dotenv
 from io import BytesIO
-from gcs_utils import upload_to_gcs  # Import the GCS upload function
+from gcs_utils import upload_to_gcs, list_blob_generations  # Import the GCS upload function
+from partitions import partition_from_path
+from quantization import encode_int8_embedding, save_float32_matrix
+from embedding_models import embed_texts, embed_chunks, resolve_embedding_config, chunk_content, chunk_position
+from sections import section_fields
 
 # Load environment variables from .env file
 load_dotenv(dotenv_path=".env")
@@ -12,47 +16,89 @@ load_dotenv(dotenv_path=".env")
 # Set OpenAI API key globally using the environment variable
 openai.api_key = os.getenv('OPENAI_API_KEY')
 
-def get_embedding(text):
-    """Generates embedding using OpenAI model with the new SDK syntax."""
-    response = openai.embeddings.create(
-        input=[text],  
-        model="text-embedding-ada-002"
-    )
-    return response.data[0].embedding
+# Artifact storage mode: "none" keeps float lists in the JSON, "int8" stores base64 int8 codes
+# plus a per-chunk scale, with the float32 vectors in a compact .npy sidecar for re-ranking
+EMBEDDING_QUANTIZATION = os.getenv("EMBEDDING_QUANTIZATION", "none")
 
-def process_and_store_embeddings(content_dict, original_file_name):
-    """Generates embeddings, stores them in memory, and uploads to GCS with a cleaned-up file name."""
-    
-    all_chunks = []
-    
-    for filename, chunks in content_dict.items():
-        quarter = re.search(r'Q\d_\d{4}', filename)  # Extract quarter info from filename
-        quarter = quarter.group() if quarter else "Unknown"
-
-        for chunk in chunks:
-            embedding = get_embedding(chunk)
-            all_chunks.append({
-                "text": chunk,
-                "embedding": embedding,
-                "filename": filename,
-                "quarter": quarter
-            })
+# Embedding artifacts live under this prefix; the ANN index and int8 sidecars under its _*/ folders
+EMBEDDINGS_PREFIX = "embeddings"
 
-    # Convert processed embeddings to JSON
-    embeddings_json_str = json.dumps(all_chunks, ensure_ascii=False, indent=4)
-    
-    # Convert string to bytes for uploading
-    file_stream = BytesIO(embeddings_json_str.encode('utf-8'))  
+def get_embedding(text, model=None, dimensions=None):
+    """Generates embedding using OpenAI model with the new SDK syntax (model/dimensions default to EMBEDDING_MODEL/EMBEDDING_DIMENSIONS)."""
+    return embed_texts([text], model=model, dimensions=dimensions)[0]
 
+def quarter_tag_from_path(path):
+    """Builds the "Q3_2023" quarter tag from a pdf_files/{year}/{quarter}/ style path."""
+    partition = partition_from_path(path)
+    if not partition:
+        return "Unknown"
+    year, quarter = partition.split("-")
+    return f"{quarter}_{year}"
+
+def is_embedding_artifact(blob_name):
+    """True for embedding artifact JSONs, false for the index/sidecar files kept under embeddings/_*/."""
+    return blob_name.endswith(".json") and "/_" not in blob_name
+
+def list_embedding_artifacts(prefix=EMBEDDINGS_PREFIX):
+    """{artifact name: GCS generation} for every embedding artifact under `prefix`."""
+    return {name: generation for name, generation in list_blob_generations(prefix).items() if is_embedding_artifact(name)}
+
+def rerank_sidecar_name(artifact_blob_name):
+    """GCS path of the float32 re-ranking sidecar for an int8 artifact."""
+    base_name = os.path.splitext(os.path.basename(artifact_blob_name))[0]
+    return f"{EMBEDDINGS_PREFIX}/_f32/{base_name}.npy"
+
+def quarter_from_filename(filename):
+    """Quarter tag for a chunk's source file: an explicit Q3_2023 in the name, else derived from the path."""
+    quarter = re.search(r'Q\d_\d{4}', filename)  # Extract quarter info from filename
+    return quarter.group() if quarter else quarter_tag_from_path(filename)
+
+def build_embedding_item(chunk, filename, quarter, chunk_index, embedding, model, dimensions, quantization="none"):
+    """One artifact item: the chunk (string or chunk record), where it came from, and its (possibly int8-encoded) embedding."""
+    item = {
+        "text": chunk_content(chunk),
+        "filename": filename,
+        "quarter": quarter,
+        "chunk_index": chunk_index,
+        "embedding_model": model,
+        "embedding_dim": dimensions
+    }
+    item.update(chunk_position(chunk))  # Lets the context builder merge overlapping chunks
+    item.update(section_fields(chunk))
+    if quantization == "int8":
+        item["embedding_int8"], item["embedding_scale"] = encode_int8_embedding(embedding)
+    else:
+        item["embedding"] = embedding
+    return item
+
+def embedding_artifact_name(original_file_name):
+    """embeddings/{base}_{Q3_2023}.json for a chunked file path."""
     # ✅ Extract only the base name (remove .pdf.json or .json)
     base_name = os.path.basename(original_file_name)  # Extract file name
     base_name = re.sub(r"\.pdf\.json$|\.json$", "", base_name)  # Remove `.pdf.json` or `.json`
+    # Keep the quarter in the name: every quarter's filing has the same base name (e.g. Form_10-Q)
+    quarter_tag = quarter_tag_from_path(original_file_name)
+    if quarter_tag != "Unknown" and quarter_tag not in base_name:
+        base_name = f"{base_name}_{quarter_tag}"
     cleaned_file_name = f"{base_name}.json"  # Add only `.json`
 
-    destination_blob_name = f"embeddings/{cleaned_file_name}"  # Store under /embeddings/
+    return f"{EMBEDDINGS_PREFIX}/{cleaned_file_name}"  # Store under /embeddings/
+
+def upload_embedding_artifact(items, original_file_name, float_vectors=None):
+    """Uploads artifact items (plus the float32 sidecar for int8 artifacts) to GCS and returns the file URL."""
+    # Convert processed embeddings to JSON
+    embeddings_json_str = json.dumps(items, ensure_ascii=False, indent=4)
+    
+    # Convert string to bytes for uploading
+    file_stream = BytesIO(embeddings_json_str.encode('utf-8'))  
+
+    destination_blob_name = embedding_artifact_name(original_file_name)
 
     # Upload the embeddings file to GCS
     try:
+        if float_vectors:
+            upload_to_gcs(save_float32_matrix(float_vectors), rerank_sidecar_name(destination_blob_name),
+                          content_type="application/octet-stream")
         file_url = upload_to_gcs(file_stream, destination_blob_name, content_type="application/json")
         print(f"✅ Embeddings uploaded successfully to GCS: {file_url}")
         return file_url
@@ -60,5 +106,35 @@ def process_and_store_embeddings(content_dict, original_file_name):
         print(f"❌ Error uploading to GCS: {e}")
         raise ValueError(f"Error uploading to GCS: {e}")
 
+def process_and_store_embeddings(content_dict, original_file_name, quantization=None, model=None, dimensions=None):
+    """
+    Generates embeddings, stores them in memory, and uploads to GCS with a cleaned-up file name.
+    `content_dict` maps a source file to its chunks (strings or chunk records with token counts).
+    Every item records the embedding model and dimension so search can refuse mismatched queries.
+    """
+    
+    quantization = quantization or EMBEDDING_QUANTIZATION
+    if quantization not in ("none", "int8"):
+        raise ValueError(f"Unknown quantization mode: {quantization}")
+
+    model, dimensions = resolve_embedding_config(model, dimensions)
+
+    all_chunks = []
+    float_vectors = []
+    
+    for filename, chunks in content_dict.items():
+        quarter = quarter_from_filename(filename)
+
+        # ✅ Batched by the chunks' stored token counts: a few API calls per file instead of one per chunk
+        embeddings = embed_chunks(chunks, model=model, dimensions=dimensions)
+
+        for chunk_index, (chunk, embedding) in enumerate(zip(chunks, embeddings)):
+            all_chunks.append(build_embedding_item(chunk, filename, quarter, chunk_index, embedding,
+                                                   model, dimensions, quantization))
+            if quantization == "int8":
+                float_vectors.append(embedding)
+
+    return upload_embedding_artifact(all_chunks, original_file_name, float_vectors)
+
 if __name__ == "__main__":
     pass  # This script will be called from main.py
@@ -1,9 +1,16 @@
 import os
-import re
+import math
 import openai
-from langchain.vectorstores import Chroma
-from langchain.embeddings.huggingface import HuggingFaceEmbeddings
+import chromadb
 from dotenv import load_dotenv  
+from partitions import partition_from_query, partitions_from_chroma_collections, chroma_collection_name, fan_out, tier_collection_base
+from embedding_models import get_hf_embeddings
+from sections import resolve_section_filter
+from tracing import span, llm_usage_attributes
+from context_builder import build_context
+from reranker import rerank, RERANK_ENABLED, RERANK_CANDIDATES
+from summary_tier import route_query, SUMMARY_TOP_K
+from provenance import citations
 
 load_dotenv(dotenv_path=".env")  # ✅ Load .env file
 
@@ -17,67 +24,159 @@ if not OPENAI_API_KEY:
 # ✅ Initialize OpenAI Client (Fixed!)
 client = openai.OpenAI(api_key=OPENAI_API_KEY)
 
+# ✅ Resolve which partition collections a query should search
+def resolve_collections(chroma_client, query, collection_name="json-index", partition=None):
+    """
+    Routes a query to its year/quarter collection. Falls back to every partition collection
+    (plus the unpartitioned base collection) when no quarter is named or it is not indexed.
+    """
+    if partition is not None:
+        return [chroma_collection_name(collection_name, partition)]
+
+    existing = [c if isinstance(c, str) else c.name for c in chroma_client.list_collections()]
+    partitions = partitions_from_chroma_collections(collection_name, existing)
+
+    partition = partition_from_query(query)
+    if partition and partition in partitions:
+        return [chroma_collection_name(collection_name, partition)]
+
+    collections = [chroma_collection_name(collection_name, p) for p in partitions]
+    if collection_name in existing:
+        collections.append(collection_name)
+    return collections or [collection_name]
+
+# ✅ Retrieval half of the pipeline (no LLM call), also used by the retrieval benchmark
+def retrieve_chromadb(query, chroma_client, embeddings, collection_name="json-index", top_k=5, partition=None, section=None,
+                      tier="chunks", query_embedding=None):
+    """
+    Searches the ChromaDB partition collections for the query and returns the top chunks, best first,
+    as dicts with `text`, `score` and the stored metadata (source, partition, section fields).
+
+    Args:
+        chroma_client: A chromadb client (persistent in the app, in-memory in the benchmark).
+        embeddings: The embedding model (anything with `embed_query`).
+        partition (str, optional): Year-quarter partition to search (default: routed from the query).
+        section (str, optional): Filing section filter ("Item 7", "mda", ...); strict when given,
+            preferred (not required) when the query names a section.
+        tier (str): "chunks" (raw chunks) or "summaries" (section/document summaries).
+        query_embedding (list, optional): The query's embedding when already computed (batch questions).
+    """
+    # ✅ Route to the quarter's collection, or fan out in parallel across all of them
+    with span("vector.route", {"vector.store": "chromadb"}) as route_span:
+        collections = resolve_collections(chroma_client, query, tier_collection_base(collection_name, tier), partition)
+        route_span.set_attribute("vector.partitions", len(collections))
+    print(f"🗂️ Searching collections: {collections}")
+
+    # ✅ Embed the query once and reuse it for every collection
+    if query_embedding is None:
+        with span("embed.query", {"embedding.model": getattr(embeddings, "model_name", None)}):
+            query_embedding = embeddings.embed_query(query)
+
+    # ✅ Section metadata filter (set on chunks from the "markdown" chunker)
+    section_field, section_value, strict_section = resolve_section_filter(query, section)
+    metadata_filter = {section_field: section_value} if section_field else None
+
+    def search_collection(name, metadata_filter=metadata_filter):
+        collection = chroma_client.get_or_create_collection(name=name)
+        kwargs = {"where": metadata_filter} if metadata_filter else {}
+        with span("vector.query", {"vector.store": "chromadb", "vector.partition": name, "vector.top_k": top_k,
+                                   "vector.filtered": metadata_filter is not None}) as query_span:
+            response = collection.query(query_embeddings=[query_embedding], n_results=top_k,
+                                        include=["documents", "metadatas", "distances"], **kwargs)
+            query_span.set_attribute("vector.matches", len(response["documents"][0]))
+        # Same distance → relevance mapping LangChain's Chroma store used, so scores stay comparable
+        return [
+            {"text": text, "score": 1.0 - distance / math.sqrt(2), **(metadata or {}), "id": id_}
+            for id_, text, metadata, distance in zip(response["ids"][0], response["documents"][0], response["metadatas"][0],
+                                                     response["distances"][0])
+        ]
+
+    semantic_results = fan_out(search_collection, collections)
+    if not semantic_results and metadata_filter and not strict_section:
+        print(f"⚠️ No chunks tagged {section_field}={section_value}, searching all sections")
+        semantic_results = fan_out(lambda name: search_collection(name, None), collections)
+
+    # ✅ Deduplicate and sort by score
+    unique_docs = {}
+    for result in semantic_results:
+        if result["text"] not in unique_docs or result["score"] > unique_docs[result["text"]]["score"]:
+            unique_docs[result["text"]] = result
+
+    return sorted(unique_docs.values(), key=lambda result: result["score"], reverse=True)[:top_k]
+
+# ✅ Retrieval for one question: summary tier or raw chunks, optionally reranked
+def retrieve_for_query(query, chroma_client, collection_name="json-index", top_k=5, partition=None, section=None,
+                       rerank_results=RERANK_ENABLED, tier="auto", query_embedding=None):
+    """The chunks (or summaries) to answer a question from; see query_chromadb_with_gpt for the options."""
+    # ✅ Broad questions go to the summary tier, specific ones (or no summaries indexed) to raw chunks
+    results = []
+    if route_query(query, tier) == "summaries":
+        results = retrieve_chromadb(query, chroma_client, get_hf_embeddings(), collection_name, min(top_k, SUMMARY_TOP_K),
+                                    partition, section, tier="summaries", query_embedding=query_embedding)
+        print(f"🗂️ Summary tier: {len(results)} summaries")
+    if not results:
+        candidates = max(top_k, RERANK_CANDIDATES) if rerank_results else top_k
+        results = retrieve_chromadb(query, chroma_client, get_hf_embeddings(), collection_name, candidates, partition, section,
+                                    query_embedding=query_embedding)
+        if rerank_results:
+            results = rerank(query, results, top_n=top_k)
+    return results
+
+# ✅ Generation half: one GPT-4o call over a context from build_context
+def answer_with_context(query, built):
+    with span("llm.chat", {"llm.provider": "openai", "llm.model": "gpt-4o", "llm.context_chunks": len(built["chunks"]),
+                           "llm.context_tokens": built["tokens"]}) as llm_span:
+        response = client.chat.completions.create(
+            model="gpt-4o",
+            messages=[
+                {"role": "system", "content": "You are an AI financial assistant that answers questions based on reports."},
+                {"role": "user", "content": f"Context:\n{built['context']}\n\nQuestion: {query}\nAnswer based on the above context:"}
+            ]
+        )
+        llm_span.set_attributes(llm_usage_attributes(response))
+    return response.choices[0].message.content
+
 # ✅ Hybrid Search Function for ChromaDB
-def query_chromadb_with_gpt(query, collection_name="json-index", persist_directory="./chroma_langchain_db", top_k=5):
+def query_chromadb_with_gpt(query, collection_name="json-index", persist_directory="./chroma_langchain_db", top_k=5, partition=None,
+                            section=None, rerank_results=RERANK_ENABLED, tier="auto", return_sources=False):
     """
     Query ChromaDB with a hybrid search (semantic + keyword-based) and generate an answer using GPT-4o.
 
     Args:
         query (str): The question/query from the user.
-        collection_name (str): Name of the ChromaDB collection.
+        collection_name (str): Base name of the ChromaDB collection.
         persist_directory (str): Directory where the ChromaDB vector store is stored.
         top_k (int): Number of top search results to retrieve.
+        partition (str, optional): Year-quarter partition to search (default: routed from the query).
+        section (str, optional): Filing section to restrict the search to, e.g. "Item 7" or "mda"
+            (default: preferred, not required, when the query names one).
+        rerank_results (bool): Retrieve RERANK_CANDIDATES chunks and keep the `top_k` a cross-encoder
+            scores best (see reranker).
+        tier (str): "auto" answers broad questions from the section/document summaries and specific ones
+            from raw chunks (see summary_tier); "chunks" or "summaries" force one tier.
+        return_sources (bool): Also return citations for the chunks in the context (see provenance).
 
     Returns:
-        str: The generated answer from GPT-4o based on retrieved context.
+        str: The generated answer from GPT-4o based on retrieved context, or with `return_sources`
+        a dict with the `answer` and its `citations` (document, page, char/byte span of each chunk).
     """
 
-    # ✅ Load vector store from disk
-    vector_store = Chroma(
-        collection_name=collection_name,
-        embedding_function=HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2"),
-        persist_directory=persist_directory
-    )
-
-    # ✅ Perform semantic search (vector-based)
-    semantic_results = vector_store.similarity_search_with_relevance_scores(query, k=top_k)
-
-    # ✅ Perform keyword-based search (fallback)
-    keyword_results = vector_store.similarity_search_with_relevance_scores(query, k=top_k)
-
-    # ✅ Combine results with weights
-    combined = []
-    for doc, score in semantic_results:
-        combined.append((doc.page_content, 0.7 * score))
-    for doc, score in keyword_results:
-        combined.append((doc.page_content, 0.3 * score))
+    # ✅ Share one client and embedding model across all partition collections
+    chroma_client = chromadb.PersistentClient(path=persist_directory)
+    results = retrieve_for_query(query, chroma_client, collection_name, top_k, partition, section, rerank_results, tier)
 
-    # ✅ Deduplicate and sort by weighted score
-    unique_docs = {}
-    for content, weighted_score in combined:
-        if content not in unique_docs or weighted_score > unique_docs[content]:
-            unique_docs[content] = weighted_score
-
-    sorted_results = sorted(unique_docs.items(), key=lambda x: x[1], reverse=True)
-    top_chunks = [item[0] for item in sorted_results[:top_k]]
-
-    if not top_chunks:
-        return "I couldn't find relevant information in the database."
+    if not results:
+        answer = "I couldn't find relevant information in the database."
+        return {"answer": answer, "citations": []} if return_sources else answer
 
-    # ✅ Prepare context for GPT-4o
-    context = "\n\n".join(top_chunks)
+    # ✅ Prepare context for GPT-4o: overlapping chunks merged, within the token budget
+    built = build_context(results)
 
     # ✅ Generate answer using GPT-4o (Fixed API)
-    response = client.chat.completions.create(
-        model="gpt-4o",
-        messages=[
-            {"role": "system", "content": "You are an AI financial assistant that answers questions based on reports."},
-            {"role": "user", "content": f"Context:\n{context}\n\nQuestion: {query}\nAnswer based on the above context:"}
-        ]
-    )
-
-    return response.choices[0].message.content
+    answer = answer_with_context(query, built)
+    return {"answer": answer, "citations": citations(built["chunks"])} if return_sources else answer
 
-# ✅ Example Usage
-query_result = query_chromadb_with_gpt("What is the Revenue for Q1 2025")
-print("\n💡 Answer:\n", query_result)
+# ✅ Example Usage (only when run directly, never on import)
+if __name__ == "__main__":
+    query_result = query_chromadb_with_gpt("What is the Revenue for Q1 2025")
+    print("\n💡 Answer:\n", query_result)
@@ -2,9 +2,15 @@ import os
 import re
 import openai
 from pinecone import Pinecone
-from langchain.vectorstores import Pinecone as PineconeVectorStore
-from langchain.embeddings.huggingface import HuggingFaceEmbeddings
 from dotenv import load_dotenv  # Load environment variables
+from partitions import partition_from_query, fan_out, tier_namespace, namespace_tier
+from embedding_models import get_hf_embeddings
+from sections import resolve_section_filter
+from tracing import span, llm_usage_attributes
+from context_builder import build_context
+from reranker import rerank, RERANK_ENABLED, RERANK_CANDIDATES
+from summary_tier import route_query, SUMMARY_TOP_K
+from provenance import citations
 
 # ✅ Load .env file
 load_dotenv(dotenv_path=".env")
@@ -24,70 +30,152 @@ def extract_quarter(query):
         return match.group(1).upper(), match.group(2)  # Returns ("Q3", "2023")
     return None, None
 
-# ✅ Hybrid Search Function for GPT-4o
-def query_pinecone_with_gpt(query, index_name="json-index", region="us-east-1", top_k=5):
-    """ Query Pinecone with hybrid search (semantic + keyword-based) and generate an answer using GPT-4o. """
-
+# ✅ Resolve which namespaces a query should search
+def resolve_namespaces(index, query, namespace=None, tier="chunks"):
+    """
+    Routes a query to its year/quarter namespace within a retrieval tier. Falls back to every
+    namespace of the tier when no quarter is named (or the named quarter has not been indexed yet).
+    """
+    if namespace is not None:
+        return [tier_namespace(namespace, tier)]
+
+    stats = index.describe_index_stats()
+    available = [ns for ns in (stats.namespaces or {}).keys() if namespace_tier(ns) == tier]
+
+    partition = partition_from_query(query)
+    if partition and tier_namespace(partition, tier) in available:
+        return [tier_namespace(partition, tier)]
+
+    return available or [tier_namespace(None, tier) or ""]
+
+# ✅ Retrieval half of the pipeline (no LLM call), also used by the retrieval benchmark
+def retrieve_pinecone(query, index, embeddings, top_k=5, namespace=None, section=None, tier="chunks", query_embedding=None):
+    """
+    Searches a Pinecone index for the query and returns the top chunks, best first, as dicts with
+    `text`, `score` and the stored metadata (source, partition, section fields).
+
+    Args:
+        index: A Pinecone index (anything with `query` and `describe_index_stats`).
+        embeddings: The embedding model (anything with `embed_query`).
+        namespace (str, optional): Partition to search (default: routed from the query).
+        section (str, optional): Filing section filter ("Item 7", "mda", ...); strict when given,
+            preferred (not required) when the query names a section.
+        tier (str): "chunks" (raw chunks) or "summaries" (section/document summaries).
+        query_embedding (list, optional): The query's embedding when already computed (batch questions).
+    """
     quarter, year = extract_quarter(query)
-
-    # ✅ Initialize Pinecone Client
-    pc = Pinecone(api_key=PINECONE_API_KEY)
-
-    # ✅ Load Pinecone index
-    index = pc.Index(index_name)
-
-    # ✅ Load Embeddings
-    embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
-
-    # ✅ Initialize Vector Store
-    vector_store = PineconeVectorStore(index=index, embedding=embeddings, text_key="page_content")
-
-    # ✅ Initialize Retriever
-    retriever = vector_store.as_retriever(search_kwargs={"k": top_k})
-
-    # ✅ Perform Hybrid Search
-    semantic_results = retriever.get_relevant_documents(query)
-    keyword_results = vector_store.similarity_search(query, k=top_k)
-
-    # ✅ Merge & Weight Results (Semantic: 70%, Keyword: 30%)
-    ranked_results = [(doc.page_content, 0.7) for doc in semantic_results] + \
-                     [(doc.page_content, 0.3) for doc in keyword_results]
-
-    # ✅ Sort & Deduplicate Results
+    section_field, section_value, strict_section = resolve_section_filter(query, section)
+
+    # ✅ Route to the quarter's namespace, or fan out in parallel across all of them
+    with span("vector.route", {"vector.store": "pinecone"}) as route_span:
+        namespaces = resolve_namespaces(index, query, namespace, tier)
+        route_span.set_attribute("vector.partitions", len(namespaces))
+    print(f"🗂️ Searching namespaces: {namespaces}")
+
+    # ✅ Embed the query once and reuse it for every namespace
+    if query_embedding is None:
+        with span("embed.query", {"embedding.model": getattr(embeddings, "model_name", None)}):
+            query_embedding = embeddings.embed_query(query)
+
+    # ✅ Section metadata filter (set on chunks from the "markdown" chunker)
+    metadata_filter = {section_field: {"$eq": section_value}} if section_field else None
+
+    def search_namespace(ns, metadata_filter=metadata_filter):
+        with span("vector.query", {"vector.store": "pinecone", "vector.partition": ns, "vector.top_k": top_k,
+                                   "vector.filtered": metadata_filter is not None}) as query_span:
+            response = index.query(vector=query_embedding, top_k=top_k, namespace=ns or "", filter=metadata_filter, include_metadata=True)
+            query_span.set_attribute("vector.matches", len(response.matches))
+        return [({**(match.metadata or {}), "id": match.id}, match.score) for match in response.matches]
+
+    scored_results = fan_out(search_namespace, namespaces)
+    if not scored_results and metadata_filter and not strict_section:
+        print(f"⚠️ No chunks tagged {section_field}={section_value}, searching all sections")
+        scored_results = fan_out(lambda ns: search_namespace(ns, None), namespaces)
+
+    # ✅ Sort & Deduplicate Results (highest score kept per chunk)
     unique_results = {}
-    for content, score in sorted(ranked_results, key=lambda x: x[1], reverse=True):
-        unique_results[content] = score  # Ensures highest score is kept
+    for metadata, score in sorted(scored_results, key=lambda x: x[1], reverse=True):
+        text = metadata.get("page_content", "")
+        if text and text not in unique_results:
+            unique_results[text] = {"text": text, "score": score, **{k: v for k, v in metadata.items() if k != "page_content"}}
 
     # ✅ Extract Final Sorted List
-    final_results = list(unique_results.keys())[:top_k]
-
-    # ✅ Debugging: Print Retrieved Chunks
-    print("🔍 Retrieved Chunks (before filtering):", final_results)
+    final_results = list(unique_results.values())[:top_k]
 
     # ✅ Quarter-Year Filtering (Fix: Don't remove all results!)
     if quarter and year:
-        pattern = re.compile(rf"{quarter}.*{year}", re.IGNORECASE)
-        priority_results = [doc for doc in final_results if pattern.search(doc)]
-        final_results = priority_results if priority_results else final_results  # Avoid empty list
+        with span("filter.quarter", {"filter.input": len(final_results)}) as filter_span:
+            pattern = re.compile(rf"{quarter}.*{year}", re.IGNORECASE)
+            priority_results = [result for result in final_results if pattern.search(result["text"])]
+            final_results = priority_results if priority_results else final_results  # Avoid empty list
+            filter_span.set_attribute("filter.matched", len(priority_results))
+
+    return final_results
+
+# ✅ Retrieval for one question: summary tier or raw chunks, optionally reranked
+def retrieve_for_query(query, index, top_k=5, namespace=None, section=None, rerank_results=RERANK_ENABLED, tier="auto",
+                       query_embedding=None):
+    """The chunks (or summaries) to answer a question from; see query_pinecone_with_gpt for the options."""
+    # ✅ Broad questions go to the summary tier, specific ones (or no summaries indexed) to raw chunks
+    final_results = []
+    if route_query(query, tier) == "summaries":
+        final_results = retrieve_pinecone(query, index, get_hf_embeddings(), min(top_k, SUMMARY_TOP_K), namespace, section,
+                                          tier="summaries", query_embedding=query_embedding)
+        print(f"🗂️ Summary tier: {len(final_results)} summaries")
+    if not final_results:
+        candidates = max(top_k, RERANK_CANDIDATES) if rerank_results else top_k
+        final_results = retrieve_pinecone(query, index, get_hf_embeddings(), candidates, namespace, section,
+                                          query_embedding=query_embedding)
+        if rerank_results:
+            final_results = rerank(query, final_results, top_n=top_k)
+    return final_results
+
+# ✅ Generation half: one GPT-4o call over a context from build_context
+def answer_with_context(query, built):
+    with span("llm.chat", {"llm.provider": "openai", "llm.model": "gpt-4o", "llm.context_chunks": len(built["chunks"]),
+                           "llm.context_tokens": built["tokens"]}) as llm_span:
+        response = client.chat.completions.create(
+            model="gpt-4o",
+            messages=[
+                {"role": "system", "content": "You are an AI financial assistant that answers questions based on reports."},
+                {"role": "user", "content": f"Context:\n{built['context']}\n\nQuestion: {query}\nAnswer based on the above context:"}
+            ]
+        )
+        llm_span.set_attributes(llm_usage_attributes(response))
+    return response.choices[0].message.content
 
-    # ✅ Final Debugging
-    print("🔍 Final Chunks (after filtering):", final_results)
+# ✅ Hybrid Search Function for GPT-4o
+def query_pinecone_with_gpt(query, index_name="json-index", region="us-east-1", top_k=5, namespace=None, section=None,
+                            rerank_results=RERANK_ENABLED, tier="auto", return_sources=False):
+    """
+    Query Pinecone with hybrid search (semantic + keyword-based) and generate an answer using GPT-4o.
+    `section` ("Item 7", "mda", ...) restricts the search to one filing section; without it, a section
+    named in the query is preferred but not required. With `rerank_results`, RERANK_CANDIDATES chunks
+    are retrieved and a cross-encoder keeps the best `top_k` (see reranker). `tier` "auto" answers broad
+    questions from the section/document summaries and specific ones from raw chunks (see summary_tier).
+    With `return_sources`, returns {"answer", "citations"}: the document, page and char/byte span of
+    every chunk in the context (see provenance), instead of the answer alone.
+    """
 
-    if not final_results:
-        return f"I couldn't find relevant information for {quarter} {year}."
+    quarter, year = extract_quarter(query)
 
-    # ✅ Prepare context for GPT-4o
-    top_chunks = "\n\n".join(final_results[:3])
+    # ✅ Initialize Pinecone Client and load the index
+    pc = Pinecone(api_key=PINECONE_API_KEY)
+    index = pc.Index(index_name)
 
-    # ✅ Generate answer using GPT-4o
-    response = client.chat.completions.create(
-        model="gpt-4o",
-        messages=[
-            {"role": "system", "content": "You are an AI financial assistant that answers questions based on reports."},
-            {"role": "user", "content": f"Context:\n{top_chunks}\n\nQuestion: {query}\nAnswer based on the above context:"}
-        ]
-    )
+    # ✅ Retrieve with the shared embedding model (loaded once per process)
+    final_results = retrieve_for_query(query, index, top_k, namespace, section, rerank_results, tier)
 
-    return response.choices[0].message.content
+    # ✅ Final Debugging
+    print("🔍 Final Chunks (after filtering):", [result["text"] for result in final_results])
 
+    if not final_results:
+        answer = f"I couldn't find relevant information for {quarter} {year}."
+        return {"answer": answer, "citations": []} if return_sources else answer
+
+    # ✅ Prepare context for GPT-4o: overlapping chunks merged, within the token budget
+    built = build_context(final_results)
 
+    # ✅ Generate answer using GPT-4o
+    answer = answer_with_context(query, built)
+    return {"answer": answer, "citations": citations(built["chunks"])} if return_sources else answer
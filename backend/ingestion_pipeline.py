@@ -0,0 +1,250 @@
+import asyncio
+import time
+from gcs_utils import download_file_from_gcs, get_blob_info, get_file_content, list_files_in_gcs
+from pdf_parser import pdf_bytes_to_markdown, upload_markdown, markdown_blob_name, needs_reparse
+from chunking import chunk_text, chunked_blob_name, upload_chunked_data
+from embedding_models import embed_chunks, resolve_embedding_config, get_hf_embeddings, chunk_content
+from gen_embedding import build_embedding_item, upload_embedding_artifact, quarter_from_filename, EMBEDDING_QUANTIZATION
+from Pinecone_v2 import upsert_embedded_chunks
+from chromadb_v2 import upsert_embedded_chunks_chromadb
+from summary_tier import build_summaries, index_summaries
+from map_reduce_summary import SUMMARY_PROVIDERS
+
+# parse → chunk → summarize → embed → index, with a fetch stage in front to pull the PDF from GCS
+# (summarize only does work when the summary tier is enabled)
+STAGES = ("fetch", "parse", "chunk", "summarize", "embed", "index")
+STAGE_UNITS = {"fetch": "bytes", "parse": "characters", "chunk": "chunks", "summarize": "summaries", "embed": "chunks", "index": "vectors"}
+DEFAULT_WORKERS = {"fetch": 4, "parse": 2, "chunk": 2, "summarize": 2, "embed": 2, "index": 2}
+
+# "pinecone"/"chroma" embed locally with all-MiniLM-L6-v2; "embeddings" writes OpenAI embedding artifacts
+# to embeddings/ in GCS (what /fetch_embedded_file_content and /search_corpus read)
+TARGETS = ("pinecone", "chroma", "embeddings")
+
+QUEUE_SIZE = 4  # Bounded queues: a slow stage holds back the ones before it instead of buffering every PDF in memory
+EMBED_BATCH_SIZE = 256  # Chunks per local (MiniLM) embedding call; OpenAI calls are batched by token count
+_DONE = object()  # End-of-stream marker, one per downstream worker
+
+
+class StageStats:
+    """Per-stage counters: documents and items processed, time spent working, and wall-clock span."""
+
+    def __init__(self, name, workers):
+        self.name = name
+        self.workers = workers
+        self.documents = 0
+        self.items = 0
+        self.errors = 0
+        self.busy_seconds = 0.0
+        self.first_start = None
+        self.last_end = None
+
+    def record(self, start, end, items):
+        self.documents += 1
+        self.items += items
+        self.busy_seconds += end - start
+        self.first_start = start if self.first_start is None else min(self.first_start, start)
+        self.last_end = end if self.last_end is None else max(self.last_end, end)
+
+    def summary(self):
+        wall = (self.last_end - self.first_start) if self.first_start is not None else 0.0
+        return {
+            "workers": self.workers,
+            "documents": self.documents,
+            "errors": self.errors,
+            "items": self.items,
+            "unit": STAGE_UNITS[self.name],
+            "busy_seconds": round(self.busy_seconds, 3),
+            "wall_seconds": round(wall, 3),
+            "documents_per_sec": round(self.documents / wall, 3) if wall else None,
+            "items_per_sec": round(self.items / wall, 3) if wall else None,
+            # Close to 1.0 means every worker was busy the whole time: the stage is the bottleneck
+            "utilization": round(self.busy_seconds / (wall * self.workers), 3) if wall else None
+        }
+
+
+class IngestionPipeline:
+    """
+    Streams PDFs from GCS through parse → chunk → (summarize) → embed → index. Stages are connected by in-memory
+    queues and each runs its own pool of workers, so one document can be embedding while the next is
+    still being parsed. Intermediate outputs are only written to GCS when `checkpoint` is set (the same
+    outputs/ and chunked_outputs/ files the manual endpoints produce). A PDF whose outputs/ Markdown was
+    parsed from its current generation is not downloaded or parsed again unless `force` is set.
+    """
+
+    def __init__(self, target="pinecone", strategy="fixed", chunk_size=None, chunk_overlap=None, checkpoint=False,
+                 index_name="json-index", region="us-east-1", model=None, dimensions=None, quantization=None, workers=None,
+                 summaries=False, summary_provider="gpt", force=False):
+        if target not in TARGETS:
+            raise ValueError(f"Unknown target: {target}. Choose one of {', '.join(TARGETS)}.")
+        if summaries and target == "embeddings":
+            raise ValueError("The summary tier is indexed into pinecone or chroma; use one of those targets.")
+        if summary_provider not in SUMMARY_PROVIDERS:
+            raise ValueError(f"Unknown summary provider: {summary_provider}. Choose from {', '.join(SUMMARY_PROVIDERS)}.")
+
+        self.target = target
+        self.strategy = strategy
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.checkpoint = checkpoint
+        self.force = force  # Re-download and re-parse PDFs even when their Markdown is current
+        self.index_name = index_name
+        self.region = region
+        self.quantization = quantization or EMBEDDING_QUANTIZATION
+        self.summaries = summaries  # Also build the section/document summary tier (summary_tier.py)
+        self.summary_provider = summary_provider
+        if target == "embeddings":
+            self.model, self.dimensions = resolve_embedding_config(model, dimensions)
+        self.workers = {**DEFAULT_WORKERS, **(workers or {})}
+
+    # --- Stages: each takes a document dict, returns it (with large inputs dropped) and an item count ---
+
+    def fetch(self, doc):
+        info = get_blob_info(doc["pdf_name"])
+        doc["generation"] = info["generation"] if info else None
+        # ✅ Unchanged PDFs keep their generation: reuse the Markdown parsed from it instead of re-parsing
+        if not self.force and not needs_reparse(doc["pdf_name"], doc["filename"]):
+            doc["markdown"] = get_file_content(markdown_blob_name(doc["filename"]))
+            return doc, len(doc["markdown"])
+        doc["pdf_bytes"] = download_file_from_gcs(doc["pdf_name"])
+        return doc, len(doc["pdf_bytes"])
+
+    def parse(self, doc):
+        if "markdown" in doc:  # Loaded from outputs/ by fetch
+            return doc, len(doc["markdown"])
+        doc["markdown"] = pdf_bytes_to_markdown(doc.pop("pdf_bytes"))
+        if self.checkpoint:
+            upload_markdown(doc["markdown"], doc["filename"], doc["generation"])
+        return doc, len(doc["markdown"])
+
+    def chunk(self, doc):
+        # Chunk records carry their token counts, so the embed stage can batch without re-tokenizing
+        doc["chunks"] = chunk_text(doc.pop("markdown"), self.strategy, self.chunk_size, self.chunk_overlap)
+        if self.checkpoint:
+            upload_chunked_data(doc["chunks"], doc["chunk_path"])
+        return doc, len(doc["chunks"])
+
+    def summarize(self, doc):
+        if not self.summaries:
+            return doc, 0
+        doc["summaries"] = build_summaries(doc["chunks"], doc["chunk_path"], self.summary_provider)
+        return doc, len(doc["summaries"])
+
+    def embed(self, doc):
+        if doc.get("summaries"):
+            doc["summary_embeddings"] = get_hf_embeddings().embed_documents([record["content"] for record in doc["summaries"]])
+        if self.target == "embeddings":
+            embeddings = embed_chunks(doc["chunks"], model=self.model, dimensions=self.dimensions)
+        else:
+            texts = [chunk_content(chunk) for chunk in doc["chunks"]]
+            embeddings = []
+            for start in range(0, len(texts), EMBED_BATCH_SIZE):
+                embeddings.extend(get_hf_embeddings().embed_documents(texts[start:start + EMBED_BATCH_SIZE]))
+        doc["embeddings"] = embeddings
+        return doc, len(embeddings)
+
+    def index(self, doc):
+        chunks, embeddings = doc.pop("chunks"), doc.pop("embeddings")
+        if self.target == "pinecone":
+            count = upsert_embedded_chunks(chunks, embeddings, self.index_name, region=self.region, source_path=doc["chunk_path"])
+        elif self.target == "chroma":
+            count = upsert_embedded_chunks_chromadb(chunks, embeddings, source_path=doc["chunk_path"])
+        else:
+            quarter = quarter_from_filename(doc["chunk_path"])
+            items = [
+                build_embedding_item(chunk, doc["chunk_path"], quarter, i, embedding, self.model, self.dimensions, self.quantization)
+                for i, (chunk, embedding) in enumerate(zip(chunks, embeddings))
+            ]
+            upload_embedding_artifact(items, doc["chunk_path"], embeddings if self.quantization == "int8" else None)
+            count = len(items)
+        if doc.get("summaries"):
+            count += index_summaries(doc.pop("summaries"), doc.pop("summary_embeddings"), self.target, doc["chunk_path"],
+                                     self.index_name, self.region)
+        doc["indexed"] = count
+        return doc, count
+
+    # --- Orchestration ---
+
+    async def _run_stage(self, name, inbox, outbox, downstream_workers, stats, failures, completed):
+        fn = getattr(self, name)
+
+        async def worker():
+            while (doc := await inbox.get()) is not _DONE:
+                start = time.perf_counter()
+                try:
+                    # Stages block on CPU (PyMuPDF, tokenizing) or network (GCS, embedding APIs); keep them off the loop
+                    doc, items = await asyncio.to_thread(fn, doc)
+                except Exception as e:
+                    stats.errors += 1
+                    failures.append({"file": doc["pdf_name"], "stage": name, "error": str(e)})
+                    print(f"❌ {name} failed for {doc['pdf_name']}: {e}")
+                    continue
+                stats.record(start, time.perf_counter(), items)
+                if outbox is not None:
+                    await outbox.put(doc)
+                else:
+                    completed.append({"file": doc["pdf_name"], "indexed": doc["indexed"]})
+
+        await asyncio.gather(*(worker() for _ in range(stats.workers)))
+        if outbox is not None:
+            for _ in range(downstream_workers):
+                await outbox.put(_DONE)
+
+    async def run(self, pdf_names):
+        """Runs every PDF through the pipeline and returns a per-stage throughput report."""
+        pdf_names = list(pdf_names)
+        queues = [asyncio.Queue(maxsize=QUEUE_SIZE) for _ in STAGES]
+        stats = {name: StageStats(name, max(1, int(self.workers[name]))) for name in STAGES}
+        failures, completed = [], []
+
+        async def produce():
+            for pdf_name in pdf_names:
+                filename = pdf_name[len("pdf_files/"):] if pdf_name.startswith("pdf_files/") else pdf_name
+                await queues[0].put({
+                    "pdf_name": pdf_name,
+                    "filename": filename,
+                    # Same chunked_outputs/ path /fetch_file writes, used as the source id in every index
+                    "chunk_path": chunked_blob_name(f"chunked_{markdown_blob_name(filename)}")
+                })
+            for _ in range(stats[STAGES[0]].workers):
+                await queues[0].put(_DONE)
+
+        print(f"🚚 Ingesting {len(pdf_names)} PDFs into {self.target} ({self.strategy} chunking, checkpoints {'on' if self.checkpoint else 'off'})")
+        start = time.perf_counter()
+        await asyncio.gather(
+            produce(),
+            *(
+                self._run_stage(
+                    name, queues[i],
+                    queues[i + 1] if i + 1 < len(STAGES) else None,
+                    stats[STAGES[i + 1]].workers if i + 1 < len(STAGES) else 0,
+                    stats[name], failures, completed
+                )
+                for i, name in enumerate(STAGES)
+            )
+        )
+        elapsed = time.perf_counter() - start
+
+        print(f"✅ Ingested {len(completed)}/{len(pdf_names)} PDFs in {elapsed:.1f}s")
+        return {
+            "target": self.target,
+            "documents": len(pdf_names),
+            "succeeded": len(completed),
+            "completed": completed,
+            "failed": failures,
+            "wall_seconds": round(elapsed, 3),
+            "documents_per_sec": round(len(completed) / elapsed, 3) if elapsed else None,
+            "stages": {name: stats[name].summary() for name in STAGES}
+        }
+
+
+def list_pdfs(folder_name="pdf_files"):
+    """Every PDF under the scraped-filings folder."""
+    return [name for name in list_files_in_gcs(folder_name) if name.lower().endswith(".pdf")]
+
+
+async def run_ingestion(pdf_names=None, **options):
+    """Ingests the given PDFs (default: everything under pdf_files/) with an IngestionPipeline built from `options`."""
+    pipeline = IngestionPipeline(**options)
+    if pdf_names is None:
+        pdf_names = await asyncio.to_thread(list_pdfs)
+    return await pipeline.run(pdf_names)
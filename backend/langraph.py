@@ -27,6 +27,7 @@ workflow.set_entry_point("web_search")
 # Compile the graph
 graph = workflow.compile()
 
-# Run the Web Search Agent
-result = graph.invoke({"query": "NVIDIA AI market trends"})
-print(result["web_results"])
+# Run the Web Search Agent (only when run directly: importing the graph must not call the search API)
+if __name__ == "__main__":
+    result = graph.invoke({"query": "NVIDIA AI market trends"})
+    print(result["web_results"])
@@ -0,0 +1,121 @@
+import base64
+import hashlib
+import json
+import os
+import shutil
+from google.api_core.exceptions import NotFound, PreconditionFailed
+
+# Custom metadata lives next to the files, in a folder list_blobs never returns
+METADATA_DIR = ".metadata"
+
+
+class LocalBlob:
+    """
+    A file under the local storage root with the subset of the GCS Blob API that gcs_utils uses.
+    The generation is the file's modification time in nanoseconds, so it changes on every overwrite.
+    """
+
+    def __init__(self, bucket, name):
+        self.bucket = bucket
+        self.name = name
+        self.path = os.path.join(bucket.root, name)
+        self.metadata = None
+
+    @property
+    def _metadata_path(self):
+        return os.path.join(self.bucket.root, METADATA_DIR, f"{self.name}.json")
+
+    @property
+    def generation(self):
+        return os.stat(self.path).st_mtime_ns if os.path.exists(self.path) else None
+
+    @property
+    def size(self):
+        return os.path.getsize(self.path)
+
+    @property
+    def md5_hash(self):
+        """Base64 MD5 of the content, like GCS reports it."""
+        digest = hashlib.md5()
+        with open(self.path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+        return base64.b64encode(digest.digest()).decode("ascii")
+
+    @property
+    def public_url(self):
+        return f"file://{os.path.abspath(self.path)}"
+
+    def _load_metadata(self):
+        if os.path.exists(self._metadata_path):
+            with open(self._metadata_path, encoding="utf-8") as f:
+                self.metadata = json.load(f)
+        return self
+
+    def _save_metadata(self):
+        if self.metadata:
+            os.makedirs(os.path.dirname(self._metadata_path), exist_ok=True)
+            with open(self._metadata_path, "w", encoding="utf-8") as f:
+                json.dump(self.metadata, f)
+        elif os.path.exists(self._metadata_path):
+            os.remove(self._metadata_path)
+
+    def _check_generation(self, if_generation_match):
+        if if_generation_match is not None and (self.generation or 0) != if_generation_match:
+            raise PreconditionFailed(f"{self.name} is not at generation {if_generation_match}")
+
+    def open(self, mode="rb", content_type=None, chunk_size=None):
+        if "w" in mode:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._save_metadata()
+        return open(self.path, mode)
+
+    def upload_from_file(self, file_stream, content_type=None, if_generation_match=None):
+        self._check_generation(if_generation_match)
+        with self.open("wb") as f:
+            shutil.copyfileobj(file_stream, f)
+
+    def upload_from_string(self, data, content_type=None, if_generation_match=None):
+        self._check_generation(if_generation_match)
+        with self.open("wb") as f:
+            f.write(data.encode("utf-8") if isinstance(data, str) else data)
+
+    def download_as_bytes(self, start=None, end=None):
+        """Whole file, or bytes start..end inclusive like GCS ranged downloads."""
+        if not os.path.isfile(self.path):
+            raise NotFound(f"{self.name} does not exist")
+        with open(self.path, "rb") as f:
+            if start is None and end is None:
+                return f.read()
+            f.seek(start or 0)
+            return f.read() if end is None else f.read(max(end - (start or 0) + 1, 0))
+
+    def download_as_text(self):
+        return self.download_as_bytes().decode("utf-8")
+
+
+class LocalBucket:
+    """
+    Stands in for a GCS bucket with a directory on local disk (STORAGE_BACKEND=local), so the
+    ingestion code and benchmarks run without GCS credentials or network access.
+    """
+
+    def __init__(self, root):
+        self.root = os.path.abspath(root)  # Created on the first write
+
+    def blob(self, name):
+        return LocalBlob(self, name)
+
+    def get_blob(self, name):
+        blob = LocalBlob(self, name)
+        return blob._load_metadata() if os.path.isfile(blob.path) else None
+
+    def list_blobs(self, prefix=""):
+        blobs = []
+        for root, dirs, files in os.walk(self.root):
+            dirs[:] = sorted(d for d in dirs if os.path.relpath(os.path.join(root, d), self.root) != METADATA_DIR)
+            for name in sorted(files):
+                blob_name = os.path.relpath(os.path.join(root, name), self.root).replace(os.sep, "/")
+                if blob_name.startswith(prefix):
+                    blobs.append(LocalBlob(self, blob_name))
+        return blobs
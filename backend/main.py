@@ -1,28 +1,83 @@
-from fastapi import FastAPI, HTTPException, UploadFile, File, Query,Form
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, HTTPException, UploadFile, File, Query,Form, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel
-from pdf_parser import pdf_to_markdown  # Your existing pdf_to_markdown function
-from gcs_utils import list_files_in_gcs, download_file_from_gcs,get_file_content
-from chunking import process_and_upload_chunked_data
-from gen_embedding import process_and_store_embeddings
+from pdf_parser import pdf_to_markdown, needs_reparse, markdown_blob_name  # Your existing pdf_to_markdown function
+from gcs_utils import list_files_in_gcs, download_file_from_gcs,get_file_content, get_blob_info, blob_url
+from chunking import process_and_upload_chunked_data, CHUNKING_STRATEGIES
+from gen_embedding import process_and_store_embeddings, list_embedding_artifacts
+from embedding_models import chunk_content
 from io import BytesIO
 import json
 from search import search_from_content,generate_response
+from ann_index import build_corpus_index, search_corpus_ann, recall_at_k
+from corpus_search import search_corpus, quantization_report
 import os
 from Pinecone_v2 import index_json_content
 from chromadb_v2 import index_json_chromadb
+from ingestion_pipeline import run_ingestion
+from batch_chunking import run_batch_chunking
 from hybrid_search_pinecone_gpt_v2 import query_pinecone_with_gpt
 from hybrid_search_chromadb_gpt_v2 import query_chromadb_with_gpt
+from reranker import RERANK_ENABLED
+from map_reduce_summary import summarize_file, load_chunks, SUMMARY_PROVIDERS, SUMMARY_MAX_WORKERS, SUMMARY_FAN_IN
+from summary_tier import summarize_and_index
+from provenance import read_source_span
+from batch_qa import validate_batch, store_pipeline, answer_batch, BATCH_LLM_CONCURRENCY
 from new_docling import process_pdf
 import shutil
 from pathlib import Path
 from mistral_ocr_local import process_pdf_mistral
-from typing import Dict
+from typing import Dict, List, Optional
 from langraph import graph
+from tracing import span, end_span, NOOP_SPAN
+from metrics import HTTP_REQUESTS_IN_PROGRESS, route_template, latest_metrics
 
 
 app = FastAPI()
 
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    """
+    Root span for every request; the stage spans (GCS, parse, chunk, embed, search, LLM) nest under it,
+    and metrics.py turns the finished spans into Prometheus metrics. The span (and the in-flight gauge)
+    stays open until the response body has been sent, so streamed responses like /ask_batch are timed in full.
+    """
+    route = route_template(request)
+    in_progress = HTTP_REQUESTS_IN_PROGRESS.labels(request.method, route)
+    request_span = NOOP_SPAN
+
+    def finish():
+        end_span(request_span)
+        in_progress.dec()
+
+    in_progress.inc()
+    try:
+        with span("http.request", {"http.method": request.method, "http.route": route,
+                                   "http.target": request.url.path}, end_on_exit=False) as request_span:
+            response = await call_next(request)
+            request_span.set_attribute("http.status_code", response.status_code)
+    except BaseException:
+        finish()
+        raise
+    if request_span.trace_id:
+        response.headers["X-Trace-Id"] = request_span.trace_id  # Look the request's spans up by this id
+    response.body_iterator = body_then(response.body_iterator, finish)
+    return response
+
+async def body_then(body_iterator, callback):
+    """Passes a response body through, then calls `callback` once it has been sent (or the client went away)."""
+    try:
+        async for chunk in body_iterator:
+            yield chunk
+    finally:
+        callback()
+
+@app.get("/metrics")
+def metrics():
+    """Prometheus metrics: per-route latency, in-flight requests, stage latencies, tokens, cache hits, GCS bytes, RSS."""
+    body, content_type = latest_metrics()
+    return Response(content=body, media_type=content_type)
+
 @app.get("/")
 def read_root():
     return {"message": "Welcome to the FastAPI PDF Processing & Q/A Service"}
@@ -75,7 +130,7 @@ async def process_pdf_mistral(request: PDFRequest) -> Dict[str, str]:
         raise HTTPException(status_code=500, detail=f"Error processing PDF: {str(e)}")
 
 # Helper function to handle BytesIO and pass the original file name
-async def pdf_to_markdown_from_bytes(file: BytesIO, filename: str):
+async def pdf_to_markdown_from_bytes(file: BytesIO, filename: str, source_generation=None):
     """Extracts text from a PDF-like object and returns it as markdown."""
     
     # Create a mock UploadFile from the BytesIO object
@@ -89,27 +144,37 @@ async def pdf_to_markdown_from_bytes(file: BytesIO, filename: str):
 
     # Pass the BytesIO as a mock UploadFile object to the original pdf_to_markdown function
     mock_file = MockUploadFile(file, filename)
-    return await pdf_to_markdown(mock_file)
+    return await pdf_to_markdown(mock_file, source_generation)
 
 @app.get("/parse_gcs_pdf/")
-async def parse_gcs_pdf(file_name: str = Query(...), parse_method: str = Query("pymupdf", enum=["pymupdf", "mistral", "docling"])):
-    """Parse a selected PDF file from GCS."""
+async def parse_gcs_pdf(file_name: str = Query(...), parse_method: str = Query("pymupdf", enum=["pymupdf", "mistral", "docling"]),
+                        force: bool = False):
+    """Parse a selected PDF file from GCS. Skips PDFs whose Markdown is already up to date unless `force` is set."""
     try:
+        pdf_name = file_name
+        if file_name.startswith("pdf_files/"):
+            file_name = file_name[len("pdf_files/"):]
+
+        # ✅ Unchanged PDFs keep their GCS generation, so the existing Markdown is still current
+        if parse_method == "pymupdf" and not force and not needs_reparse(pdf_name, file_name):
+            md_filename = markdown_blob_name(file_name)
+            return {"markdown_content": {"gcs_url": blob_url(md_filename)}, "reparsed": False}
+
+        pdf_info = get_blob_info(pdf_name)
+
         # Download the file content as bytes from GCS
-        file_content = download_file_from_gcs(file_name)  # This returns file content as bytes
+        file_content = download_file_from_gcs(pdf_name)  # This returns file content as bytes
       
         if not file_content:
             raise HTTPException(status_code=404, detail="File not found in GCS")
-        
-        if file_name.startswith("pdf_files/"):
-            file_name = file_name[len("pdf_files/"):]
 
         # Convert the byte content into a file-like object using BytesIO
         file_like_object = BytesIO(file_content)
         
         # Call the corresponding parsing method based on the `parse_method` parameter
         if parse_method == "pymupdf":
-            markdown_content = await pdf_to_markdown_from_bytes(file_like_object, file_name)
+            markdown_content = await pdf_to_markdown_from_bytes(file_like_object, file_name,
+                                                                 pdf_info["generation"] if pdf_info else None)
         elif parse_method == "mistral":
             print("awaiting code")
         elif parse_method == "docling":
@@ -120,7 +185,7 @@ async def parse_gcs_pdf(file_name: str = Query(...), parse_method: str = Query("
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error while parsing the PDF: {str(e)}")
     
-    return {"markdown_content": markdown_content}
+    return {"markdown_content": markdown_content, "reparsed": True}
 
 @app.get("/list_extracted_files")
 def list_files_in_pdf_folder():
@@ -132,7 +197,7 @@ def list_files_in_pdf_folder():
 @app.get("/fetch_file/")
 async def fetch_file_from_gcs(
     file_name: str = Query(None, description="File name to fetch"),
-    strategy: str = Query("fixed", enum=["fixed", "sentence", "sliding"], description="Chunking strategy")
+    strategy: str = Query("fixed", enum=list(CHUNKING_STRATEGIES), description="Chunking strategy")
 ):
     """Fetch the content of a file from GCS and process it with chunking."""
     
@@ -171,20 +236,26 @@ def list_files_in_chunked_folder():
     return {"files": files}
 
 @app.get("/fetch_file_content")
-def fetch_file_content(file_name: str):
-    """Fetch the content of a file from GCS, generate embeddings, and upload the result to GCS."""
+def fetch_file_content(file_name: str, model: str = None, dimensions: int = None):
+    """
+    Fetch the content of a file from GCS, generate embeddings, and upload the result to GCS.
+    `model`/`dimensions` override EMBEDDING_MODEL/EMBEDDING_DIMENSIONS (e.g. text-embedding-3-small at 512).
+    """
     try:
         # Fetch file content using the get_file_content function from gcs_utils.py
         content = get_file_content(file_name)
 
-        # Prepare content to pass to gen_embedding
-        content_dict = {file_name: [content]}  # Assuming the content is in a list format
+        # Prepare content to pass to gen_embedding: one entry per chunk so each chunk gets
+        # its own stored embedding that search can reuse
+        # (chunk records keep their token counts, which gen_embedding uses to batch the API calls)
+        chunked_data = json.loads(content)
+        content_dict = {file_name: [chunk for chunk in chunked_data.get("chunks", []) if chunk_content(chunk)]}
         
         # Define the destination blob name for the embeddings file in GCS
         destination_blob_name = f"embeddings/{file_name}"
 
         # Process and upload embeddings using gen_embedding.py
-        file_url = process_and_store_embeddings(content_dict, destination_blob_name)
+        file_url = process_and_store_embeddings(content_dict, destination_blob_name, model=model, dimensions=dimensions)
         
         return {"file_name": file_name, "status": "Embeddings processed and uploaded.", "file_url": file_url}
 
@@ -194,32 +265,44 @@ def fetch_file_content(file_name: str):
 @app.get("/list_embedded_output_files")
 def list_files_in_embedded_folder():
     """List all PDF files from the 'pdf_files' folder in GCS."""
-    folder_name = "embeddings"
-    files = list_files_in_gcs(folder_name)
+    files = list(list_embedding_artifacts())  # Skips the ANN index and re-ranking sidecars
     return {"files": files}
 
 @app.get("/fetch_embedded_file_content")
-def search_embedded_file(file_name: str, query: str, quarter_filter: str = None, top_n: int = 5):
+def search_embedded_file(query: str, file_name: str = None, quarter_filter: str = None, top_n: int = 5,
+                         use_ann: bool = False, n_probe: int = 8, section: str = None):
     """
     Fetch content of an embedded file, process it, and return the search results along with the GPT-40-mini response.
+    Without a `file_name` (or with `use_ann=true`) the whole corpus is searched through the ANN index.
     """
     try:
         if not query:
             raise HTTPException(status_code=400, detail="Query parameter is required.")
 
-        # ✅ Fetch file content from GCS
-        content = get_file_content(file_name)
-
-        # ✅ Parse the JSON content into a Python dictionary
-        embedded_data = json.loads(content)
-
-        # ✅ Perform the search directly on the content
-        results = search_from_content(
-            content=embedded_data,      
-            query=query,
-            quarter_filter=quarter_filter,
-            top_n=top_n
-        )
+        if file_name is None or use_ann:
+            # ✅ Search every embedded file at once via the persisted ANN index
+            results = search_corpus_ann(
+                query=query,
+                quarter_filter=quarter_filter,
+                top_n=top_n,
+                n_probe=n_probe,
+                section=section
+            )
+        else:
+            # ✅ Fetch file content from GCS
+            content = get_file_content(file_name)
+
+            # ✅ Parse the JSON content into a Python dictionary
+            embedded_data = json.loads(content)
+
+            # ✅ Perform the search directly on the content
+            results = search_from_content(
+                content=embedded_data,      
+                query=query,
+                quarter_filter=quarter_filter,
+                top_n=top_n,
+                section=section
+            )
    
         # ✅ Generate the GPT-40-mini response using retrieved chunks
         gpt_response = generate_response(query, results)
@@ -232,17 +315,92 @@ def search_embedded_file(file_name: str, query: str, quarter_filter: str = None,
             "gpt_response": gpt_response  # Include the GPT-generated response
         }
 
+    except HTTPException as http_error:
+        raise http_error
+
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to process and search: {e}")
+
+@app.get("/search_corpus")
+def search_all_embedded_files(query: str, quarter_filter: str = None, top_n: int = 5, max_workers: int = 8,
+                              generate_answer: bool = True,
+                              quantization: str = Query(None, enum=["none", "int8"])):
+    """
+    Search every embedded file under `embeddings/` in one request (optionally restricted to a quarter)
+    and answer from the merged top results, e.g. for cross-quarter trend questions.
+    """
+    try:
+        if not query:
+            raise HTTPException(status_code=400, detail="Query parameter is required.")
+
+        # ✅ Score all files in parallel and merge the per-file top-k
+        search_result = search_corpus(
+            query=query,
+            quarter_filter=quarter_filter,
+            top_n=top_n,
+            max_workers=max_workers,
+            quantization=quantization
+        )
+        results = search_result["results"]
+
+        # ✅ Generate the GPT-40-mini response using retrieved chunks
+        gpt_response = generate_response(query, results) if generate_answer else None
+
+        return {
+            "query": query,
+            "files_searched": search_result["files_searched"],
+            "skipped_files": search_result["skipped_files"],
+            "results": results,
+            "gpt_response": gpt_response
+        }
+
+    except HTTPException as http_error:
+        raise http_error
+
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to search corpus: {e}")
+
+@app.get("/quantization_report")
+def get_quantization_report(k: int = 10, sample_size: int = 100, max_files: int = None):
+    """Report recall@k and memory of int8-quantized search (with and without float32 re-ranking) versus float32."""
+    try:
+        return quantization_report(k=k, sample_size=sample_size, max_files=max_files)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to build quantization report: {e}")
+
+@app.post("/build_ann_index")
+def build_ann_index(rebuild: bool = False, n_lists: int = None, recall_k: int = 10, n_probe: int = 8):
+    """
+    Build (or incrementally update) the ANN index over every artifact under `embeddings/`
+    and report its recall@k against brute-force search.
+    """
+    try:
+        index = build_corpus_index(rebuild=rebuild, n_lists=n_lists)
+        report = recall_at_k(index, k=recall_k, n_probe=n_probe) if len(index) else None
+        return {
+            "vectors": len(index),
+            "files": sorted(index.indexed_files),
+            "recall": report
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to build ANN index: {e}")
     
 @app.post("/index-json/")
 async def index_json(
     file_path: str = Form(...),
     index_name: str = Form("json-index"),
-    region: str = Form("us-east-1")
+    region: str = Form("us-east-1"),
+    namespace: str = Form(None)
 ):
     """
     Endpoint to index an existing JSON file from a file path into Pinecone.
+    Chunks go into the year/quarter namespace derived from the file path unless `namespace` is given.
     """
     try:
         # ✅ Fetch content from GCS (returns a string)
@@ -252,7 +410,9 @@ async def index_json(
         vector_store = index_json_content(
             json_content=content,  # Pass the file content (as string) to index_json_content
             index_name=index_name,
-            region=region
+            region=region,
+            source_path=file_path,
+            namespace=namespace
         )
 
         return JSONResponse(
@@ -268,10 +428,12 @@ async def index_json(
 
 @app.post("/index-json-chroma/")
 async def index_json_chroma(
-    file_path: str = Form(...)
+    file_path: str = Form(...),
+    partition: str = Form(None)
 ):
     """
-    Endpoint to index an existing JSON file from a file path into Pinecone.
+    Endpoint to index an existing JSON file from a file path into ChromaDB.
+    Chunks go into the year/quarter collection derived from the file path unless `partition` is given.
     """
     try:
         # ✅ Fetch content from GCS (returns a string)
@@ -279,7 +441,9 @@ async def index_json_chroma(
 
         # ✅ Index the JSON content into Pinecone
         vector_store = index_json_chromadb(
-            json_content=content  # Pass the file content (as string) to index_json_content
+            json_content=content,  # Pass the file content (as string) to index_json_content
+            source_path=file_path,
+            partition=partition
         )
 
         return JSONResponse(
@@ -293,15 +457,174 @@ async def index_json_chroma(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"❌ Failed to index: {str(e)}")
     
+@app.post("/index-summaries")
+def index_summary_tier(file_path: str, target: str = Query("pinecone", enum=["pinecone", "chroma"]),
+                       provider: str = Query("gpt", enum=list(SUMMARY_PROVIDERS)), index_name: str = "json-index"):
+    """
+    Summarize an already chunked file (chunked_outputs/*.json) per section and as a whole, and index the
+    summaries as the summary tier that broad questions are answered from.
+    """
+    try:
+        count = summarize_and_index(load_chunks(file_path), file_path, target=target, provider=provider, index_name=index_name)
+        return {"file_path": file_path, "target": target, "summaries_indexed": count}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"❌ Failed to index summaries: {str(e)}")
+
+class IngestionRequest(BaseModel):
+    file_names: Optional[List[str]] = None  # PDFs under pdf_files/; all of them when omitted
+    target: str = "pinecone"  # pinecone | chroma | embeddings
+    strategy: str = "fixed"
+    chunk_size: Optional[int] = None  # Default: the strategy's own size
+    chunk_overlap: Optional[int] = None
+    checkpoint: bool = False  # Also write outputs/ and chunked_outputs/ files to GCS
+    index_name: str = "json-index"
+    model: Optional[str] = None
+    dimensions: Optional[int] = None
+    workers: Optional[Dict[str, int]] = None  # Per-stage worker counts, e.g. {"parse": 4}
+    summaries: bool = False  # Also index section/document summaries as the summary retrieval tier
+    summary_provider: str = "gpt"  # gpt | gemini
+    force: bool = False  # Re-parse PDFs even when their outputs/ Markdown is up to date
+
+@app.post("/run_ingestion_pipeline")
+async def run_ingestion_pipeline(request: IngestionRequest):
+    """
+    Runs PDFs from GCS through parse → chunk → embed → index in one streaming pass, with the stages
+    running concurrently across documents. Returns per-stage throughput and any per-file failures.
+    With `summaries`, section and document summaries are also indexed as the summary retrieval tier.
+    PDFs whose Markdown is already current are not parsed again unless `force` is set.
+    """
+    try:
+        return await run_ingestion(
+            request.file_names,
+            target=request.target,
+            strategy=request.strategy,
+            chunk_size=request.chunk_size,
+            chunk_overlap=request.chunk_overlap,
+            checkpoint=request.checkpoint,
+            index_name=request.index_name,
+            model=request.model,
+            dimensions=request.dimensions,
+            workers=request.workers,
+            summaries=request.summaries,
+            summary_provider=request.summary_provider,
+            force=request.force
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"❌ Ingestion pipeline failed: {str(e)}")
+
+class BatchChunkingRequest(BaseModel):
+    prefix: str = "outputs"  # GCS folder of parsed Markdown
+    strategies: List[str] = ["fixed"]
+    chunk_sizes: Optional[List[int]] = None  # Several values sweep every combination
+    chunk_overlaps: Optional[List[int]] = None
+    max_workers: Optional[int] = None  # Worker processes (default: one per CPU)
+    file_names: Optional[List[str]] = None
+
+@app.post("/batch_chunk")
+def batch_chunk(request: BatchChunkingRequest):
+    """
+    Chunks every Markdown document under `prefix` with each strategy/size/overlap combination in a
+    process pool. A single configuration writes chunked_outputs/ like /fetch_file/; a sweep writes
+    chunked_sweeps/<strategy>-<size>-<overlap>/.
+    """
+    try:
+        return run_batch_chunking(
+            prefix=request.prefix,
+            strategies=request.strategies,
+            chunk_sizes=request.chunk_sizes,
+            chunk_overlaps=request.chunk_overlaps,
+            max_workers=request.max_workers,
+            file_names=request.file_names
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"❌ Batch chunking failed: {str(e)}")
+
 @app.post("/ask")
-def ask_question(query: str):
-    result = query_pinecone_with_gpt(query)
-    return {"query": query, "response": result}
+def ask_question(query: str, namespace: str = None, section: str = None, rerank: bool = RERANK_ENABLED,
+                 tier: str = Query("auto", enum=["auto", "chunks", "summaries"])):
+    try:
+        result = query_pinecone_with_gpt(query, namespace=namespace, section=section, rerank_results=rerank, tier=tier,
+                                         return_sources=True)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"query": query, "response": result["answer"], "citations": result["citations"]}
 
 @app.post("/ask-chromadb")
-def ask_question_chromadb(query: str):
-    result = query_chromadb_with_gpt(query)
-    return {"query": query, "response": result}
+def ask_question_chromadb(query: str, partition: str = None, section: str = None, rerank: bool = RERANK_ENABLED,
+                          tier: str = Query("auto", enum=["auto", "chunks", "summaries"])):
+    try:
+        result = query_chromadb_with_gpt(query, partition=partition, section=section, rerank_results=rerank, tier=tier,
+                                         return_sources=True)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"query": query, "response": result["answer"], "citations": result["citations"]}
+
+class BatchQuestionRequest(BaseModel):
+    questions: List[str]
+    store: str = "pinecone"  # pinecone | chroma
+    partition: Optional[str] = None  # Pinecone namespace / Chroma partition, e.g. "2024-Q3"
+    section: Optional[str] = None
+    rerank: bool = RERANK_ENABLED
+    tier: str = "auto"  # auto | chunks | summaries
+    top_k: int = 5
+    max_concurrency: int = BATCH_LLM_CONCURRENCY  # LLM calls in flight
+
+@app.post("/ask_batch")
+def ask_batch(request: BatchQuestionRequest):
+    """
+    Answer a set of questions in one request: one batched embedding call, parallel vector searches and
+    concurrent LLM calls. Results stream back as NDJSON, one line per question as soon as it's answered
+    (`index` is its position in `questions`), then a summary line with `done: true`.
+    """
+    try:
+        validate_batch(request.questions, request.store, request.tier, request.max_concurrency, request.section,
+                       request.top_k)
+        retrieve, answer = store_pipeline(request.store, top_k=request.top_k, partition=request.partition,
+                                          section=request.section, rerank_results=request.rerank, tier=request.tier)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to start batch: {e}")
+
+    results = answer_batch(request.questions, retrieve, answer, request.max_concurrency)
+    return StreamingResponse((json.dumps(result) + "\n" for result in results), media_type="application/x-ndjson")
+
+@app.get("/source_span")
+def get_source_span(document: str, byte_start: int, byte_end: int):
+    """
+    Exact source text behind a citation from /ask or /ask-chromadb: bytes [byte_start, byte_end) of the
+    cited Markdown document, fetched with a ranged read instead of downloading the whole filing.
+    """
+    try:
+        result = read_source_span(document, byte_start, byte_end)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to read source span: {e}")
+    if result is None:
+        raise HTTPException(status_code=404, detail=f"{document} not found in GCS")
+    return result
+
+@app.post("/summarize")
+def summarize_document(file_name: str, provider: str = Query("gpt", enum=list(SUMMARY_PROVIDERS)),
+                       strategy: str = Query("fixed", enum=list(CHUNKING_STRATEGIES), description="Chunking for Markdown files"),
+                       max_workers: int = SUMMARY_MAX_WORKERS, fan_in: int = SUMMARY_FAN_IN):
+    """
+    Summarize a long filing with map-reduce: a chunked output (chunked_outputs/*.json) or parsed Markdown
+    is summarized chunk by chunk in parallel, then combined in a tree. Unchanged chunks reuse cached summaries.
+    """
+    try:
+        return summarize_file(file_name, provider=provider, strategy=strategy, max_workers=max_workers, fan_in=fan_in)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Summarization failed: {e}")
 
 
 # Define request schema
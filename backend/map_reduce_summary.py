@@ -0,0 +1,255 @@
+"""
+Map-reduce summarization of long filings.
+
+A full 10-K doesn't fit one prompt (or is slow and expensive in one), so the chunker's output is
+summarized hierarchically: every chunk is summarized on its own, concurrently with bounded
+parallelism (map), then consecutive summaries are combined a few at a time, level by level, until
+one summary is left (reduce tree).
+
+Every summary, chunk or combined, is cached under the hash of the text it was made from, in a JSON
+file under summaries/ next to the other artifacts. Re-summarizing a document after some chunks
+changed only calls the LLM for those chunks and for the reduce nodes above them; everything else
+comes from the cache. /summarize and the section summaries share the file, so a run keeps the
+stored entries it didn't use, dropping the least recently used beyond SUMMARY_CACHE_MAX_ENTRIES.
+"""
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from chunking import chunk_text, chunked_blob_name, count_tokens
+from embedding_models import chunk_content
+from sections import section_fields
+from gcs_utils import get_file_content, read_json_from_gcs, write_json_to_gcs
+from tracing import span, in_current_context
+
+SUMMARY_PREFIX = "summaries"
+SUMMARY_PROVIDERS = ("gpt", "gemini")
+SUMMARY_MAX_WORKERS = int(os.getenv("SUMMARY_MAX_WORKERS", "8"))  # Concurrent LLM calls per level
+SUMMARY_FAN_IN = int(os.getenv("SUMMARY_FAN_IN", "8"))  # Summaries combined per reduce call
+REDUCE_MAX_TOKENS = 6000  # Input size cap of one reduce call
+SUMMARY_CACHE_MAX_ENTRIES = 5000  # Summaries kept per cache file (a 10-K has a few hundred chunks)
+
+MAP_INSTRUCTION = ("Summarize this excerpt of a financial filing. Keep figures, periods and named items "
+                   "exactly as written:")
+REDUCE_INSTRUCTION = ("Combine these summaries of consecutive parts of one financial filing into a single "
+                      "concise summary. Keep figures and periods exactly as written and drop repetition:")
+REDUCE_SEPARATOR = "\n\n---\n\n"
+
+
+def summarizer(provider):
+    """(model, summarize(text, instruction)) for a provider; imported lazily since each needs its own API key."""
+    if provider == "gpt":
+        from summarization_gpt import summarize_text_gpt, GPT_SUMMARY_MODEL
+        return GPT_SUMMARY_MODEL, summarize_text_gpt
+    if provider == "gemini":
+        from summarization_gemini import generate_summary_gemini, GEMINI_SUMMARY_MODEL
+        return GEMINI_SUMMARY_MODEL, generate_summary_gemini
+    raise ValueError(f"Unknown summary provider: {provider}. Choose from {', '.join(SUMMARY_PROVIDERS)}.")
+
+
+def content_hash(model, instruction, text):
+    """Cache key of one summary: changes with its input text, the prompt, or the model."""
+    return hashlib.sha256(f"{model}\n{instruction}\n{text}".encode("utf-8")).hexdigest()
+
+
+def summary_cache_name(file_name, provider):
+    return f"{SUMMARY_PREFIX}/{provider}/{chunked_blob_name(file_name)}"
+
+
+class SummaryCache:
+    """Summaries keyed by content hash, loaded from and saved back to one JSON file in the bucket."""
+
+    def __init__(self, blob_name):
+        self.blob_name = blob_name
+        data, self.generation = read_json_from_gcs(blob_name) if blob_name else (None, None)
+        self.stored = (data or {}).get("summaries", {})
+        self.used = {}
+        self.hits = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key in self.used:
+                return self.used[key]
+            if key in self.stored:
+                self.hits += 1
+                self.used[key] = self.stored[key]
+                return self.used[key]
+        return None
+
+    def put(self, key, summary):
+        with self._lock:
+            self.used[key] = summary
+
+    def save(self, extra=None):
+        """
+        Writes the stored entries plus this run's, least recently used first and capped at
+        SUMMARY_CACHE_MAX_ENTRIES; skipped (with a warning) if another run wrote meanwhile.
+        """
+        if not self.blob_name or self.used.keys() <= self.stored.keys():
+            return
+        summaries = {key: summary for key, summary in self.stored.items() if key not in self.used}
+        summaries.update(self.used)  # Entries used by this run move to the end
+        data = {"summaries": dict(list(summaries.items())[-SUMMARY_CACHE_MAX_ENTRIES:]), **(extra or {})}
+        if not write_json_to_gcs(data, self.blob_name, if_generation_match=self.generation or 0):
+            print(f"⚠️ {self.blob_name} changed during summarization, not overwriting it")
+
+
+def summarize_level(texts, instruction, model, summarize, cache, max_workers):
+    """Summarizes texts in parallel, calling the LLM only for texts not in the cache. Returns (summaries, calls)."""
+    keys = [content_hash(model, instruction, text) for text in texts]
+    missing = {key: text for key, text in zip(keys, texts) if cache.get(key) is None}
+
+    def summarize_one(item):
+        key, text = item
+        cache.put(key, summarize(text, instruction))
+
+    if missing:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(missing))) as executor:
+            list(executor.map(in_current_context(summarize_one), missing.items()))
+    return [cache.get(key) for key in keys], len(missing)
+
+
+def reduce_groups(summaries, fan_in, max_tokens=REDUCE_MAX_TOKENS):
+    """Splits consecutive summaries into groups of up to `fan_in` summaries and `max_tokens` tokens (at least two each)."""
+    groups, current, tokens = [], [], 0
+    for summary in summaries:
+        size = count_tokens(summary)
+        if len(current) >= 2 and (len(current) >= fan_in or tokens + size > max_tokens):
+            groups.append(current)
+            current, tokens = [], 0
+        current.append(summary)
+        tokens += size
+    groups.append(current)
+    return groups
+
+
+def reduce_trees(trees, model, summarize, cache, max_workers, fan_in):
+    """
+    Combines each list of summaries into one, level by level. The reduce calls of one level are made
+    together for all lists, so they share the worker pool. Returns (one summary per list, calls, levels).
+    """
+    trees, calls, levels = [list(tree) for tree in trees], 0, 0
+    while any(len(tree) > 1 for tree in trees):
+        grouped = [reduce_groups(tree, fan_in) if len(tree) > 1 else [tree] for tree in trees]
+        inputs = [REDUCE_SEPARATOR.join(group) for groups in grouped for group in groups if len(group) > 1]
+        combined, level_calls = summarize_level(inputs, REDUCE_INSTRUCTION, model, summarize, cache, max_workers)
+        combined = iter(combined)
+        trees = [[next(combined) if len(group) > 1 else group[0] for group in groups] for groups in grouped]
+        calls += level_calls
+        levels += 1
+    return [tree[0] for tree in trees], calls, levels
+
+
+def validate_options(max_workers, fan_in):
+    if fan_in < 2:
+        raise ValueError("fan_in must be at least 2.")
+    if max_workers < 1:
+        raise ValueError("max_workers must be at least 1.")
+
+
+def summarize_chunks(chunks, cache_name=None, provider="gpt", max_workers=SUMMARY_MAX_WORKERS, fan_in=SUMMARY_FAN_IN):
+    """
+    Summarizes a chunked document with a map step over the chunks and a tree of reduce steps.
+
+    Args:
+        chunks (list): Chunk records (or strings) in document order, as the chunker writes them.
+        cache_name (str, optional): Blob holding the summary cache (default: no persistent cache).
+        provider (str): "gpt" or "gemini".
+        max_workers (int): Maximum concurrent LLM calls.
+        fan_in (int): Maximum summaries combined by one reduce call.
+
+    Returns:
+        dict: The `summary`, plus `chunks`, `levels`, `llm_calls` and `cached` (summaries reused).
+    """
+    texts = [chunk_content(chunk) for chunk in chunks if chunk_content(chunk).strip()]
+    if not texts:
+        raise ValueError("Nothing to summarize: the document has no chunks.")
+    validate_options(max_workers, fan_in)
+    model, summarize = summarizer(provider)
+    cache = SummaryCache(cache_name)
+
+    with span("summarize.map_reduce", {"llm.provider": provider, "llm.model": model, "summary.chunks": len(texts),
+                                       "summary.fan_in": fan_in}) as summary_span:
+        try:
+            # Map: one summary per chunk; reduce: combine consecutive summaries until one is left
+            summaries, calls = summarize_level(texts, MAP_INSTRUCTION, model, summarize, cache, max_workers)
+            (summary,), reduce_calls, levels = reduce_trees([summaries], model, summarize, cache, max_workers, fan_in)
+            calls, levels = calls + reduce_calls, levels + 1
+        finally:
+            # Saved even after a failed call, so a retry only redoes what's missing
+            cache.save({"provider": provider, "model": model})
+        summary_span.set_attributes({"summary.levels": levels, "summary.llm_calls": calls, "summary.cached": cache.hits})
+
+    print(f"📝 Summarized {len(texts)} chunks in {levels} levels: {calls} LLM calls, {cache.hits} cached summaries")
+    return {"summary": summary, "chunks": len(texts), "levels": levels, "llm_calls": calls, "cached": cache.hits}
+
+
+def section_key(chunk):
+    """The filing section a chunk belongs to ("item-7", or a topic when the item is unknown), or None."""
+    fields = section_fields(chunk)
+    return fields.get("section_item") or fields.get("section_topic")
+
+
+def summarize_sections(chunks, cache_name=None, provider="gpt", max_workers=SUMMARY_MAX_WORKERS, fan_in=SUMMARY_FAN_IN):
+    """
+    Section-level and document-level summaries of a chunked filing, for the summary retrieval tier.
+    Chunks are summarized once (map); each run of consecutive chunks from one section is reduced to a
+    section summary, and the section summaries are reduced to the document summary. Shares the cache
+    (and so the chunk summaries) with `summarize_chunks`.
+
+    Returns:
+        dict: `document` summary, `sections` (section fields of each section's first chunk plus its
+        `summary`; chunks without section metadata only feed the document summary), `llm_calls`, `cached`.
+    """
+    chunks = [chunk for chunk in chunks if chunk_content(chunk).strip()]
+    if not chunks:
+        raise ValueError("Nothing to summarize: the document has no chunks.")
+    validate_options(max_workers, fan_in)
+    model, summarize = summarizer(provider)
+    cache = SummaryCache(cache_name)
+
+    # Consecutive chunks of the same section (a filing mentions each Item once)
+    groups = []
+    for chunk in chunks:
+        if groups and section_key(chunk) == groups[-1]["key"]:
+            groups[-1]["size"] += 1
+        else:
+            groups.append({"key": section_key(chunk), "fields": section_fields(chunk), "size": 1})
+
+    with span("summarize.sections", {"llm.provider": provider, "llm.model": model, "summary.chunks": len(chunks),
+                                     "summary.sections": len(groups)}) as summary_span:
+        try:
+            summaries, calls = summarize_level([chunk_content(chunk) for chunk in chunks], MAP_INSTRUCTION, model,
+                                               summarize, cache, max_workers)
+            trees, start = [], 0
+            for group in groups:
+                trees.append(summaries[start:start + group["size"]])
+                start += group["size"]
+            section_summaries, section_calls, _ = reduce_trees(trees, model, summarize, cache, max_workers, fan_in)
+            (document,), document_calls, _ = reduce_trees([section_summaries], model, summarize, cache, max_workers, fan_in)
+            calls += section_calls + document_calls
+        finally:
+            cache.save({"provider": provider, "model": model})
+        summary_span.set_attributes({"summary.llm_calls": calls, "summary.cached": cache.hits})
+
+    sections = [{**group["fields"], "summary": summary} for group, summary in zip(groups, section_summaries) if group["key"]]
+    print(f"📝 Summarized {len(chunks)} chunks into {len(sections)} sections and the document: "
+          f"{calls} LLM calls, {cache.hits} cached summaries")
+    return {"document": document, "sections": sections, "llm_calls": calls, "cached": cache.hits}
+
+
+def load_chunks(file_name, strategy="fixed"):
+    """Chunks of a stored document: a chunked output (chunked_outputs/*.json) as chunked, or parsed Markdown chunked with `strategy`."""
+    content = get_file_content(file_name)
+    if file_name.endswith(".json"):
+        return json.loads(content).get("chunks", [])
+    return chunk_text(content, strategy)
+
+
+def summarize_file(file_name, provider="gpt", strategy="fixed", max_workers=SUMMARY_MAX_WORKERS, fan_in=SUMMARY_FAN_IN):
+    """Summarizes a stored document (see load_chunks). Summaries are cached under summaries/<provider>/."""
+    chunks = load_chunks(file_name, strategy)
+    result = summarize_chunks(chunks, summary_cache_name(file_name, provider), provider, max_workers, fan_in)
+    return {"file_name": file_name, "provider": provider, **result}
@@ -0,0 +1,124 @@
+"""
+Prometheus metrics for the FastAPI backend, served at /metrics.
+
+In-flight requests are counted by main.py's middleware. Everything else is derived from the
+tracing spans (tracing.py) as they finish, so each stage is instrumented once: request latency
+per route, embedding batch sizes, vector-search latency, LLM tokens and latency per provider,
+cache hits and misses, GCS bytes read/written, context tokens saved by merging overlapping
+chunks, and the duration of every stage. The default registry also exports process metrics, including resident memory (process_resident_memory_bytes).
+"""
+from prometheus_client import Counter, Gauge, Histogram, generate_latest, CONTENT_TYPE_LATEST
+from starlette.routing import Match
+from tracing import add_span_observer
+
+# Request latency is dominated by LLM calls, so the buckets reach well past the defaults
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 2048)
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route.",
+    ["method", "route", "status"], buckets=LATENCY_BUCKETS
+)
+HTTP_REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress", "HTTP requests currently being served, by route.", ["method", "route"]
+)
+STAGE_DURATION = Histogram(
+    "stage_duration_seconds", "Duration of each traced stage (span name).", ["stage", "status"], buckets=LATENCY_BUCKETS
+)
+EMBEDDING_BATCH_SIZE = Histogram(
+    "embedding_batch_size", "Texts per embedding call.", ["provider", "model"], buckets=BATCH_SIZE_BUCKETS
+)
+EMBEDDING_TOKENS = Counter("embedding_tokens_total", "Tokens sent to embedding APIs.", ["provider", "model"])
+MODEL_LOADS = Counter("model_loads_total", "Local model loads (once per process when the cache works).", ["model"])
+VECTOR_SEARCH_DURATION = Histogram(
+    "vector_search_duration_seconds", "Latency of one vector-store query or artifact scoring pass.",
+    ["store"], buckets=LATENCY_BUCKETS
+)
+VECTOR_SEARCH_MATCHES = Histogram(
+    "vector_search_matches", "Matches returned per vector-store query.", ["store"], buckets=BATCH_SIZE_BUCKETS
+)
+LLM_REQUEST_DURATION = Histogram(
+    "llm_request_duration_seconds", "LLM call latency.", ["provider", "model", "status"], buckets=LATENCY_BUCKETS
+)
+LLM_TOKENS = Counter("llm_tokens_total", "LLM tokens in (prompt) and out (completion).", ["provider", "model", "direction"])
+CACHE_REQUESTS = Counter("cache_requests_total", "Cache lookups by result; hit ratio = hit / (hit + miss).", ["cache", "result"])
+GCS_BYTES = Counter("gcs_bytes_total", "Bytes read from and written to object storage.", ["direction"])
+GCS_OPERATIONS = Counter("gcs_operations_total", "Object storage calls.", ["operation", "status"])
+CONTEXT_TOKENS = Counter("llm_context_tokens_total", "LLM context tokens: sent, saved by merging overlapping chunks, and left out to fit the budget.", ["kind"])
+
+# Span name -> (cache label, attribute holding the hit flag)
+CACHE_ATTRIBUTES = {
+    "artifact.load": ("artifact", "cache.hit"),
+    "chunk": ("tokenizer", "cache.tokenizer_hit"),
+}
+
+
+def observe_span(span):
+    """Turns one finished span into metric samples."""
+    name, attributes, seconds = span.name, span.attributes, span.duration_ms / 1000
+    status = span.status.lower()
+    if name == "http.request":
+        HTTP_REQUEST_DURATION.labels(attributes.get("http.method"), attributes.get("http.route"),
+                                     str(attributes.get("http.status_code", 500))).observe(seconds)
+        return
+
+    STAGE_DURATION.labels(name, status).observe(seconds)
+
+    if name.startswith("gcs."):
+        GCS_OPERATIONS.labels(name[len("gcs."):], status).inc()
+        if "gcs.bytes" in attributes:
+            GCS_BYTES.labels("read" if name == "gcs.download" else "write").inc(attributes["gcs.bytes"])
+
+    elif name.startswith("embed.") and "embedding.inputs" in attributes:
+        provider, model = attributes.get("embedding.provider", "unknown"), attributes.get("embedding.model", "unknown")
+        EMBEDDING_BATCH_SIZE.labels(provider, model).observe(attributes["embedding.inputs"])
+        if "embedding.tokens" in attributes:
+            EMBEDDING_TOKENS.labels(provider, model).inc(attributes["embedding.tokens"])
+
+    elif name == "embed.load_model":
+        MODEL_LOADS.labels(attributes.get("embedding.model", "unknown")).inc()
+
+    elif name in ("vector.query", "vector.score"):
+        store = attributes.get("vector.store", "unknown")
+        VECTOR_SEARCH_DURATION.labels(store).observe(seconds)
+        if "vector.matches" in attributes:
+            VECTOR_SEARCH_MATCHES.labels(store).observe(attributes["vector.matches"])
+
+    elif name == "llm.chat":
+        provider, model = attributes.get("llm.provider", "unknown"), attributes.get("llm.model", "unknown")
+        LLM_REQUEST_DURATION.labels(provider, model, status).observe(seconds)
+        if "llm.prompt_tokens" in attributes:
+            LLM_TOKENS.labels(provider, model, "in").inc(attributes["llm.prompt_tokens"])
+        if "llm.completion_tokens" in attributes:
+            LLM_TOKENS.labels(provider, model, "out").inc(attributes["llm.completion_tokens"])
+
+    elif name == "rerank" and "rerank.scored" in attributes:
+        CACHE_REQUESTS.labels("rerank", "hit").inc(attributes["rerank.cache_hits"])
+        CACHE_REQUESTS.labels("rerank", "miss").inc(attributes["rerank.scored"])
+
+    elif name == "context.build":
+        CONTEXT_TOKENS.labels("sent").inc(attributes.get("context.tokens", 0))
+        CONTEXT_TOKENS.labels("saved").inc(max(attributes.get("context.tokens_saved", 0), 0))
+        CONTEXT_TOKENS.labels("over_budget").inc(attributes.get("context.tokens_over_budget", 0))
+
+    if name in CACHE_ATTRIBUTES:
+        cache, attribute = CACHE_ATTRIBUTES[name]
+        if attribute in attributes:
+            CACHE_REQUESTS.labels(cache, "hit" if attributes[attribute] else "miss").inc()
+
+
+def route_template(request):
+    """The matched route's path template (e.g. /fetch_file/), so metric labels stay low-cardinality."""
+    for route in request.app.router.routes:
+        match, _ = route.matches(request.scope)
+        if match == Match.FULL:
+            return route.path
+    return "unmatched"
+
+
+def latest_metrics():
+    """(body, content type) of the current metrics in the Prometheus text format."""
+    return generate_latest(), CONTENT_TYPE_LATEST
+
+
+add_span_observer(observe_span)
@@ -4,6 +4,8 @@ from mistralai import Mistral, DocumentURLChunk
 from dotenv import load_dotenv
 import os
 from gcs_utils import upload_to_gcs  # Import GCS upload function
+from tracing import span
+from provenance import page_marker
 
 # Load API key
 load_dotenv()
@@ -16,16 +18,18 @@ def process_pdf_mistral(pdf_url: str):
     print(f"Processing {pdf_url} ...")
     
     # Perform OCR
-    ocr_response = client.ocr.process(
-        document=DocumentURLChunk(document_url=pdf_url),
-        model="mistral-ocr-latest",
-        include_image_base64=True
-    )
+    with span("parse.mistral_ocr", {"parse.source": pdf_url}) as ocr_span:
+        ocr_response = client.ocr.process(
+            document=DocumentURLChunk(document_url=pdf_url),
+            model="mistral-ocr-latest",
+            include_image_base64=True
+        )
+        ocr_span.set_attribute("parse.pages", len(ocr_response.pages))
 
-    # Convert OCR pages to Markdown
+    # Convert OCR pages to Markdown, each behind its page marker (see provenance)
     markdown_pages = []
-    for page in ocr_response.pages:
-        markdown_pages.append(page.markdown)
+    for page_number, page in enumerate(ocr_response.pages, start=1):
+        markdown_pages.append(page_marker(page_number) + page.markdown)
     
     final_markdown = "\n\n".join(markdown_pages)
 
@@ -4,6 +4,7 @@ from pathlib import Path
 from docling_core.types.doc import ImageRefMode
 from docling.document_converter import DocumentConverter
 from gcs_utils import upload_to_gcs
+from tracing import span
 from io import BytesIO
 
 def process_pdf(pdf_path, output_dir, gcs_output_bucket="pdfstorage_1"):
@@ -19,7 +20,9 @@ def process_pdf(pdf_path, output_dir, gcs_output_bucket="pdfstorage_1"):
     start_time = time.time()
     try:
         # Convert the document
-        conv_res = doc_converter.convert(input_doc_path)
+        with span("parse.docling", {"parse.source": str(input_doc_path)}) as parse_span:
+            conv_res = doc_converter.convert(input_doc_path)
+            parse_span.set_attribute("parse.pages", len(conv_res.pages))
 
         # Ensure the output directory exists
         output_dir.mkdir(parents=True, exist_ok=True)
@@ -0,0 +1,120 @@
+import re
+from concurrent.futures import ThreadPoolExecutor
+from tracing import in_current_context
+
+# Partitions are named "{year}-{quarter}", e.g. "2023-Q3".
+# Pinecone uses them as namespaces, Chroma as collection-name suffixes.
+# Section/document summaries (summary_tier.py) are a separate retrieval tier in the same stores:
+# Pinecone namespaces "summaries-2023-Q3", Chroma collections "{base}-summaries-2023-q3".
+
+# Matches scraper paths like "pdf_files/2023/Q3/..." (also after the prefix is stripped)
+PATH_PATTERN = re.compile(r"(?:^|/)(\d{4})/(Q[1-4])(?:/|$)", re.IGNORECASE)
+
+# Matches the "Q3_2023" tag used by gen_embedding, and "Q3 2023" / "Q3-2023" in text
+QUARTER_YEAR_PATTERN = re.compile(r"(?<![A-Za-z0-9])(Q[1-4])[\s_-]*(\d{4})(?!\d)", re.IGNORECASE)
+YEAR_QUARTER_PATTERN = re.compile(r"(?<!\d)(\d{4})[\s_-]*(Q[1-4])(?![A-Za-z0-9])", re.IGNORECASE)
+
+MAX_FANOUT_WORKERS = 8
+TIERS = ("chunks", "summaries")
+
+
+def partition_name(year, quarter):
+    """Builds the canonical partition name for a year/quarter pair."""
+    return f"{year}-{quarter.upper()}"
+
+
+def partition_from_path(path):
+    """Derives the year/quarter partition from a GCS path or file name. Returns None if unknown."""
+    if not path:
+        return None
+
+    match = PATH_PATTERN.search(path)
+    if match:
+        return partition_name(match.group(1), match.group(2))
+
+    match = QUARTER_YEAR_PATTERN.search(path)
+    if match:
+        return partition_name(match.group(2), match.group(1))
+
+    match = YEAR_QUARTER_PATTERN.search(path)
+    if match:
+        return partition_name(match.group(1), match.group(2))
+
+    return None
+
+
+def partition_from_query(query):
+    """Extracts the partition a query is about ("Q3 2023" -> "2023-Q3"), or None when no quarter is named."""
+    match = QUARTER_YEAR_PATTERN.search(query or "")
+    if match:
+        return partition_name(match.group(2), match.group(1))
+    return None
+
+
+def chroma_collection_name(base_name, partition):
+    """Chroma collection for a partition; unpartitioned data keeps the base collection."""
+    if not partition:
+        return base_name
+    return f"{base_name}-{partition.lower()}"
+
+
+def validate_tier(tier):
+    if tier not in TIERS:
+        raise ValueError(f"Unknown retrieval tier: {tier}. Choose from {', '.join(TIERS)}.")
+    return tier
+
+
+def tier_namespace(partition, tier="chunks"):
+    """Pinecone namespace of a partition in a tier (chunks keep the bare partition name)."""
+    if validate_tier(tier) == "chunks":
+        return partition
+    return f"{tier}-{partition}" if partition else tier
+
+
+def namespace_tier(namespace):
+    """Tier a Pinecone namespace belongs to."""
+    for tier in TIERS[1:]:
+        if namespace == tier or (namespace or "").startswith(f"{tier}-"):
+            return tier
+    return "chunks"
+
+
+def tier_collection_base(base_name, tier="chunks"):
+    """Base Chroma collection name of a tier; its partitions are suffixed as usual (chroma_collection_name)."""
+    return base_name if validate_tier(tier) == "chunks" else f"{base_name}-{tier}"
+
+
+def partitions_from_chroma_collections(base_name, collection_names):
+    """Recovers partition names from the Chroma collections created by `chroma_collection_name`."""
+    prefix = f"{base_name}-"
+    partitions = []
+    for name in collection_names:
+        if name.startswith(prefix):
+            year, _, quarter = name[len(prefix):].partition("-")
+            if year.isdigit() and re.fullmatch(r"q[1-4]", quarter):
+                partitions.append(partition_name(year, quarter))
+    return sorted(partitions)
+
+
+def fan_out(search_fn, partitions, max_workers=MAX_FANOUT_WORKERS):
+    """
+    Runs `search_fn(partition)` for every partition in parallel and concatenates the results.
+
+    Each search_fn call must return a list; failures in one partition are logged and skipped
+    so a single bad namespace does not fail the whole query.
+    """
+    partitions = list(partitions)
+    if not partitions:
+        return []
+
+    def _safe_search(partition):
+        try:
+            return search_fn(partition)
+        except Exception as e:
+            print(f"⚠️ Search failed for partition {partition}: {e}")
+            return []
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(partitions))) as executor:
+        per_partition = list(executor.map(in_current_context(_safe_search), partitions))
+
+    return [result for results in per_partition for result in results]
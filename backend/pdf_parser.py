@@ -3,7 +3,12 @@ from markdownify import markdownify as md
 import re
 import io
 from fastapi import UploadFile
-from gcs_utils import upload_to_gcs  # Import the upload function
+from gcs_utils import upload_to_gcs, get_blob_info  # Import the upload function
+from tracing import span
+from provenance import page_marker
+
+# Markdown outputs record the GCS generation of the PDF they were parsed from
+SOURCE_GENERATION_KEY = "source_generation"
 
 def extract_and_remove_links(text):
     """Extracts all links from the text and removes them from the original content."""
@@ -12,36 +17,67 @@ def extract_and_remove_links(text):
     cleaned_text = re.sub(url_pattern, "", text)
     return cleaned_text, links
 
-async def pdf_to_markdown(file: UploadFile):
-    """Extracts text from an uploaded PDF, removes inline links, and uploads as Markdown to GCS."""
-    # Read PDF file content into memory
-    pdf_bytes = await file.read()
-    
-    # Open the PDF in-memory using PyMuPDF
-    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
-    extracted_text = ""
-    all_links = []
+def markdown_blob_name(filename):
+    """GCS path of the Markdown parsed from `filename` (the PDF path relative to pdf_files/)."""
+    return f"outputs/{filename}.md"
+
+def needs_reparse(pdf_blob_name, filename):
+    """
+    True unless the stored Markdown was parsed from the PDF's current GCS generation.
+    Unchanged PDFs are never re-uploaded by the scraper, so their generation (and this answer) stays put.
+    """
+    pdf_info = get_blob_info(pdf_blob_name)
+    markdown_info = get_blob_info(markdown_blob_name(filename))
+    if pdf_info is None or markdown_info is None:
+        return True
+    return markdown_info["metadata"].get(SOURCE_GENERATION_KEY) != str(pdf_info["generation"])
+
+def pdf_bytes_to_markdown(pdf_bytes):
+    """
+    Extracts text from PDF bytes, moves inline links into a References section, and returns Markdown.
+    Each page starts with a page marker, so chunks can cite their page (see provenance).
+    """
+    with span("parse.pymupdf", {"parse.input_bytes": len(pdf_bytes)}) as parse_span:
+        # Open the PDF in-memory using PyMuPDF
+        doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+        markdown_pages = []
+        all_links = []
 
-    for page in doc:
-        page_text = page.get_text("text")
-        cleaned_text, links = extract_and_remove_links(page_text)
-        extracted_text += cleaned_text + "\n\n"
-        all_links.extend(links)
+        for page_number, page in enumerate(doc, start=1):
+            page_text = page.get_text("text")
+            cleaned_text, links = extract_and_remove_links(page_text)
+            # Converted page by page: markdownify would drop the marker comments
+            markdown_pages.append(page_marker(page_number) + md(cleaned_text))
+            all_links.extend(links)
 
-    markdown_text = md(extracted_text)
+        markdown_text = "\n\n".join(markdown_pages) + "\n\n"
+        parse_span.set_attributes({"parse.pages": doc.page_count, "parse.output_chars": len(markdown_text)})
 
     if all_links:
         markdown_text += "\n\n## References\n"
         for i, link in enumerate(set(all_links), start=1):  
             markdown_text += f"{i}. {link}\n"
 
+    return markdown_text
+
+def upload_markdown(markdown_text, filename, source_generation=None):
+    """Uploads parsed Markdown to outputs/ in GCS, tagged with the source PDF's generation."""
     # Create an in-memory Markdown file
     markdown_bytes = io.BytesIO(markdown_text.encode("utf-8"))
     
     # Define GCS path: store in `outputs/` inside the GCS bucket
-    md_filename = f"outputs/{file.filename}.md"
+    md_filename = markdown_blob_name(filename)
 
     # Upload directly to GCS from memory
-    gcs_file_url = upload_to_gcs(markdown_bytes, md_filename)
+    metadata = {SOURCE_GENERATION_KEY: source_generation} if source_generation is not None else None
+    return upload_to_gcs(markdown_bytes, md_filename, metadata=metadata)
+
+async def pdf_to_markdown(file: UploadFile, source_generation=None):
+    """Extracts text from an uploaded PDF, removes inline links, and uploads as Markdown to GCS."""
+    # Read PDF file content into memory
+    pdf_bytes = await file.read()
+    
+    markdown_text = pdf_bytes_to_markdown(pdf_bytes)
+    gcs_file_url = upload_markdown(markdown_text, file.filename, source_generation)
 
     return {"gcs_url": gcs_file_url}
@@ -0,0 +1,110 @@
+"""
+Provenance of retrieved chunks: which document, page and span each one came from, so answers can
+cite their sources and a citation can be checked without downloading the whole document.
+
+Parsers mark the start of every PDF page in the Markdown with an HTML comment (invisible when the
+Markdown is rendered). The chunker records each chunk's page range and the UTF-8 byte span matching
+its character span, and the indexers store both next to the chunk. A byte span is all that's needed
+to fetch the exact source text with one ranged read of the Markdown blob.
+"""
+import re
+from bisect import bisect_right
+from gcs_utils import download_byte_range, get_blob_info
+
+PAGE_MARKER_PATTERN = re.compile(r"<!-- page (\d+) -->")
+MAX_SOURCE_SPAN_BYTES = 64 * 1024  # Largest span /source_span returns (a chunk is a few KB)
+
+# Chunk metadata that locates it in its source document (see embedding_models.chunk_position)
+CITATION_FIELDS = ("page_start", "page_end", "char_start", "char_end", "byte_start", "byte_end", "section_path")
+
+
+def page_marker(page_number):
+    """Marker inserted in front of each page's text (1-based) by the parsers."""
+    return f"<!-- page {page_number} -->\n"
+
+
+def page_starts(text):
+    """(character offsets, page numbers) of the page markers in a document, in order."""
+    matches = list(PAGE_MARKER_PATTERN.finditer(text))
+    return [match.start() for match in matches], [int(match.group(1)) for match in matches]
+
+
+def byte_offsets(text, char_offsets):
+    """UTF-8 byte offset of each character offset, from one pass over the text."""
+    if text.isascii():
+        return {offset: offset for offset in char_offsets}
+    result, position, byte_position = {}, 0, 0
+    for offset in sorted(set(char_offsets)):
+        byte_position += len(text[position:offset].encode("utf-8"))
+        position = offset
+        result[offset] = byte_position
+    return result
+
+
+def add_provenance(text, chunks):
+    """
+    Adds the byte span (`byte_start`, `byte_end`) and, when the text has page markers, the page range
+    (`page_start`, `page_end`) to every chunk record that has a character span. Returns the chunks.
+    """
+    located = [chunk for chunk in chunks if chunk.get("char_start") is not None]
+    if not located:
+        return chunks
+    offsets = byte_offsets(text, [offset for chunk in located for offset in (chunk["char_start"], chunk["char_end"])])
+    marker_offsets, page_numbers = page_starts(text)
+
+    for chunk in located:
+        chunk["byte_start"], chunk["byte_end"] = offsets[chunk["char_start"]], offsets[chunk["char_end"]]
+        if marker_offsets:
+            first = bisect_right(marker_offsets, chunk["char_start"]) - 1
+            last = bisect_right(marker_offsets, max(chunk["char_end"] - 1, chunk["char_start"])) - 1
+            # Text before the first marker (none in parsed PDFs) is on the first page
+            chunk["page_start"] = page_numbers[max(first, 0)]
+            chunk["page_end"] = page_numbers[max(last, 0)]
+    return chunks
+
+
+def markdown_source(source):
+    """
+    The Markdown blob a chunk's `source` was chunked from: chunked_outputs/x.json -> outputs/x.md
+    (the path /fetch_file/ and the ingestion pipeline chunk from). Other paths are returned as is.
+    """
+    if source and source.startswith("chunked_outputs/") and source.endswith(".json"):
+        return source[len("chunked_"):-len(".json")] + ".md"
+    return source
+
+
+def citations(chunks):
+    """
+    Compact citations for the chunks an answer was built from, numbered in the order given:
+    the source document, the store's chunk id, the retrieval score and whatever location is known.
+    """
+    results = []
+    for number, chunk in enumerate(chunks, start=1):
+        source = chunk.get("source") or chunk.get("filename")
+        citation = {"id": number, "document": markdown_source(source), "chunk_id": chunk.get("id"), "score": chunk.get("score")}
+        citation.update({field: chunk[field] for field in CITATION_FIELDS if chunk.get(field) is not None})
+        results.append({key: value for key, value in citation.items() if value is not None})
+    return results
+
+
+def read_source_span(document, byte_start, byte_end):
+    """
+    Exact source text of a citation, read with one ranged request for [byte_start, byte_end) of the
+    Markdown blob. `document` may also be the chunk's source (chunked_outputs/...json).
+    Returns None if the Markdown isn't stored (it's only kept when ingestion checkpoints it).
+    """
+    if byte_start < 0 or byte_end <= byte_start:
+        raise ValueError("byte_end must be greater than byte_start, and byte_start at least 0.")
+    if byte_end - byte_start > MAX_SOURCE_SPAN_BYTES:
+        raise ValueError(f"Spans are limited to {MAX_SOURCE_SPAN_BYTES} bytes.")
+    document = markdown_source(document)
+    info = get_blob_info(document)
+    if info is None:
+        return None
+    if byte_start >= info["size"]:
+        raise ValueError(f"byte_start is past the end of {document} ({info['size']} bytes).")
+
+    data = download_byte_range(document, byte_start, min(byte_end, info["size"]))
+    # Chunk byte spans fall on character boundaries; a hand-picked span might not
+    return {"document": document, "byte_start": byte_start, "byte_end": byte_start + len(data),
+            "generation": info["generation"], "text": data.decode("utf-8", errors="replace")}
@@ -0,0 +1,134 @@
+import base64
+import io
+import os
+import time
+import numpy as np
+
+# In-memory scoring: "none" scores float32 vectors, "int8" scores int8 codes and re-ranks the best
+# candidates with float32 (see corpus_search for the resident cache, search for one artifact)
+SEARCH_QUANTIZATION = os.getenv("SEARCH_QUANTIZATION", "none")
+
+# Rows scored per block when computing int8 scores, so only one block is ever widened to float32
+SCORE_BLOCK_ROWS = 4096
+DEFAULT_RERANK_FACTOR = 4  # Re-rank k * factor int8 candidates with the float32 vectors
+
+
+def quantize_int8(matrix):
+    """
+    Symmetric per-row int8 scalar quantization: row ≈ codes * scale.
+    Cuts a 1536-dim vector from 6 KB (float32) to 1.5 KB plus one float32 scale.
+    """
+    matrix = np.asarray(matrix, dtype=np.float32)
+    if matrix.ndim == 1:
+        matrix = matrix[None, :]
+    scales = np.abs(matrix).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.clip(np.rint(matrix / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+def dequantize_int8(codes, scales):
+    """Reconstructs approximate float32 vectors from int8 codes and per-row scales."""
+    return codes.astype(np.float32) * scales[:, None]
+
+
+def encode_int8_embedding(vector):
+    """Quantizes one embedding for JSON storage as (base64 int8 codes, scale)."""
+    codes, scales = quantize_int8(vector)
+    return base64.b64encode(codes[0].tobytes()).decode("ascii"), float(scales[0])
+
+
+def decode_int8_embedding(encoded, scale):
+    """Inverse of `encode_int8_embedding`; returns a float32 vector."""
+    codes = np.frombuffer(base64.b64decode(encoded), dtype=np.int8)
+    return codes.astype(np.float32) * np.float32(scale)
+
+
+def int8_scores(query, codes, scales):
+    """Inner products of a float32 query against int8-coded rows, computed block by block."""
+    query = np.asarray(query, dtype=np.float32)
+    scores = np.empty(len(codes), dtype=np.float32)
+    for start in range(0, len(codes), SCORE_BLOCK_ROWS):
+        block = codes[start:start + SCORE_BLOCK_ROWS]
+        scores[start:start + len(block)] = block.astype(np.float32) @ query
+    return scores * scales
+
+
+def top_k_indices(scores, k):
+    """Indices of the k highest scores, best first."""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64)
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top])]
+
+
+def search_int8(query, codes, scales, k, rerank_vectors=None, rerank_factor=DEFAULT_RERANK_FACTOR):
+    """
+    Top-k search over int8 codes. When `rerank_vectors` (float32, may be a memmap) is given, the
+    best k * rerank_factor int8 candidates are re-scored exactly and only those rows are read.
+    Returns (scores, indices).
+    """
+    scores = int8_scores(query, codes, scales)
+    if rerank_vectors is None:
+        top = top_k_indices(scores, k)
+        return scores[top], top
+
+    candidates = np.sort(top_k_indices(scores, k * rerank_factor))  # Sorted reads are sequential on a memmap
+    exact = np.asarray(rerank_vectors[candidates], dtype=np.float32) @ np.asarray(query, dtype=np.float32)
+    top = top_k_indices(exact, k)
+    return exact[top], candidates[top]
+
+
+def save_float32_matrix(matrix):
+    """Serializes a float32 matrix as .npy bytes (the re-ranking sidecar of a quantized artifact)."""
+    buffer = io.BytesIO()
+    np.save(buffer, np.asarray(matrix, dtype=np.float32), allow_pickle=False)
+    buffer.seek(0)
+    return buffer
+
+
+def recall_impact(matrix, k=10, sample_size=100, rerank_factor=DEFAULT_RERANK_FACTOR, seed=0):
+    """
+    Measures how int8 quantization changes top-k results versus exact float32 search, with and
+    without float32 re-ranking, plus the memory each representation needs.
+    Stored (normalized) vectors are used as the query sample.
+    """
+    matrix = np.asarray(matrix, dtype=np.float32)
+    codes, scales = quantize_int8(matrix)
+
+    rng = np.random.default_rng(seed)
+    queries = matrix[rng.choice(len(matrix), min(sample_size, len(matrix)), replace=False)]
+
+    hits_int8, hits_rerank, total = 0, 0, 0
+    seconds = {"float32": 0.0, "int8": 0.0, "int8_rerank": 0.0}
+    for query in queries:
+        start = time.perf_counter()
+        exact = set(top_k_indices(matrix @ query, k).tolist())
+        seconds["float32"] += time.perf_counter() - start
+
+        start = time.perf_counter()
+        _, approx = search_int8(query, codes, scales, k)
+        seconds["int8"] += time.perf_counter() - start
+
+        start = time.perf_counter()
+        _, reranked = search_int8(query, codes, scales, k, rerank_vectors=matrix, rerank_factor=rerank_factor)
+        seconds["int8_rerank"] += time.perf_counter() - start
+
+        hits_int8 += len(exact & set(approx.tolist()))
+        hits_rerank += len(exact & set(reranked.tolist()))
+        total += len(exact)
+
+    queries_count = max(len(queries), 1)
+    return {
+        "k": k,
+        "vectors": len(matrix),
+        "dim": matrix.shape[1] if matrix.ndim == 2 else 0,
+        "queries": len(queries),
+        "rerank_factor": rerank_factor,
+        "recall_at_k_int8": hits_int8 / total if total else None,
+        "recall_at_k_int8_rerank": hits_rerank / total if total else None,
+        "float32_bytes": int(matrix.nbytes),
+        "int8_bytes": int(codes.nbytes + scales.nbytes),
+        "ms_per_query": {name: 1000 * value / queries_count for name, value in seconds.items()}
+    }
@@ -0,0 +1,150 @@
+"""
+Optional cross-encoder re-ranking between vector retrieval and the LLM call.
+
+Vector search is cheap but coarse, so the hybrid modules can retrieve a wider candidate set
+(RERANK_CANDIDATES) and let a small cross-encoder score every (query, chunk) pair in one batched
+forward pass on CPU, keeping only the best few chunks for the prompt. Scores are cached per
+(query, chunk id, text hash), and the pass is cut down to the candidates that fit RERANK_LATENCY_BUDGET_MS,
+estimated from the measured cost of earlier passes.
+"""
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from tracing import span
+
+RERANK_MODEL = os.getenv("RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+RERANK_ENABLED = os.getenv("RERANK_ENABLED", "false").lower() == "true"
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "50"))
+RERANK_TOP_N = int(os.getenv("RERANK_TOP_N", "5"))
+RERANK_LATENCY_BUDGET_MS = float(os.getenv("RERANK_LATENCY_BUDGET_MS", "300"))
+RERANK_BATCH_SIZE = 64  # Pairs per forward pass; a full candidate set fits in one
+RERANK_CACHE_SIZE = 10_000  # (query, chunk id, text hash) scores kept
+
+_score_cache = OrderedDict()
+_cache_lock = threading.Lock()
+_seconds_per_pair = None  # Moving average of measured scoring cost, for the latency budget
+
+
+@lru_cache(maxsize=1)
+def get_cross_encoder():
+    """Loads the cross-encoder once per process (CPU)."""
+    from sentence_transformers import CrossEncoder
+    with span("rerank.load_model", {"rerank.model": RERANK_MODEL}):
+        return CrossEncoder(RERANK_MODEL, device="cpu")
+
+
+def chunk_id(chunk):
+    """Stable id of a retrieved chunk: the store's id, its source span, or a hash of its text."""
+    if chunk.get("id"):
+        return chunk["id"]
+    if chunk.get("source") is not None and chunk.get("char_start") is not None:
+        return f"{chunk['source']}@{chunk['char_start']}-{chunk.get('char_end')}"
+    return hashlib.sha1(chunk["text"].encode("utf-8")).hexdigest()
+
+
+def score_key(chunk):
+    """
+    Score cache key of a chunk: its id plus a hash of its text. Store ids are positional
+    (source#i), so a re-ingested file reuses them for different text.
+    """
+    return chunk_id(chunk), hashlib.sha1(chunk["text"].encode("utf-8")).hexdigest()
+
+
+def cached_scores(query, ids):
+    with _cache_lock:
+        scores = {}
+        for id_ in ids:
+            if (query, id_) in _score_cache:
+                _score_cache.move_to_end((query, id_))
+                scores[id_] = _score_cache[(query, id_)]
+        return scores
+
+
+def cache_scores(query, scores):
+    with _cache_lock:
+        for id_, score in scores.items():
+            _score_cache[(query, id_)] = score
+        while len(_score_cache) > RERANK_CACHE_SIZE:
+            _score_cache.popitem(last=False)
+
+
+def clear_cache():
+    with _cache_lock:
+        _score_cache.clear()
+
+
+def affordable_pairs(budget_ms):
+    """How many uncached pairs one pass can score within the budget (all of them until a pass was timed)."""
+    if _seconds_per_pair is None or not budget_ms:
+        return None
+    return int(budget_ms / 1000 / _seconds_per_pair)
+
+
+def score_pairs(query, texts, batch_size=RERANK_BATCH_SIZE):
+    """Relevance of each text to the query (0-1) from one batched cross-encoder pass."""
+    global _seconds_per_pair
+    model = get_cross_encoder()
+    start = time.perf_counter()
+    scores = model.predict([(query, text) for text in texts], batch_size=batch_size, show_progress_bar=False)
+    seconds = time.perf_counter() - start
+    per_pair = seconds / len(texts)
+    _seconds_per_pair = per_pair if _seconds_per_pair is None else 0.8 * _seconds_per_pair + 0.2 * per_pair
+    return [float(score) for score in scores]
+
+
+def rerank(query, chunks, top_n=None, latency_budget_ms=None):
+    """
+    Re-orders retrieved chunks by cross-encoder relevance and keeps the best `top_n`.
+
+    Args:
+        query (str): The user's question.
+        chunks (list[dict]): Candidates with `text` (and `score`, `id`/`source`/`char_start` when known),
+            best vector score first.
+        top_n (int, optional): Chunks to keep (default: RERANK_TOP_N).
+        latency_budget_ms (float, optional): Scoring time allowed (default: RERANK_LATENCY_BUDGET_MS;
+            0 = no budget). Candidates beyond what fits are dropped from the end of the vector ranking;
+            if not even `top_n` fit, the vector ranking is returned unchanged.
+
+    Returns:
+        list[dict]: The kept chunks, best first, with `score` set to the cross-encoder score and
+        the original one kept as `vector_score`.
+    """
+    top_n = top_n or RERANK_TOP_N
+    latency_budget_ms = RERANK_LATENCY_BUDGET_MS if latency_budget_ms is None else latency_budget_ms
+    chunks = [chunk for chunk in chunks if chunk.get("text")]
+    if len(chunks) <= 1:
+        return chunks[:top_n]
+
+    with span("rerank", {"rerank.model": RERANK_MODEL, "rerank.candidates": len(chunks), "rerank.top_n": top_n,
+                         "rerank.budget_ms": latency_budget_ms}) as rerank_span:
+        ids = [score_key(chunk) for chunk in chunks]
+        scores = cached_scores(query, ids)
+        uncached = [i for i, id_ in enumerate(ids) if id_ not in scores]
+
+        # Keep the pass within budget by scoring only the best-by-vector candidates that fit
+        affordable = affordable_pairs(latency_budget_ms)
+        if affordable is not None and len(uncached) > affordable:
+            dropped = set(uncached[affordable:])
+            if len(chunks) - len(dropped) < top_n:
+                rerank_span.set_attribute("rerank.skipped", "latency_budget")
+                print(f"⚠️ Rerank skipped: {len(uncached)} pairs won't fit {latency_budget_ms:.0f} ms")
+                return chunks[:top_n]
+            chunks = [chunk for i, chunk in enumerate(chunks) if i not in dropped]
+            ids = [id_ for i, id_ in enumerate(ids) if i not in dropped]
+            uncached = [i for i, id_ in enumerate(ids) if id_ not in scores]
+            rerank_span.set_attribute("rerank.trimmed_to", len(chunks))
+
+        if uncached:
+            new_scores = dict(zip([ids[i] for i in uncached], score_pairs(query, [chunks[i]["text"] for i in uncached])))
+            cache_scores(query, new_scores)
+            scores.update(new_scores)
+        rerank_span.set_attributes({"rerank.scored": len(uncached), "rerank.cache_hits": len(ids) - len(uncached)})
+
+        ranked = sorted(zip(chunks, ids), key=lambda pair: scores[pair[1]], reverse=True)[:top_n]
+        results = [{**chunk, "vector_score": chunk.get("score"), "score": scores[id_]} for chunk, id_ in ranked]
+
+    print(f"🎯 Reranked {len(chunks)} candidates → {len(results)} ({len(uncached)} scored, {len(ids) - len(uncached)} cached)")
+    return results
@@ -4,74 +4,166 @@ from numpy.linalg import norm
 import openai
 from dotenv import load_dotenv
 import os
+from quantization import decode_int8_embedding
+from embedding_models import embed_texts, check_dimensions, chunk_position, LEGACY_EMBEDDING_MODEL
+from sections import section_fields, resolve_section_filter
+from tracing import span, llm_usage_attributes
+from context_builder import build_context
 
 # Load environment variables and configure API
 load_dotenv(dotenv_path=".env")
 openai.api_key = os.getenv("OPENAI_API_KEY")
 
-def get_embedding(text):
+def get_embedding(text, model=None, dimensions=None):
     """Generates an embedding using OpenAI's API."""
-    response = openai.embeddings.create(input=[text], model="text-embedding-ada-002")
-    return response.data[0].embedding
+    return embed_texts([text], model=model, dimensions=dimensions)[0]
 
 def cosine_similarity(vec1, vec2):
     """Compute cosine similarity between two vectors."""
     return np.dot(vec1, vec2) / (norm(vec1) * norm(vec2))
 
-def search_from_content(content, query, quarter_filter=None, top_n=5):
+def normalize_rows(matrix):
+    """L2-normalizes each row of a matrix so a dot product equals cosine similarity."""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+def cosine_scores(query_embedding, matrix):
+    """Cosine similarity of one query vector against every row of a matrix."""
+    return normalize_rows(matrix) @ normalize_rows(query_embedding)
+
+def extract_chunk_records(content, quarter_filter=None):
     """
-    Perform a search on the provided content.
-    
-    The function filters data by quarter (if specified), generates the query embedding,
-    and then calculates similarity scores against each chunk.
+    Flattens an embedding artifact into one record per chunk.
+
+    Current artifacts store one item per chunk with its embedding. Older artifacts store the
+    whole chunked JSON (`{"chunks": [...]}`) as the item text; those chunks come back with
+    `embedding` set to None and have to be embedded at query time.
     """
     if isinstance(content, dict):
         content = [content]
 
-    # Filter by quarter, if applicable
-    filtered_data = [
-        item for item in content
-        if quarter_filter is None or item.get("quarter") == quarter_filter
-    ]
-    
-    # Generate embedding for the query
-    query_embedding = get_embedding(query)
+    records = []
+    for item in content:
+        # Filter by quarter, if applicable
+        if quarter_filter is not None and item.get("quarter") != quarter_filter:
+            continue
+
+        text_data = item.get("text", "")
+        base = {
+            "filename": item.get("filename"),
+            "quarter": item.get("quarter"),
+            "embedding_model": item.get("embedding_model", LEGACY_EMBEDDING_MODEL),
+            "embedding_dim": item.get("embedding_dim")
+        }
 
-    results = []
-    for item in filtered_data:
-        # Extract and parse the "text" field
-        text_data = item.get("text", "{}")
         try:
-            parsed_text = json.loads(text_data)  # Parse JSON string
-            chunks = parsed_text.get("chunks", [])  # Extract chunks
-        except json.JSONDecodeError:
-            print("❌ Failed to decode JSON from text field!")
-            chunks = []
-
-        if not chunks:
-            print("⚠️ No chunks found for item:", item)
-            continue
+            parsed_text = json.loads(text_data)
+        except (json.JSONDecodeError, TypeError):
+            parsed_text = None
+
+        if isinstance(parsed_text, dict) and "chunks" in parsed_text:
+            # Legacy artifact: a single item wrapping the whole chunked file
+            for chunk in parsed_text.get("chunks", []):
+                text = chunk.get("content", "") if isinstance(chunk, dict) else chunk
+                if text:
+                    records.append({**base, **section_fields(chunk), **chunk_position(chunk), "chunk": text, "embedding": None})
+        elif text_data:
+            embedding = item.get("embedding")
+            if embedding is None and "embedding_int8" in item:
+                # int8 storage mode (see gen_embedding's `quantization` option)
+                embedding = decode_int8_embedding(item["embedding_int8"], item["embedding_scale"])
+            records.append({**base, **section_fields(item), **chunk_position(item), "chunk": text_data, "embedding": embedding})
+        else:
+            print("⚠️ No chunks found for item:", item.get("filename"))
+
+    return records
+
+def records_embedding_config(records):
+    """
+    Returns the (model, dim) every record was embedded with; dim is None when nothing is stored yet.
+    Refuses content that mixes models or vector sizes, since their scores are not comparable.
+    """
+    configs = {
+        (record["embedding_model"], len(record["embedding"]) if record["embedding"] is not None else record["embedding_dim"])
+        for record in records
+    }
+    if len(configs) > 1:
+        raise ValueError(f"Content mixes embedding models/dimensions: {sorted(configs, key=str)}")
+    return configs.pop()
 
-        # Process each chunk
-        for chunk in chunks:
-            chunk_embedding = get_embedding(chunk)  # Generate embedding per chunk
-            similarity = cosine_similarity(query_embedding, chunk_embedding)
-            results.append({"similarity": similarity, "chunk": chunk})
+def filter_by_section(records, query, section=None):
+    """
+    Keeps only records from the requested filing section (explicit `section`, or one named in the query).
+    A section inferred from the query is only a preference: if no record matches it, nothing is dropped.
+    """
+    field, value, strict = resolve_section_filter(query, section)
+    if field is None:
+        return records
+    matching = [record for record in records if record.get(field) == value]
+    return matching if matching or strict else records
+
+def search_from_content(content, query, quarter_filter=None, top_n=5, section=None, query_embedding=None):
+    """
+    Perform a search on the provided content.
+    
+    The function filters data by quarter and filing section (if specified), generates the
+    query embedding (unless one is passed in), and then scores every chunk against it in a
+    single matrix product, reusing the embeddings stored in the artifact. int8 artifacts are
+    scored with their dequantized vectors; int8 scoring with float32 re-ranking from the sidecar
+    is what corpus_search does (SEARCH_QUANTIZATION / /search_corpus?quantization=int8).
+    """
+    records = filter_by_section(extract_chunk_records(content, quarter_filter), query, section)
+    if not records:
+        return []
+
+    # Generate embedding for the query with the same model/dimensions as the stored chunks
+    model, dim = records_embedding_config(records)
+    if query_embedding is None:
+        query_embedding = get_embedding(query, model=model, dimensions=dim)
+    elif dim is not None:
+        # A caller's embedding may come from another model; ours is made with the records' config
+        check_dimensions(len(query_embedding), dim, model)
+
+    # Only legacy artifacts lack stored chunk embeddings
+    for record in records:
+        if record["embedding"] is None:
+            record["embedding"] = get_embedding(record["chunk"], model=model, dimensions=dim)
+
+    with span("vector.score", {"vector.store": "artifact", "vector.records": len(records)}):
+        scores = cosine_scores(query_embedding, [record["embedding"] for record in records])
 
     # Sort by similarity and return the top N results
-    results = sorted(results, key=lambda x: x["similarity"], reverse=True)
-    print("🔍 Search Results:", results[:top_n])
-    return results[:top_n]
+    top_indices = np.argsort(-scores)[:top_n]
+    results = [
+        {
+            "similarity": float(scores[i]),
+            "chunk": records[i]["chunk"],
+            "filename": records[i]["filename"],
+            "quarter": records[i]["quarter"],
+            "section_path": records[i].get("section_path"),
+            **chunk_position(records[i])
+        }
+        for i in top_indices
+    ]
+    print("🔍 Search Results:", results)
+    return results
 
-def generate_response(query, retrieved_chunks):
+def generate_response(query, retrieved_chunks, token_budget=None):
     """
     Generates a response using GPT-40-mini with the retrieved chunks as context.
+    Overlapping chunks are merged and the context is kept within `token_budget` (see context_builder).
     """
     if not retrieved_chunks:
         return "No relevant information found."
 
-    # Combine retrieved text chunks as context
-    context = "\n".join(chunk["chunk"] for chunk in retrieved_chunks)
+    # Combine retrieved text chunks as context, each overlapping span only once
+    built = build_context([
+        {"text": chunk["chunk"], "score": chunk["similarity"], "source": chunk.get("filename"), **chunk_position(chunk)}
+        for chunk in retrieved_chunks
+    ], token_budget=token_budget)
+    context = built["context"]
     prompt = f"""You are an AI assistant. Use the following context to answer the question:
 
 {context}
@@ -79,11 +171,14 @@ def generate_response(query, retrieved_chunks):
 Question: {query}
 Answer:"""
 
-    response = openai.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[
-            {"role": "system", "content": "You are a helpful assistant."},
-            {"role": "user", "content": prompt}
-        ]
-    )
+    with span("llm.chat", {"llm.provider": "openai", "llm.model": "gpt-4o-mini", "llm.context_chunks": len(built["chunks"]),
+                           "llm.context_tokens": built["tokens"]}) as llm_span:
+        response = openai.chat.completions.create(
+            model="gpt-4o-mini",
+            messages=[
+                {"role": "system", "content": "You are a helpful assistant."},
+                {"role": "user", "content": prompt}
+            ]
+        )
+        llm_span.set_attributes(llm_usage_attributes(response))
     return response.choices[0].message.content
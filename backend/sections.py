@@ -0,0 +1,101 @@
+import re
+
+# Filing sections are tagged two ways on every chunk from the "markdown" chunker:
+#   section_item:  the filing's own numbering, e.g. "item-7", "item-1a" (differs between 10-K and 10-Q)
+#   section_topic: what the section is about, from its heading, e.g. "mda" (same in both forms)
+# plus section_path, the heading trail ("PART II > Item 7. Management's Discussion ...").
+
+ITEM_HEADING_PATTERN = re.compile(r"^\W*Item\s+(\d{1,2}[A-C]?)\s*[.:\-–—]", re.IGNORECASE)
+PART_HEADING_PATTERN = re.compile(r"^\W*PART\s+(IV|I{1,3})\b", re.IGNORECASE)
+QUERY_ITEM_PATTERN = re.compile(r"\bItem[\s-]+(\d{1,2}[A-C]?)\b", re.IGNORECASE)
+
+SECTION_TOPICS = {
+    "mda": ["management's discussion", "management’s discussion", "md&a"],
+    "risk-factors": ["risk factors"],
+    "financial-statements": ["financial statements"],
+    "market-risk": ["market risk"],
+    "controls": ["controls and procedures"],
+    "legal-proceedings": ["legal proceedings"],
+    "executive-compensation": ["executive compensation"],
+}
+
+SECTION_FIELDS = ("section_path", "section_item", "section_topic")
+
+
+def section_item(title):
+    """"Item 7. Management's ..." -> "item-7" (None for headings that aren't items)."""
+    match = ITEM_HEADING_PATTERN.search(title or "")
+    return f"item-{match.group(1).lower()}" if match else None
+
+
+def section_topic(title):
+    """Topic key for a heading or query text, e.g. "Risk Factors" -> "risk-factors"."""
+    lowered = (title or "").lower()
+    for topic, phrases in SECTION_TOPICS.items():
+        if any(phrase in lowered for phrase in phrases):
+            return topic
+    return None
+
+
+def is_section_heading(line):
+    """True for plain-text "PART II" / "Item 7." lines that act as headings in parsed filings."""
+    return bool(PART_HEADING_PATTERN.match(line) or ITEM_HEADING_PATTERN.match(line))
+
+
+def section_metadata(section_path):
+    """
+    Metadata for a chunk under the given heading trail. The innermost item/topic wins.
+    Keys without a value are left out (vector stores reject null metadata).
+    """
+    metadata = {}
+    if section_path:
+        metadata["section_path"] = " > ".join(section_path)
+    for title in reversed(section_path):
+        for key, value in (("section_item", section_item(title)), ("section_topic", section_topic(title))):
+            if value and key not in metadata:
+                metadata[key] = value
+    return metadata
+
+
+def section_fields(chunk):
+    """Section metadata stored on a chunk record ({} for plain-string chunks)."""
+    if not isinstance(chunk, dict):
+        return {}
+    return {key: chunk[key] for key in SECTION_FIELDS if chunk.get(key)}
+
+
+def section_filter(section):
+    """
+    Normalizes a user-supplied section ("Item 7", "item-1a", "mda", "Risk Factors") into a
+    (metadata field, value) pair. Raises ValueError for anything unrecognized.
+    """
+    value = (section or "").strip()
+    match = re.fullmatch(r"item[\s-]*(\d{1,2}[A-C]?)\.?", value, re.IGNORECASE)
+    if match:
+        return "section_item", f"item-{match.group(1).lower()}"
+    if value.lower() in SECTION_TOPICS:
+        return "section_topic", value.lower()
+    topic = section_topic(value)
+    if topic:
+        return "section_topic", topic
+    raise ValueError(f"Unknown section: {section}. Use an item (e.g. 'Item 7') or one of {', '.join(SECTION_TOPICS)}.")
+
+
+def section_from_query(query):
+    """The section a query asks about ("... in Item 7 ..." or "... MD&A ..."), or None."""
+    match = QUERY_ITEM_PATTERN.search(query or "")
+    if match:
+        return "section_item", f"item-{match.group(1).lower()}"
+    topic = section_topic(query)
+    return ("section_topic", topic) if topic else None
+
+
+def resolve_section_filter(query, section=None):
+    """
+    Returns (field, value, strict). An explicit `section` is applied strictly; one inferred from
+    the query is a preference, and callers fall back to unfiltered results if it matches nothing.
+    """
+    if section:
+        return (*section_filter(section), True)
+    inferred = section_from_query(query)
+    return (*inferred, False) if inferred else (None, None, False)
@@ -1,6 +1,7 @@
 import os
 import google.generativeai as genai
 from dotenv import load_dotenv
+from tracing import span
 
 # Load environment variables
 load_dotenv(dotenv_path=".env")
@@ -12,24 +13,37 @@ if not api_key:
 # Configure Google Gemini API
 genai.configure(api_key=api_key)
 
-def summarize_text_gemini(text):
-    """Use Google Gemini 2.0 Flash to summarize extracted text."""
-    try:
-        model = genai.GenerativeModel("gemini-2.0-flash")  # ✅ Use Gemini 2.0 Flash
+GEMINI_SUMMARY_MODEL = "gemini-2.0-flash"
+
+def generate_summary_gemini(text, instruction="Summarize the following document:"):
+    """
+    Summarizes text (or, with `instruction`, one part of a document) with Gemini 2.0 Flash.
+    Raises on API errors and unexpected responses, so callers can retry instead of keeping an error string.
+    """
+    model = genai.GenerativeModel(GEMINI_SUMMARY_MODEL)  # ✅ Use Gemini 2.0 Flash
+    with span("llm.chat", {"llm.provider": "gemini", "llm.model": GEMINI_SUMMARY_MODEL}) as llm_span:
         response = model.generate_content(
-            f"Summarize the following document:\n\n{text}"
+            f"{instruction}\n\n{text}"
         )
+        usage = getattr(response, "usage_metadata", None)
+        if usage is not None:
+            llm_span.set_attributes({"llm.prompt_tokens": getattr(usage, "prompt_token_count", None),
+                                     "llm.completion_tokens": getattr(usage, "candidates_token_count", None)})
 
-        # ✅ Correct way to extract text from the response
-        if response and hasattr(response, "candidates") and response.candidates:
-            # Extract the first candidate's content
-            candidate = response.candidates[0]
-            
-            # Check if it has 'content' and 'parts'
-            if hasattr(candidate, "content") and hasattr(candidate.content, "parts"):
-                return candidate.content.parts[0].text  # ✅ Extract text properly
-            
-        return "Error: Unexpected response format from Gemini API."
+    # ✅ Correct way to extract text from the response
+    if response and hasattr(response, "candidates") and response.candidates:
+        # Extract the first candidate's content
+        candidate = response.candidates[0]
+        
+        # Check if it has 'content' and 'parts'
+        if hasattr(candidate, "content") and hasattr(candidate.content, "parts"):
+            return candidate.content.parts[0].text  # ✅ Extract text properly
+        
+    raise RuntimeError("Unexpected response format from Gemini API.")
 
+def summarize_text_gemini(text):
+    """Use Google Gemini 2.0 Flash to summarize extracted text."""
+    try:
+        return generate_summary_gemini(text)
     except Exception as e:
         return f"Error: {e}"
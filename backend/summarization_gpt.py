@@ -1,20 +1,25 @@
 import os
 from litellm import completion
 from dotenv import load_dotenv
+from tracing import span, llm_usage_attributes
 
 # Load environment variables
 load_dotenv(dotenv_path=".env")
 os.environ["OPENAI_API_KEY"] = os.getenv("OPENAI_API_KEY")
 
-def summarize_text_gpt(text):
-    """Use GPT-4o Mini to summarize extracted text from a PDF."""
-    response = completion(
-        model="gpt-4o-mini",
-        messages=[
-            {"role": "system", "content": "You are an AI that summarizes documents concisely."},
-            {"role": "user", "content": f"Summarize the following document:\n\n{text}"}
-        ]
-    )
+GPT_SUMMARY_MODEL = "gpt-4o-mini"
+
+def summarize_text_gpt(text, instruction="Summarize the following document:"):
+    """Use GPT-4o Mini to summarize extracted text from a PDF (or, with `instruction`, one part of it)."""
+    with span("llm.chat", {"llm.provider": "openai", "llm.model": GPT_SUMMARY_MODEL}) as llm_span:
+        response = completion(
+            model=GPT_SUMMARY_MODEL,
+            messages=[
+                {"role": "system", "content": "You are an AI that summarizes documents concisely."},
+                {"role": "user", "content": f"{instruction}\n\n{text}"}
+            ]
+        )
+        llm_span.set_attributes(llm_usage_attributes(response))
     return response['choices'][0]['message']['content']
 
 '''
@@ -0,0 +1,84 @@
+"""
+Summary retrieval tier: section- and document-level summaries of each filing, indexed next to the
+raw chunks (see partitions.py for where each tier lives in Pinecone and Chroma).
+
+Broad questions ("give me an overview of Q3 2024", "what are the main risks?") are answered from a
+few summaries instead of five raw chunks that may not be representative; specific ones (figures,
+named metrics such as revenue or margin) still go to the raw chunks. `route_query` decides which.
+"""
+import re
+from map_reduce_summary import summarize_sections, summary_cache_name, SUMMARY_MAX_WORKERS, SUMMARY_FAN_IN
+from partitions import QUARTER_YEAR_PATTERN, YEAR_QUARTER_PATTERN, validate_tier
+from embedding_models import get_hf_embeddings, HF_EMBEDDING_MODEL
+from tracing import span
+
+SUMMARY_TOP_K = 3  # Summaries in the prompt for a broad question
+
+BROAD_QUERY_PATTERN = re.compile(
+    r"\b(overview|summar(y|ize|ise)|overall|high[\s-]level|big picture|in general|generally|"
+    r"key (points|takeaways|themes|highlights|risks)|main (points|themes|risks|highlights)|"
+    r"highlights|takeaways|outlook|what (is|was|are|were) .{0,40}\babout|tell me about)\b",
+    re.IGNORECASE
+)
+# Figures and pointed questions need the raw text even when phrased broadly
+SPECIFIC_QUERY_PATTERN = re.compile(r"[\d$%]|\b(how much|how many|exact(ly)?|amount|per share|eps)\b", re.IGNORECASE)
+# Questions about a named metric want its figures ("tell me about data center revenue in Q3 2024")
+METRIC_QUERY_PATTERN = re.compile(
+    r"\b(revenues?|sales|(gross |operating |net )?margins?|earnings|income|profits?|net loss|cash( flow)?|"
+    r"(operating )?expenses|opex|capex|capital expenditures?|debt|dividends?|buybacks?|repurchases?|"
+    r"inventor(y|ies)|tax rate)\b",
+    re.IGNORECASE
+)
+# Period and section references carry digits without asking for figures
+REFERENCE_PATTERN = re.compile(r"\b(fiscal\s+)?(19|20)\d{2}\b|\bitem[\s-]+\d{1,2}[a-c]?\b|\b10-?[KQ]\b", re.IGNORECASE)
+
+
+def route_query(query, tier="auto"):
+    """
+    Retrieval tier for a query: "summaries" for broad questions, "chunks" for specific ones.
+    An explicit `tier` ("chunks"/"summaries") is returned as is.
+    """
+    if tier != "auto":
+        return validate_tier(tier)
+    stripped = REFERENCE_PATTERN.sub(" ", YEAR_QUARTER_PATTERN.sub(" ", QUARTER_YEAR_PATTERN.sub(" ", query or "")))
+    if BROAD_QUERY_PATTERN.search(stripped) and not (SPECIFIC_QUERY_PATTERN.search(stripped)
+                                                     or METRIC_QUERY_PATTERN.search(stripped)):
+        return "summaries"
+    return "chunks"
+
+
+def summary_records(summaries):
+    """
+    Chunk-like records (content + section fields) to index: the document summary first, without
+    section fields (so section-filtered queries only see section summaries), then each section's.
+    """
+    records = [{"content": summaries["document"]}]
+    records += [{**{key: value for key, value in section.items() if key != "summary"}, "content": section["summary"]}
+                for section in summaries["sections"]]
+    return records
+
+
+def build_summaries(chunks, source_path, provider="gpt", max_workers=SUMMARY_MAX_WORKERS, fan_in=SUMMARY_FAN_IN):
+    """Summarizes a chunked filing (cached like /summarize) and returns its summary records."""
+    summaries = summarize_sections(chunks, summary_cache_name(source_path, provider), provider, max_workers, fan_in)
+    return summary_records(summaries)
+
+
+def index_summaries(records, embeddings, target, source_path, index_name="json-index", region="us-east-1"):
+    """Upserts embedded summary records into the summary tier of Pinecone or Chroma. Returns the count."""
+    if target == "pinecone":
+        from Pinecone_v2 import upsert_embedded_chunks
+        return upsert_embedded_chunks(records, embeddings, index_name, region=region, source_path=source_path, tier="summaries")
+    if target == "chroma":
+        from chromadb_v2 import upsert_embedded_chunks_chromadb
+        return upsert_embedded_chunks_chromadb(records, embeddings, source_path=source_path, tier="summaries")
+    raise ValueError(f"The summary tier is indexed into pinecone or chroma, not {target}.")
+
+
+def summarize_and_index(chunks, source_path, target="pinecone", provider="gpt", index_name="json-index", region="us-east-1"):
+    """Builds the summary tier for one chunked filing: summarize, embed with the local model, upsert."""
+    records = build_summaries(chunks, source_path, provider)
+    with span("embed.summaries", {"embedding.provider": "huggingface", "embedding.model": HF_EMBEDDING_MODEL,
+                                  "embedding.inputs": len(records)}):
+        embeddings = get_hf_embeddings().embed_documents([record["content"] for record in records])
+    return index_summaries(records, embeddings, target, source_path, index_name, region)
@@ -0,0 +1,192 @@
+"""
+Request tracing: OpenTelemetry-compatible spans around each stage of the request path
+(GCS I/O, parse, chunk, embed, vector search, LLM call), so a slow request can be attributed
+to the stage that made it slow.
+
+TRACING_EXPORTER selects where finished spans go:
+  none    (default) not exported
+  stdout  one JSON line per span: trace/span/parent ids, start time, duration, status, attributes
+  otlp    the OpenTelemetry SDK with an OTLP exporter (OTEL_EXPORTER_OTLP_ENDPOINT, e.g. a local
+          collector); falls back to stdout if the opentelemetry packages aren't installed
+
+Independently of the exporter, span observers (see add_span_observer; metrics.py registers one)
+receive every finished span.
+"""
+import contextvars
+import functools
+import json
+import os
+import secrets
+import time
+from contextlib import contextmanager, nullcontext
+from datetime import datetime, timezone
+
+TRACING_EXPORTER = os.getenv("TRACING_EXPORTER", "none")
+SERVICE_NAME = os.getenv("OTEL_SERVICE_NAME", "rag-backend")
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+_observers = []
+
+
+class Span:
+    """A finished-on-exit span with the subset of the OpenTelemetry Span API used by the backend."""
+
+    def __init__(self, name, attributes=None, parent=None, otel_span=None):
+        self.name = name
+        self.otel_span = otel_span  # Attributes are mirrored to it when exporting through OpenTelemetry
+        if otel_span is not None:
+            context = otel_span.get_span_context()
+            self.trace_id, self.span_id = format(context.trace_id, "032x"), format(context.span_id, "016x")
+        else:
+            self.trace_id = parent.trace_id if parent else secrets.token_hex(16)
+            self.span_id = secrets.token_hex(8)
+        self.parent_id = parent.span_id if parent else None
+        self.attributes = {}
+        self.status = "OK"
+        self.start_time = datetime.now(timezone.utc)
+        self.duration_ms = None
+        self._start = time.perf_counter()
+        self.set_attributes(attributes)
+
+    def set_attribute(self, key, value):
+        if value is not None:
+            self.attributes[key] = value
+            if self.otel_span is not None:
+                self.otel_span.set_attribute(key, value)
+
+    def set_attributes(self, attributes):
+        for key, value in (attributes or {}).items():
+            self.set_attribute(key, value)
+
+    def record_exception(self, error):
+        self.status = "ERROR"
+        self.attributes["exception.type"] = type(error).__name__
+        self.attributes["exception.message"] = str(error)  # OpenTelemetry records it on its own span
+
+    def end(self):
+        self.duration_ms = round((time.perf_counter() - self._start) * 1000, 3)
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_time": self.start_time.isoformat(timespec="microseconds"),
+            "duration_ms": self.duration_ms,
+            "status": self.status,
+            "attributes": self.attributes,
+            "service": SERVICE_NAME
+        }
+
+
+class _NoopSpan:
+    trace_id = None
+
+    def set_attribute(self, key, value):
+        pass
+
+    def set_attributes(self, attributes):
+        pass
+
+    def record_exception(self, error):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+def _otel_tracer():
+    """OpenTelemetry tracer exporting over OTLP, or None (with a warning) if the SDK isn't installed."""
+    try:
+        from opentelemetry import trace
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+    except ImportError as e:
+        print(f"⚠️ TRACING_EXPORTER=otlp but OpenTelemetry is not installed ({e}); writing spans to stdout")
+        return None
+
+    provider = TracerProvider(resource=Resource.create({"service.name": SERVICE_NAME}))
+    provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+    trace.set_tracer_provider(provider)
+    return trace.get_tracer(__name__)
+
+
+_tracer = _otel_tracer() if TRACING_EXPORTER == "otlp" else None
+_print_spans = TRACING_EXPORTER == "stdout" or (TRACING_EXPORTER == "otlp" and _tracer is None)
+
+
+def add_span_observer(observer):
+    """Registers `observer(span)`, called with every finished span (whatever the exporter)."""
+    _observers.append(observer)
+
+
+def _finish(current):
+    current.end()
+    if _print_spans:
+        print(json.dumps(current.to_dict(), default=str), flush=True)
+    for observer in _observers:
+        observer(current)
+
+
+@contextmanager
+def span(name, attributes=None, end_on_exit=True):
+    """
+    Times the enclosed block as one span, nested under the current span (if any).
+    Yields the span so attributes learned inside the block (counts, bytes, cache hits) can be added.
+    Exceptions are recorded on the span and re-raised.
+    With end_on_exit=False the span only stops being current on exit; end it later with end_span
+    (e.g. once a streamed response body has been sent).
+    """
+    if TRACING_EXPORTER == "none" and not _observers:
+        yield NOOP_SPAN
+        return
+
+    otel_context = _tracer.start_as_current_span(name, end_on_exit=end_on_exit) if _tracer is not None else nullcontext()
+    with otel_context as otel_span:
+        current = Span(name, attributes, _current_span.get(), otel_span)
+        token = _current_span.set(current)
+        try:
+            yield current
+        except BaseException as e:
+            current.record_exception(e)
+            raise
+        finally:
+            _current_span.reset(token)
+            if end_on_exit:
+                _finish(current)
+
+
+def end_span(current):
+    """Ends a span opened with span(..., end_on_exit=False). Safe to call from any task or thread."""
+    if current is NOOP_SPAN:
+        return
+    if current.otel_span is not None:
+        current.otel_span.end()
+    _finish(current)
+
+
+def in_current_context(fn):
+    """
+    Wraps `fn` so calls from pool threads run inside the caller's trace context (threads don't
+    inherit context variables), keeping spans from parallel searches under the request's span.
+    """
+    context = contextvars.copy_context()
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        return context.copy().run(fn, *args, **kwargs)
+    return wrapper
+
+
+def llm_usage_attributes(response):
+    """Token counts from an OpenAI chat completion response, as span attributes."""
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return {}
+    return {
+        "llm.prompt_tokens": getattr(usage, "prompt_tokens", None),
+        "llm.completion_tokens": getattr(usage, "completion_tokens", None)
+    }
@@ -0,0 +1,67 @@
+from datetime import datetime, timezone
+
+# Kept outside pdf_files/ so it never shows up in the PDF listings
+MANIFEST_PATH = "manifests/pdf_files.json"
+MAX_SAVE_ATTEMPTS = 3
+
+
+def load_manifest():
+    """
+    Loads the scraped-filing manifest: {gcs_path: {url, etag, last_modified, size, sha256, generation, checked_at}}.
+    Returns (entries, generation); the generation is passed back to save_manifest for a safe overwrite.
+    """
+    from backend.gcs_utils import read_json_from_gcs  # Imported lazily like in pdf_downloader
+    data, generation = read_json_from_gcs(MANIFEST_PATH)
+    return (data or {}).get("files", {}), generation or 0
+
+
+def save_manifest(updated_entries, manifest, generation):
+    """
+    Writes `updated_entries` on top of `manifest` (as loaded at `generation`), only if nobody else updated
+    it since. If another run got there first, the latest manifest is reloaded and only the entries this
+    run updated are layered on top, so neither run's updates are lost.
+    """
+    from backend.gcs_utils import write_json_to_gcs
+    for _ in range(MAX_SAVE_ATTEMPTS):
+        if write_json_to_gcs({"files": {**manifest, **updated_entries}}, MANIFEST_PATH, if_generation_match=generation):
+            return True
+        manifest, generation = load_manifest()
+    print(f"⚠️ Could not save {MANIFEST_PATH}: it kept changing underneath us")
+    return False
+
+
+def is_current(entry, url, blob_info):
+    """An entry can be trusted only if it describes the same URL and the blob is still at the generation we wrote."""
+    return bool(entry) and blob_info is not None and entry.get("url") == url and entry.get("generation") == blob_info["generation"]
+
+
+def conditional_headers(entry):
+    """If-None-Match / If-Modified-Since headers from the validators the server gave us last time."""
+    headers = {}
+    if entry.get("etag"):
+        headers["If-None-Match"] = entry["etag"]
+    if entry.get("last_modified"):
+        headers["If-Modified-Since"] = entry["last_modified"]
+    return headers
+
+
+def make_entry(url, response_headers, size, sha256, generation):
+    return {
+        "url": url,
+        "etag": response_headers.get("ETag"),
+        "last_modified": response_headers.get("Last-Modified"),
+        "size": size,
+        "sha256": sha256,
+        "generation": generation,
+        "checked_at": datetime.now(timezone.utc).isoformat(timespec="seconds")
+    }
+
+
+def refresh_entry(entry, response_headers):
+    """Updates an entry after a 304: same content, possibly new validators."""
+    return {
+        **entry,
+        "etag": response_headers.get("ETag", entry.get("etag")),
+        "last_modified": response_headers.get("Last-Modified", entry.get("last_modified")),
+        "checked_at": datetime.now(timezone.utc).isoformat(timespec="seconds")
+    }
@@ -8,7 +8,7 @@ FASTAPI_URL = "https://assignment-4-redeploy-343736309329.us-central1.run.app"
 st.title("📄 PDF Processing & Q/A Service")
 
 # Sidebar navigation
-option = st.sidebar.radio("Choose an action:", ["Upload & Parse PDF", "Parse GCS PDF","Select chunking method","Select chunked output file","Select embedded output file","PineconeDB Indexing","ChromaDB Indexing","PineCone:Ask a Question","ChromaDB:Ask a Question","Ask a Research Question", "View Reports"])
+option = st.sidebar.radio("Choose an action:", ["Upload & Parse PDF", "Parse GCS PDF","Select chunking method","Select chunked output file","Select embedded output file","PineconeDB Indexing","ChromaDB Indexing","Run Ingestion Pipeline","PineCone:Ask a Question","ChromaDB:Ask a Question","Ask a Research Question", "View Reports"])
 
 
 # ✅ Upload & Parse a PDF
@@ -104,7 +104,7 @@ elif option == "Select chunking method":
             selected_file = st.selectbox("Choose a file:", files)
 
             # Dropdown to select chunking strategy
-            strategy = st.selectbox("Select chunking strategy:", ["fixed", "sentence", "sliding", "recursive","langchain"])
+            strategy = st.selectbox("Select chunking strategy:", ["fixed", "sentence", "sliding", "recursive", "langchain", "markdown", "semantic"])
 
             # Process file button
             if st.button("Process File"):
@@ -288,6 +288,37 @@ elif option == "ChromaDB Indexing":
     elif response.status_code != 200:
         st.error("Failed to fetch extracted files.")
 
+elif option == "Run Ingestion Pipeline":
+    st.subheader("🚚 Parse, chunk, embed and index PDFs in one pass")
+
+    response = requests.get(f"{FASTAPI_URL}/list_pdf_files")
+
+    if response.status_code == 200:
+        files = [f for f in response.json().get("files", []) if f.lower().endswith(".pdf")]
+        selected_files = st.multiselect("Choose PDFs (leave empty for all):", files)
+        target = st.selectbox("Index into:", ["pinecone", "chroma", "embeddings"])
+        strategy = st.selectbox("Select chunking strategy:", ["fixed", "sentence", "sliding", "recursive", "langchain", "markdown", "semantic"])
+        checkpoint = st.checkbox("Also save parsed and chunked files to GCS")
+
+        if st.button("Run Pipeline"):
+            with st.spinner("Ingesting..."):
+                pipeline_response = requests.post(
+                    f"{FASTAPI_URL}/run_ingestion_pipeline",
+                    json={"file_names": selected_files or None, "target": target,
+                          "strategy": strategy, "checkpoint": checkpoint}
+                )
+
+                if pipeline_response.status_code == 200:
+                    report = pipeline_response.json()
+                    st.success(f"✅ Ingested {report['succeeded']}/{report['documents']} PDFs in {report['wall_seconds']}s")
+                    st.table({name: stage for name, stage in report["stages"].items()})
+                    for failure in report["failed"]:
+                        st.error(f"❌ {failure['file']} ({failure['stage']}): {failure['error']}")
+                else:
+                    st.error(f"❌ Error: {pipeline_response.json().get('detail', 'Unknown error')}")
+    else:
+        st.error("Failed to fetch PDF files.")
+
 elif option == "PineCone:Ask a Question":
     st.subheader("🤖 Ask a Question About Your PDFs")
 
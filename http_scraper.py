@@ -0,0 +1,226 @@
+import os
+import re
+import json
+import argparse
+import time
+from html.parser import HTMLParser
+import requests
+from pdf_downloader import PdfLink, USER_AGENT, download_all, quarter_from_title, is_report_link, report_gcs_path
+
+# The investor page's accordion is rendered from this feed (Q4 Inc. FinancialReport service)
+PAGE_URL = os.getenv("NVIDIA_IR_URL", "https://investor.nvidia.com/financial-info/quarterly-results/default.aspx")
+FEED_URL = os.getenv("NVIDIA_IR_FEED_URL", "https://investor.nvidia.com/feed/FinancialReport.svc/GetFinancialReportList")
+FEED_API_KEY = os.getenv("NVIDIA_IR_API_KEY")  # Discovered from the page HTML when not set
+REQUEST_TIMEOUT = 30
+
+API_KEY_PATTERN = re.compile(r"""apiKey["']?\s*[:=]\s*["']([A-Za-z0-9]{16,64})["']""")
+TITLE_YEAR_PATTERN = re.compile(r"\b(20\d{2})\b")
+
+
+def parse_feed(feed, year):
+    """
+    Extracts 10-K/10-Q links for `year` from a GetFinancialReportList response (dict or JSON string).
+    Each report carries a title such as "Fourth Quarter 2025" and a list of documents.
+    """
+    if isinstance(feed, str):
+        feed = json.loads(feed)
+
+    links = []
+    for report in feed.get("GetFinancialReportListResult", []):
+        report_year = report.get("ReportYear")
+        if report_year is not None and str(report_year) != str(year):
+            continue
+
+        quarter = quarter_from_title(report.get("ReportTitle", "")) or quarter_from_title(report.get("ReportSubType", ""))
+        if quarter is None:
+            continue
+
+        for document in report.get("Documents", []):
+            url = document.get("DocumentPath", "")
+            link_text = (document.get("DocumentTitle") or "").strip()
+            if url.lower().endswith(".pdf") and is_report_link(link_text):
+                links.append(PdfLink(year, quarter, url, report_gcs_path(year, quarter, link_text)))
+    return links
+
+
+class AccordionParser(HTMLParser):
+    """Collects (title, [(href, link text)]) per accordion item from a rendered copy of the investor page."""
+
+    def __init__(self):
+        super().__init__()
+        self.items = []
+        self._item_depth = 0  # Open <div>s inside the current accordion item (0 = not in an item)
+        self._capture = None  # "title" or "link" while inside the matching <span>
+        self._link = None
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        classes = (attrs.get("class") or "").split()
+
+        if tag == "div":
+            if self._item_depth:
+                self._item_depth += 1
+            elif "evergreen-financial-accordion-item" in classes:
+                self.items.append({"title": "", "links": []})
+                self._item_depth = 1
+        elif not self._item_depth:
+            return
+        elif tag == "span" and "evergreen-accordion-title" in classes:
+            self._capture = "title"
+        elif tag == "a" and "evergreen-financial-accordion-attachment-PDF" in classes:
+            self._link = {"href": attrs.get("href") or "", "text": "", "aria_label": attrs.get("aria-label") or ""}
+        elif tag == "span" and self._link is not None and "evergreen-financial-accordion-link-text" in classes:
+            self._capture = "link"
+
+    def handle_endtag(self, tag):
+        if tag == "div" and self._item_depth:
+            self._item_depth -= 1
+        elif tag == "span":
+            self._capture = None
+        elif tag == "a" and self._link is not None:
+            self.items[-1]["links"].append(self._link)
+            self._link = None
+
+    def handle_data(self, data):
+        if self._capture == "title":
+            self.items[-1]["title"] += data
+        elif self._capture == "link":
+            self._link["text"] += data
+
+
+def parse_accordion_html(html, year):
+    """Extracts 10-K/10-Q links from the rendered accordion markup (the same elements Selenium walks)."""
+    parser = AccordionParser()
+    parser.feed(html)
+
+    links = []
+    for item in parser.items:
+        title = item["title"].strip()
+        quarter = quarter_from_title(title)
+        title_year = TITLE_YEAR_PATTERN.search(title)
+        if quarter is None or (title_year and title_year.group(1) != str(year)):
+            continue
+        for link in item["links"]:
+            link_text = link["text"].strip() or link["aria_label"].strip()
+            if link["href"].endswith(".pdf") and is_report_link(link_text):
+                links.append(PdfLink(year, quarter, link["href"], report_gcs_path(year, quarter, link_text)))
+    return links
+
+
+def discover_api_key(session, page_url=PAGE_URL):
+    """Finds the feed API key embedded in the investor page's scripts."""
+    response = session.get(page_url, timeout=REQUEST_TIMEOUT)
+    response.raise_for_status()
+    match = API_KEY_PATTERN.search(response.text)
+    return (match.group(1) if match else None), response.text
+
+
+def fetch_feed(session, year, api_key):
+    """Requests one year of financial reports from the feed."""
+    params = {
+        "apiKey": api_key,
+        "LanguageId": 1,
+        "year": year,
+        "pageSize": -1,
+        "pageNumber": 0,
+        "includeTags": "true",
+    }
+    response = session.get(FEED_URL, params=params, timeout=REQUEST_TIMEOUT)
+    response.raise_for_status()
+    return response.json()
+
+
+def collect_links_http(year, session=None, api_key=FEED_API_KEY, page_html=None, use_selenium_fallback=True):
+    """
+    Collects a year's 10-K/10-Q links without a browser: the JSON feed first, then the page HTML.
+    Falls back to the Selenium scraper only when neither yields links.
+    """
+    session = session or requests.Session()
+    session.headers.setdefault("User-Agent", USER_AGENT)
+
+    try:
+        if api_key is None or page_html is None:
+            discovered_key, page_html = discover_api_key(session)
+            api_key = api_key or discovered_key
+        if api_key:
+            links = parse_feed(fetch_feed(session, year, api_key), year)
+            if links:
+                print(f"✅ {year}: {len(links)} report PDFs from the JSON feed")
+                return links
+    except (requests.exceptions.RequestException, ValueError) as e:
+        print(f"⚠️ {year}: JSON feed unavailable ({e}), parsing page HTML")
+
+    links = parse_accordion_html(page_html or "", year)
+    if links:
+        print(f"✅ {year}: {len(links)} report PDFs from the page HTML")
+        return links
+
+    if not use_selenium_fallback:
+        print(f"❌ {year}: no links found over HTTP")
+        return []
+
+    print(f"⚠️ {year}: HTTP parsing found nothing, falling back to Selenium")
+    from selenium_webscraping import collect_nvidia_pdf_links  # Imported lazily: Chrome is only needed here
+    return collect_nvidia_pdf_links(year)
+
+
+def collect_links_for_years_http(years, use_selenium_fallback=True):
+    """Collects links for several years, reusing one HTTP session and one discovered API key."""
+    session = requests.Session()
+    session.headers["User-Agent"] = USER_AGENT
+
+    api_key, page_html = FEED_API_KEY, None
+    try:
+        discovered_key, page_html = discover_api_key(session)
+        api_key = api_key or discovered_key
+    except requests.exceptions.RequestException as e:
+        print(f"⚠️ Could not load {PAGE_URL}: {e}")
+
+    return [
+        link for year in years
+        for link in collect_links_http(year, session, api_key, page_html, use_selenium_fallback)
+    ]
+
+
+def collect_links_from_fixtures(years, feed_file=None, html_file=None):
+    """
+    Offline mode: parses recorded fixtures instead of hitting the network, e.g.
+    fixtures/nvidia_financial_report_feed.json and fixtures/nvidia_quarterly_results_rendered.html.
+    """
+    links = []
+    for year in years:
+        found = []
+        if feed_file:
+            with open(feed_file, encoding="utf-8") as f:
+                found = parse_feed(f.read(), year)
+        if not found and html_file:
+            with open(html_file, encoding="utf-8") as f:
+                found = parse_accordion_html(f.read(), year)
+        links.extend(found)
+    return links
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scrape NVIDIA 10-K/10-Q filings into GCS over plain HTTP.")
+    parser.add_argument("--years", type=int, nargs=2, default=[2021, 2025], metavar=("FIRST", "LAST"))
+    parser.add_argument("--feed-file", help="Recorded GetFinancialReportList JSON to parse instead of the live feed")
+    parser.add_argument("--html-file", help="Saved rendered investor page to parse instead of the live page")
+    parser.add_argument("--no-selenium-fallback", action="store_true")
+    parser.add_argument("--dry-run", action="store_true", help="Only list the discovered links")
+    parser.add_argument("--force", action="store_true", help="Re-download every PDF, ignoring the manifest")
+    args = parser.parse_args()
+
+    years_to_scrape = range(args.years[0], args.years[1] + 1)
+
+    start = time.perf_counter()
+    if args.feed_file or args.html_file:
+        all_links = collect_links_from_fixtures(years_to_scrape, args.feed_file, args.html_file)
+    else:
+        all_links = collect_links_for_years_http(years_to_scrape, not args.no_selenium_fallback)
+    print(f"⏱️ Link discovery took {time.perf_counter() - start:.1f}s")
+
+    if args.dry_run:
+        for link in all_links:
+            print(f"{link.year} {link.quarter} {link.url} -> {link.gcs_path}")
+    else:
+        download_all(all_links, force=args.force)
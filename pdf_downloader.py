@@ -0,0 +1,165 @@
+import asyncio
+import base64
+import hashlib
+import tempfile
+import time
+from collections import namedtuple
+import aiohttp
+from filing_manifest import load_manifest, save_manifest, is_current, conditional_headers, make_entry, refresh_entry
+
+# One discovered filing: where it came from and where it goes in GCS
+PdfLink = namedtuple("PdfLink", ["year", "quarter", "url", "gcs_path"])
+
+QUARTER_TITLES = {
+    "Fourth Quarter": "Q4",
+    "Third Quarter": "Q3",
+    "Second Quarter": "Q2",
+    "First Quarter": "Q1",
+}
+
+MAX_CONCURRENT_DOWNLOADS = 8
+READ_CHUNK_SIZE = 1024 * 1024  # Bytes read from the HTTP stream per iteration
+UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024  # Bytes per GCS resumable-upload request (must be a multiple of 256 KB)
+SPOOL_MEMORY_LIMIT = 16 * 1024 * 1024  # Re-downloads larger than this spill from memory to a temp file
+REQUEST_TIMEOUT = aiohttp.ClientTimeout(total=300, sock_read=60)
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/112.0.0.0 Safari/537.36"
+
+
+def quarter_from_title(title):
+    """Maps an accordion title such as "Fourth Quarter 2025" to "Q4" (None if unrecognized)."""
+    for phrase, quarter in QUARTER_TITLES.items():
+        if phrase in title:
+            return quarter
+    return None
+
+
+def is_report_link(link_text):
+    """True for the 10-K / 10-Q filings we ingest."""
+    lowered = link_text.lower()
+    return "10-k" in lowered or "10-q" in lowered
+
+
+def report_gcs_path(year, quarter, link_text):
+    """GCS layout shared by every scraper backend: pdf_files/{year}/{quarter}/{link_text}.pdf"""
+    return f"pdf_files/{year}/{quarter}/{link_text.replace(' ', '_').replace('/', '_')}.pdf"
+
+
+async def write_to_gcs(chunks, gcs_path):
+    """Streams an async iterator of byte chunks into a GCS resumable upload; returns (url, size, sha256)."""
+    from backend.gcs_utils import open_gcs_writer  # Imported lazily: link discovery and --dry-run need no GCS client
+    writer, gcs_file_url = await asyncio.to_thread(open_gcs_writer, gcs_path, "application/pdf", UPLOAD_CHUNK_SIZE)
+    sha256, size = hashlib.sha256(), 0
+    async for chunk in chunks:
+        # GCS writes block on network I/O, so keep them off the event loop
+        await asyncio.to_thread(writer.write, chunk)
+        sha256.update(chunk)
+        size += len(chunk)
+
+    # Closing finalizes the upload; on an interrupted transfer the session is left
+    # unfinalized so a partial PDF never replaces the existing blob
+    await asyncio.to_thread(writer.close)
+    return gcs_file_url, size, sha256.hexdigest()
+
+
+async def iter_spool(spool):
+    spool.seek(0)
+    while chunk := spool.read(READ_CHUNK_SIZE):
+        yield chunk
+
+
+async def stream_pdf_to_gcs(session, link, entry=None):
+    """
+    Downloads one PDF into GCS unless it is unchanged. Returns (status, manifest entry, size) with
+    status "not_modified" (server answered 304), "unchanged" (same bytes as the stored blob) or "uploaded".
+
+    New files stream straight from the HTTP response into a GCS resumable upload. When a blob already
+    exists, the response is spooled (memory, then a temp file) while hashing, and only uploaded if its
+    hash differs from the manifest's sha256 (or the blob's own MD5 when there is no manifest entry).
+    Skipped files keep their GCS generation, so nothing downstream sees them as new.
+    """
+    from backend.gcs_utils import get_blob_info
+    blob_info = await asyncio.to_thread(get_blob_info, link.gcs_path)
+    trusted = is_current(entry, link.url, blob_info)
+    headers = conditional_headers(entry) if trusted else {}
+
+    async with session.get(link.url, headers=headers) as response:
+        if response.status == 304:
+            return "not_modified", refresh_entry(entry, response.headers), 0
+        response.raise_for_status()
+
+        if blob_info is None:
+            gcs_file_url, size, sha256 = await write_to_gcs(response.content.iter_chunked(READ_CHUNK_SIZE), link.gcs_path)
+        else:
+            with tempfile.SpooledTemporaryFile(max_size=SPOOL_MEMORY_LIMIT) as spool:
+                sha256_hash, md5_hash, size = hashlib.sha256(), hashlib.md5(), 0
+                async for chunk in response.content.iter_chunked(READ_CHUNK_SIZE):
+                    spool.write(chunk)
+                    sha256_hash.update(chunk)
+                    md5_hash.update(chunk)
+                    size += len(chunk)
+                sha256 = sha256_hash.hexdigest()
+
+                unchanged = (sha256 == entry.get("sha256")) if trusted else \
+                    (base64.b64encode(md5_hash.digest()).decode() == blob_info["md5_hash"])
+                if unchanged:
+                    return "unchanged", make_entry(link.url, response.headers, size, sha256, blob_info["generation"]), size
+
+                gcs_file_url, size, sha256 = await write_to_gcs(iter_spool(spool), link.gcs_path)
+
+        response_headers = response.headers
+
+    new_info = await asyncio.to_thread(get_blob_info, link.gcs_path)
+    print(f"✅ Uploaded to GCS: {gcs_file_url} ({size / 2**20:.1f} MB)")
+    return "uploaded", make_entry(link.url, response_headers, size, sha256, new_info["generation"] if new_info else None), size
+
+
+async def download_pdfs(links, max_concurrency=MAX_CONCURRENT_DOWNLOADS, force=False):
+    """
+    Downloads every discovered PDF with at most `max_concurrency` transfers in flight, skipping
+    files the manifest shows are unchanged (pass `force` to ignore the manifest) and saving the
+    updated manifest at the end. Returns one result dict per link; failures are reported, not
+    raised, so one bad link doesn't abort the batch.
+    """
+    manifest, manifest_generation = await asyncio.to_thread(load_manifest)
+    updated_entries = {}
+
+    semaphore = asyncio.Semaphore(max_concurrency)
+    connector = aiohttp.TCPConnector(limit=max_concurrency)
+
+    async with aiohttp.ClientSession(connector=connector, timeout=REQUEST_TIMEOUT, headers={"User-Agent": USER_AGENT}) as session:
+
+        async def _download(link):
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    entry = None if force else manifest.get(link.gcs_path)
+                    status, new_entry, size = await stream_pdf_to_gcs(session, link, entry)
+                    updated_entries[link.gcs_path] = new_entry
+                    if status != "uploaded":
+                        print(f"⏭️ Skipped {link.gcs_path} ({status.replace('_', ' ')})")
+                    return {"link": link, "status": status, "bytes": size,
+                            "seconds": time.perf_counter() - start, "error": None}
+                except Exception as e:
+                    print(f"❌ Error downloading {link.url}: {str(e)}")
+                    return {"link": link, "status": "failed", "bytes": 0,
+                            "seconds": time.perf_counter() - start, "error": str(e)}
+
+        results = await asyncio.gather(*(_download(link) for link in links))
+
+    if updated_entries:
+        await asyncio.to_thread(save_manifest, updated_entries, manifest, manifest_generation)
+    return results
+
+
+def download_all(links, max_concurrency=MAX_CONCURRENT_DOWNLOADS, force=False):
+    """Synchronous entry point: downloads all links concurrently and prints a summary."""
+    links = list(links)
+    start = time.perf_counter()
+    results = asyncio.run(download_pdfs(links, max_concurrency, force))
+    elapsed = time.perf_counter() - start
+
+    total_bytes = sum(r["bytes"] for r in results)
+    counts = {status: sum(r["status"] == status for r in results) for status in ("uploaded", "not_modified", "unchanged", "failed")}
+    print(f"📂 Uploaded {counts['uploaded']}/{len(links)} PDFs ({total_bytes / 2**20:.1f} MB transferred) in {elapsed:.1f}s; "
+          f"skipped {counts['not_modified']} not modified and {counts['unchanged']} unchanged, {counts['failed']} failed")
+    return results
@@ -1,110 +1,142 @@
 import os
+import argparse
 import time
-import requests
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import Select
+from selenium.webdriver.support.ui import Select, WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.chrome.options import Options
+from selenium.common.exceptions import TimeoutException, StaleElementReferenceException
 from webdriver_manager.chrome import ChromeDriverManager
-from io import BytesIO
-from backend.gcs_utils import upload_to_gcs  # Importing GCS upload function
+from pdf_downloader import PdfLink, download_all, quarter_from_title, is_report_link, report_gcs_path
 
 # Configuration
-BASE_URL = "https://investor.nvidia.com/financial-info/quarterly-results/default.aspx"
+# Override with a file:// URL to run against a saved copy of the page (e.g. fixtures/nvidia_quarterly_results.html)
+BASE_URL = os.getenv("NVIDIA_IR_URL", "https://investor.nvidia.com/financial-info/quarterly-results/default.aspx")
+WAIT_TIMEOUT = 20  # Upper bound for each explicit wait; waits return as soon as their condition holds
+
+YEAR_SELECT_ID = "_ctrl0_ctl75_selectEvergreenFinancialAccordionYear"
+ACCORDION_SELECTOR = "div.evergreen-accordion.evergreen-financial-accordion-item"
+TOGGLE_SELECTOR = "button.evergreen-financial-accordion-toggle"
+TITLE_SELECTOR = "span.evergreen-accordion-title"
+PDF_LINK_SELECTOR = "a.evergreen-financial-accordion-attachment-PDF"
+LINK_TEXT_SELECTOR = "span.evergreen-link-text.evergreen-financial-accordion-link-text"
+
+@lru_cache(maxsize=1)
+def chromedriver_path():
+    """Resolves (and if needed downloads) chromedriver once per process."""
+    return ChromeDriverManager().install()
+
+def create_driver():
+    """Starts a headless Chrome session for scraping."""
+    chrome_options = Options()
+    chrome_options.add_argument("--headless=new")
+    chrome_options.add_argument("--no-sandbox")
+    chrome_options.add_argument("--disable-dev-shm-usage")
+    chrome_options.add_argument("--window-size=1920,1080")
+    chrome_options.add_argument("--disable-gpu")
+    chrome_options.add_argument(
+        "user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/112.0.0.0 Safari/537.36"
+    )
+    # Don't block on images/fonts; the explicit waits below decide when the DOM we need is ready
+    chrome_options.page_load_strategy = "eager"
 
-def download_pdf_to_gcs(url, gcs_path):
+    return webdriver.Chrome(service=Service(chromedriver_path()), options=chrome_options)
+
+def element_text(element):
+    """Text of an element even when it sits in a collapsed (hidden) accordion."""
+    return (element.get_attribute("textContent") or "").strip()
+
+def select_year(driver, year, base_url=BASE_URL):
     """
-    Downloads a PDF from the given URL and uploads it directly to GCS.
+    Loads the page (only if not already open) and selects the year, waiting until the
+    accordion has been re-rendered for that year instead of sleeping.
     """
-    try:
-        response = requests.get(url, stream=True)
-        response.raise_for_status()  # Raise an exception for 4xx/5xx errors
+    wait = WebDriverWait(driver, WAIT_TIMEOUT)
 
-        # Wrap bytes in BytesIO to create a file-like object
-        pdf_bytes = BytesIO(response.content)
-        pdf_bytes.seek(0)  # Ensure pointer is at the beginning
+    if driver.current_url != base_url:
+        print(f"🌍 Accessing {base_url}")
+        driver.get(base_url)
 
-        # Upload the PDF to GCS
-        gcs_file_url = upload_to_gcs(pdf_bytes, gcs_path)
-        print(f"✅ Uploaded to GCS: {gcs_file_url}")
+    year_dropdown = wait.until(EC.presence_of_element_located((By.ID, YEAR_SELECT_ID)))
+    year_select = Select(year_dropdown)
+    if year_select.first_selected_option.get_attribute("value") == str(year):
+        wait.until(EC.presence_of_all_elements_located((By.CSS_SELECTOR, ACCORDION_SELECTOR)))
+        return
 
-    except requests.exceptions.RequestException as e:
-        print(f"❌ Error downloading {url}: {str(e)}")
+    previous_items = driver.find_elements(By.CSS_SELECTOR, ACCORDION_SELECTOR)
+    year_select.select_by_value(str(year))
+    print(f"✅ Selected year {year} from dropdown")
 
-def get_nvidia_quarterly_pdfs(year):
+    def accordion_refreshed(driver):
+        # Either the old items were replaced, or they were re-rendered in place with the new year's titles
+        if previous_items:
+            try:
+                previous_items[0].is_enabled()
+            except StaleElementReferenceException:
+                return bool(driver.find_elements(By.CSS_SELECTOR, ACCORDION_SELECTOR))
+        titles = driver.find_elements(By.CSS_SELECTOR, TITLE_SELECTOR)
+        return bool(titles) and str(year) in element_text(titles[0])
+
+    wait.until(accordion_refreshed)
+
+def expand_accordion(driver, item):
+    """Expands one quarter section and waits until its PDF links are attached."""
+    toggle_button = item.find_element(By.CSS_SELECTOR, TOGGLE_SELECTOR)
+    if toggle_button.get_attribute("aria-expanded") == "false":
+        driver.execute_script("arguments[0].click();", toggle_button)
+        WebDriverWait(driver, WAIT_TIMEOUT).until(
+            lambda _: item.find_elements(By.CSS_SELECTOR, PDF_LINK_SELECTOR)
+        )
+
+def collect_nvidia_pdf_links(year, driver=None, base_url=BASE_URL):
     """
-    Scrapes NVIDIA's investor relations page for 10-K/10-Q reports for a given year
-    and uploads the PDFs to GCS.
+    Scrapes NVIDIA's investor relations page for the 10-K/10-Q report links of a given year.
+    Only discovers links; returns a list of PdfLink(year, quarter, url, gcs_path) to download.
+    Pass an existing `driver` to reuse one browser session across years.
     """
     print(f"📌 Starting NVIDIA financial report scraper for year: {year}")
+    links = []
 
-    # Selenium options for headless Chrome
-    chrome_options = Options()
-    chrome_options.add_argument("--headless=new")
-    chrome_options.add_argument("--no-sandbox")
-    chrome_options.add_argument("--disable-dev-shm-usage")
-    chrome_options.add_argument("--window-size=1920,1080")
-    chrome_options.add_argument("--disable-gpu")
-    chrome_options.add_argument(
-        "user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/112.0.0.0 Safari/537.36"
-    )
-
-    driver = webdriver.Chrome(
-        service=Service(ChromeDriverManager().install()), options=chrome_options
-    )
+    own_driver = driver is None
+    if own_driver:
+        driver = create_driver()
 
     try:
-        print(f"🌍 Accessing {BASE_URL}")
-        driver.get(BASE_URL)
-        time.sleep(5)  # Allow time for the page to load
-
         # Select the year from the dropdown
         try:
-            year_dropdown = driver.find_element(By.ID, "_ctrl0_ctl75_selectEvergreenFinancialAccordionYear")
-            year_select = Select(year_dropdown)
-            year_select.select_by_value(str(year))
-            print(f"✅ Selected year {year} from dropdown")
-            time.sleep(3)
-        except Exception as e:
+            select_year(driver, year, base_url)
+        except TimeoutException as e:
             print(f"❌ Error selecting year {year}: {str(e)}")
+            return links
 
         # Locate all quarter accordion items
-        accordion_items = driver.find_elements(By.CSS_SELECTOR, "div.evergreen-accordion.evergreen-financial-accordion-item")
+        accordion_items = driver.find_elements(By.CSS_SELECTOR, ACCORDION_SELECTOR)
         print(f"🔎 Found {len(accordion_items)} quarter sections on the page")
 
         for item in accordion_items:
             try:
-                # Expand the accordion if not already expanded
-                try:
-                    toggle_button = item.find_element(By.CSS_SELECTOR, "button.evergreen-financial-accordion-toggle")
-                    if toggle_button.get_attribute("aria-expanded") == "false":
-                        toggle_button.click()
-                        time.sleep(1)
-                except Exception:
-                    print("⚠️ Could not expand accordion item, possibly already expanded")
-
                 # Extract the quarter title (e.g., "Fourth Quarter 2025")
-                title_elem = item.find_element(By.CSS_SELECTOR, "span.evergreen-accordion-title")
-                quarter_text = title_elem.text.strip()
+                quarter_text = element_text(item.find_element(By.CSS_SELECTOR, TITLE_SELECTOR))
                 print(f"📁 Processing: {quarter_text}")
 
                 # Determine quarter name
-                quarter = None
-                if "Fourth Quarter" in quarter_text:
-                    quarter = "Q4"
-                elif "Third Quarter" in quarter_text:
-                    quarter = "Q3"
-                elif "Second Quarter" in quarter_text:
-                    quarter = "Q2"
-                elif "First Quarter" in quarter_text:
-                    quarter = "Q1"
-                else:
+                quarter = quarter_from_title(quarter_text)
+                if quarter is None:
                     print(f"⚠️ Could not determine quarter from title: {quarter_text}")
                     continue
 
-                # Extract all PDF links for 10-K and 10-Q reports
-                pdf_links = item.find_elements(By.CSS_SELECTOR, "a.evergreen-financial-accordion-attachment-PDF")
+                # Links are usually in the DOM even while collapsed; expand only if they are lazy-loaded
+                pdf_links = item.find_elements(By.CSS_SELECTOR, PDF_LINK_SELECTOR)
+                if not pdf_links:
+                    try:
+                        expand_accordion(driver, item)
+                        pdf_links = item.find_elements(By.CSS_SELECTOR, PDF_LINK_SELECTOR)
+                    except Exception:
+                        print("⚠️ Could not expand accordion item, possibly already expanded")
                 print(f"🔗 Found {len(pdf_links)} PDF links in {quarter_text}")
 
                 for link in pdf_links:
@@ -113,35 +145,76 @@ def get_nvidia_quarterly_pdfs(year):
                         continue
 
                     # Extract text or aria-label
-                    link_text = ""
-                    try:
-                        span = link.find_element(By.CSS_SELECTOR, "span.evergreen-link-text.evergreen-financial-accordion-link-text")
-                        link_text = span.text.strip()
-                    except Exception:
-                        link_text = link.get_attribute("aria-label") or ""
+                    spans = link.find_elements(By.CSS_SELECTOR, LINK_TEXT_SELECTOR)
+                    link_text = element_text(spans[0]) if spans else (link.get_attribute("aria-label") or "")
 
                     # Check if it's a 10-K or 10-Q report
-                    if "10-k" in link_text.lower() or "10-q" in link_text.lower():
-                        # GCS file path format: "nvidia_reports/{year}/{quarter}/{filename}.pdf"
-                        gcs_filename = f"pdf_files/{year}/{quarter}/{link_text.replace(' ', '_').replace('/', '_')}.pdf"
-                        print(f"📥 Uploading to GCS: {gcs_filename}")
-
-                        # Download and upload PDF to GCS
-                        download_pdf_to_gcs(href, gcs_filename)
+                    if is_report_link(link_text):
+                        gcs_filename = report_gcs_path(year, quarter, link_text)
+                        print(f"🔗 Found: {gcs_filename}")
+                        links.append(PdfLink(year, quarter, href, gcs_filename))
             except Exception as e:
                 print(f"❌ Error processing quarter accordion: {str(e)}")
 
-        print(f"📂 Completed uploading PDFs for {year}")
+        print(f"📂 Found {len(links)} report PDFs for {year}")
 
     except Exception as e:
         print(f"❌ Error scraping NVIDIA reports for {year}: {str(e)}")
+    finally:
+        if own_driver:
+            driver.quit()
+
+    return links
+
+def collect_links_with_one_browser(years, base_url=BASE_URL):
+    """Collects links for several years in a single browser session."""
+    driver = create_driver()
+    try:
+        return [link for year in years for link in collect_nvidia_pdf_links(year, driver, base_url)]
     finally:
         driver.quit()
 
+def collect_links_for_years(years, parallel_browsers=1, base_url=BASE_URL):
+    """
+    Collects links for all years. With `parallel_browsers` > 1 the years are split across that
+    many independent browser sessions running in parallel (each still reused across its years).
+    """
+    years = list(years)
+    parallel_browsers = max(1, min(parallel_browsers, len(years)))
+    if parallel_browsers == 1:
+        return collect_links_with_one_browser(years, base_url)
+
+    groups = [years[i::parallel_browsers] for i in range(parallel_browsers)]
+    with ThreadPoolExecutor(max_workers=parallel_browsers) as executor:
+        results = executor.map(lambda group: collect_links_with_one_browser(group, base_url), groups)
+    return [link for links in results for link in links]
+
+def get_nvidia_quarterly_pdfs(year):
+    """
+    Scrapes NVIDIA's investor relations page for 10-K/10-Q reports for a given year
+    and uploads the PDFs to GCS.
+    """
+    return download_all(collect_nvidia_pdf_links(year))
+
 # Run the scraper for multiple years (2021–2025)
 if __name__ == "__main__":
-    years_to_scrape = range(2021, 2026)  # Scrape from 2021 to 2025
-    for year in years_to_scrape:
-        print(f"🚀 Scraping NVIDIA reports for {year}...")
-        get_nvidia_quarterly_pdfs(year)
-        time.sleep(2)  # Small delay to avoid hitting the server too fast
+    parser = argparse.ArgumentParser(description="Scrape NVIDIA 10-K/10-Q filings into GCS.")
+    parser.add_argument("--years", type=int, nargs=2, default=[2021, 2025], metavar=("FIRST", "LAST"))
+    parser.add_argument("--parallel-browsers", type=int, default=1, help="Independent browser sessions to split the years across")
+    parser.add_argument("--base-url", default=BASE_URL, help="Page to scrape; a file:// URL runs against a saved copy")
+    parser.add_argument("--dry-run", action="store_true", help="Only list the discovered links")
+    parser.add_argument("--force", action="store_true", help="Re-download every PDF, ignoring the manifest")
+    args = parser.parse_args()
+
+    years_to_scrape = range(args.years[0], args.years[1] + 1)  # Scrape from 2021 to 2025 by default
+
+    # Discover every link first, then download them all concurrently
+    start = time.perf_counter()
+    all_links = collect_links_for_years(years_to_scrape, args.parallel_browsers, args.base_url)
+    print(f"⏱️ Link discovery took {time.perf_counter() - start:.1f}s")
+
+    if args.dry_run:
+        for link in all_links:
+            print(f"{link.year} {link.quarter} {link.url} -> {link.gcs_path}")
+    else:
+        download_all(all_links, force=args.force)
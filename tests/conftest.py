@@ -0,0 +1,54 @@
+import json
+import os
+import sys
+import tempfile
+import numpy as np
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Never reach GCS from tests: everything goes to the local storage backend
+os.environ.setdefault("STORAGE_BACKEND", "local")
+os.environ.setdefault("LOCAL_STORAGE_DIR", tempfile.mkdtemp(prefix="test_storage_"))
+
+# Root scripts import the backend as a package, the backend modules import each other flat
+sys.path[:0] = [ROOT, os.path.join(ROOT, "backend")]
+
+
+@pytest.fixture
+def local_bucket(tmp_path, monkeypatch):
+    """An empty local bucket behind every loaded copy of gcs_utils (flat and backend.gcs_utils)."""
+    from local_storage import LocalBucket
+    bucket = LocalBucket(str(tmp_path / "bucket"))
+    for name in ("gcs_utils", "backend.gcs_utils"):
+        if name in sys.modules:
+            monkeypatch.setattr(sys.modules[name], "bucket", bucket)
+    return bucket
+
+
+def unit_vector(axis, dim):
+    vector = np.zeros(dim, dtype=np.float32)
+    vector[axis] = 1.0
+    return vector.tolist()
+
+
+@pytest.fixture
+def corpus(local_bucket, monkeypatch):
+    """
+    Two embedding artifacts (one chunk per axis: "chunk 0".."chunk 3", Q1 and Q2 2024) plus an index and
+    a sidecar to be ignored. The corpus search embeds a query "n" as the unit vector of axis n.
+    """
+    import corpus_search
+    from embedding_models import EMBEDDING_MODEL, EMBEDDING_MODELS
+    dim = EMBEDDING_MODELS[EMBEDDING_MODEL]["dim"]
+
+    for name, axes, quarter in [("embeddings/a_Q1_2024.json", [0, 1], "Q1_2024"), ("embeddings/b_Q2_2024.json", [2, 3], "Q2_2024")]:
+        items = [{"text": f"chunk {axis}", "embedding": unit_vector(axis, dim), "filename": name, "quarter": quarter,
+                  "embedding_model": EMBEDDING_MODEL, "embedding_dim": dim} for axis in axes]
+        local_bucket.blob(name).upload_from_string(json.dumps(items))
+    local_bucket.blob("embeddings/_ann/corpus_ivf.npz").upload_from_string(b"index")
+    local_bucket.blob("embeddings/_f32/a_Q1_2024.npy").upload_from_string(b"sidecar")
+
+    monkeypatch.setattr(corpus_search, "get_embedding", lambda query, model=None, dimensions=None: unit_vector(int(query), dim))
+    corpus_search._artifact_cache.clear()
+    return local_bucket
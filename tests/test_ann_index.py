@@ -0,0 +1,134 @@
+import json
+import os
+import numpy as np
+import pytest
+import ann_index
+from ann_index import IVFIndex
+
+
+def random_vectors(n, dim=16, seed=0):
+    return np.random.default_rng(seed).normal(size=(n, dim)).astype(np.float32)
+
+
+def test_trained_size_is_corpus_size_before_sampling(monkeypatch):
+    monkeypatch.setattr(ann_index, "MAX_TRAINING_VECTORS", 100)
+    vectors = random_vectors(1000)
+    index = IVFIndex()
+    index.train(vectors, n_lists=10)
+    index.add(vectors, [{} for _ in vectors])
+
+    assert index.trained_size == 1000
+    assert not index.needs_retrain
+
+
+def test_needs_retrain_once_corpus_outgrows_centroids():
+    index = IVFIndex()
+    index.train(random_vectors(100), n_lists=5)
+    index.add(random_vectors(500, seed=1), [{} for _ in range(500)])
+    assert index.needs_retrain
+
+
+def test_quarter_filter_widens_probe():
+    vectors = random_vectors(1000)
+    metadata = [{"quarter": "Q1" if i % 50 == 0 else "Q2"} for i in range(1000)]
+    index = IVFIndex()
+    index.train(vectors, n_lists=20)
+    index.add(vectors, metadata)
+
+    for query in vectors[:20]:
+        _, ids = index.search(query, k=5, n_probe=1, quarter="Q1")
+        assert len(ids) == 5
+        assert all(metadata[i]["quarter"] == "Q1" for i in ids)
+
+
+def test_quarter_filter_matches_brute_force_when_probing_everything():
+    vectors = random_vectors(300)
+    metadata = [{"quarter": f"Q{i % 4 + 1}"} for i in range(300)]
+    index = IVFIndex()
+    index.train(vectors, n_lists=8)
+    index.add(vectors, metadata)
+
+    _, ann_ids = index.search(vectors[0], k=5, n_probe=8, quarter="Q3")
+    _, exact_ids = index.brute_force_search(vectors[0], k=5, quarter="Q3")
+    assert ann_ids.tolist() == exact_ids.tolist()
+
+
+def upload_artifact(bucket, name, vectors, model):
+    items = [{"text": f"{name} {i}", "embedding": vector.tolist(), "filename": name, "quarter": "Q1_2024",
+              "embedding_model": model, "embedding_dim": len(vector)} for i, vector in enumerate(vectors)]
+    bucket.blob(name).upload_from_string(json.dumps(items))
+
+
+def test_build_skips_other_models_and_dimensions_before_training(local_bucket):
+    upload_artifact(local_bucket, "embeddings/a.json", random_vectors(40, dim=16), "model-a")
+    upload_artifact(local_bucket, "embeddings/b.json", random_vectors(40, dim=8, seed=1), "model-a")
+    upload_artifact(local_bucket, "embeddings/c.json", random_vectors(40, dim=16, seed=2), "model-b")
+    upload_artifact(local_bucket, "embeddings/d.json", random_vectors(40, dim=16, seed=3), "model-a")
+
+    index = ann_index.build_corpus_index(n_lists=4)
+
+    assert index.dim == 16
+    assert sorted(index.indexed_files) == ["embeddings/a.json", "embeddings/d.json"]
+    assert index.trained_size == 80
+    assert {record["embedding_model"] for record in index.metadata} == {"model-a"}
+
+
+def backdate(bucket, name):
+    """Gives a blob an old generation, so its next write gets a new one even with coarse file timestamps."""
+    os.utime(bucket.blob(name).path, ns=(1, 1))
+
+
+@pytest.fixture
+def fresh_corpus_index(monkeypatch):
+    monkeypatch.setattr(ann_index, "_corpus_index", None)
+    monkeypatch.setattr(ann_index, "_corpus_index_generation", None)
+    monkeypatch.setattr(ann_index, "ANN_INDEX_REFRESH_SECONDS", 0)
+
+
+def test_reembedded_and_deleted_artifacts_are_replaced(local_bucket, fresh_corpus_index):
+    upload_artifact(local_bucket, "embeddings/a.json", random_vectors(40), "model-a")
+    upload_artifact(local_bucket, "embeddings/b.json", random_vectors(40, seed=1), "model-a")
+    backdate(local_bucket, "embeddings/a.json")
+    ann_index.build_corpus_index(n_lists=4)
+
+    upload_artifact(local_bucket, "embeddings/a.json", random_vectors(10, seed=2), "model-a")
+    os.remove(local_bucket.blob("embeddings/b.json").path)
+    index = ann_index.build_corpus_index(n_lists=4)
+
+    assert len(index) == 10
+    assert list(index.indexed_files) == ["embeddings/a.json"]
+    assert index.indexed_files["embeddings/a.json"] == local_bucket.blob("embeddings/a.json").generation
+    assert ann_index.load_index().indexed_files == index.indexed_files
+
+
+def test_replicas_reload_a_rebuilt_index(local_bucket, fresh_corpus_index):
+    upload_artifact(local_bucket, "embeddings/a.json", random_vectors(40), "model-a")
+    ann_index.build_corpus_index(n_lists=4)
+    assert len(ann_index.get_corpus_index()) == 40
+
+    # Another replica adds an artifact and saves a new index; this one only sees the blob change
+    backdate(local_bucket, ann_index.ANN_INDEX_BLOB)
+    upload_artifact(local_bucket, "embeddings/b.json", random_vectors(40, seed=1), "model-a")
+    index = ann_index.load_index()
+    index.add(random_vectors(40, seed=1), [{} for _ in range(40)], file_name="embeddings/b.json", generation=1)
+    ann_index.save_index(index)
+
+    assert len(ann_index.get_corpus_index()) == 80
+
+
+def test_search_corpus_ann_normalizes_quarters_and_filters_sections(local_bucket, fresh_corpus_index, monkeypatch):
+    vectors = random_vectors(60)
+    items = [{"text": f"chunk {i}", "embedding": vector.tolist(), "filename": "a.pdf",
+              "quarter": "Q1_2024" if i % 2 else "Q2_2024", "section_item": "item-7" if i % 3 == 0 else "item-1a",
+              "embedding_model": "model-a", "embedding_dim": 16} for i, vector in enumerate(vectors)]
+    local_bucket.blob("embeddings/a.json").upload_from_string(json.dumps(items))
+    ann_index.build_corpus_index(n_lists=4)
+    monkeypatch.setattr(ann_index, "get_embedding", lambda query, model=None, dimensions=None: vectors[1].tolist())
+
+    for quarter in ("Q1_2024", "2024-Q1", "Q1 2024"):
+        results = ann_index.search_corpus_ann("growth", quarter_filter=quarter, top_n=5)
+        assert len(results) == 5 and {result["quarter"] for result in results} == {"Q1_2024"}
+
+    results = ann_index.search_corpus_ann("growth", top_n=5, section="Item 7")
+    assert len(results) == 5
+    assert all(int(result["chunk"].split()[1]) % 3 == 0 for result in results)
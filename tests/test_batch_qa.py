@@ -0,0 +1,27 @@
+import pytest
+from batch_qa import validate_batch
+
+
+def test_valid_batch_passes():
+    validate_batch(["What was revenue in Q3 2024?"], "chroma", "chunks", 4, section="Item 7", top_k=3)
+
+
+@pytest.mark.parametrize("options, message", [
+    ({"section": "Item 99x"}, "Unknown section"),
+    ({"section": "weather"}, "Unknown section"),
+    ({"top_k": 0}, "top_k"),
+    ({"top_k": -3}, "top_k"),
+    ({"tier": "everything"}, "Unknown retrieval tier"),
+    ({"store": "redis"}, "Unknown store"),
+    ({"max_concurrency": 0}, "max_concurrency"),
+])
+def test_invalid_options_fail_before_streaming(options, message):
+    with pytest.raises(ValueError, match=message):
+        validate_batch(["What was revenue in Q3 2024?"], **options)
+
+
+def test_blank_and_oversized_batches_are_rejected():
+    with pytest.raises(ValueError):
+        validate_batch(["  ", ""])
+    with pytest.raises(ValueError):
+        validate_batch(["q"] * 101)
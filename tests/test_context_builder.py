@@ -0,0 +1,36 @@
+from context_builder import build_context
+from chunking import count_tokens
+
+DOCUMENT = " ".join(f"word{i}" for i in range(200))
+
+
+def span_chunk(start, end, score, source="outputs/a.md"):
+    return {"text": DOCUMENT[start:end], "source": source, "char_start": start, "char_end": end, "score": score}
+
+
+def test_budget_drops_are_not_counted_as_savings():
+    chunks = [{"text": DOCUMENT[:300], "score": 2}, {"text": DOCUMENT[600:900], "score": 1}]
+    budget = count_tokens(DOCUMENT[:300])
+    result = build_context(chunks, token_budget=budget)
+
+    assert result["over_budget"] == 1
+    assert result["tokens_over_budget"] == count_tokens(DOCUMENT[600:900])
+    assert result["tokens_saved"] == 0
+
+
+def test_overlap_is_counted_as_savings():
+    result = build_context([span_chunk(0, 300, 2), span_chunk(200, 500, 1)], token_budget=10_000)
+
+    assert result["context"] == DOCUMENT[:500].strip()
+    assert result["tokens_over_budget"] == 0
+    assert result["tokens_saved"] == result["verbatim_tokens"] - result["tokens"] > 0
+
+
+def test_spanless_chunk_inside_a_merged_passage_is_a_duplicate():
+    # Straddles the two span chunks, so it's only inside their merged passage
+    loose = {"text": DOCUMENT[250:350], "score": 1}
+    result = build_context([span_chunk(0, 300, 3), span_chunk(300, 600, 2), loose], token_budget=10_000)
+
+    assert result["duplicates_removed"] == 1
+    assert loose not in result["chunks"]
+    assert result["context"] == DOCUMENT[:600].strip()
@@ -0,0 +1,25 @@
+import pytest
+import corpus_search
+from gen_embedding import list_embedding_artifacts
+
+
+def test_list_embedding_artifacts_skips_index_and_sidecars(corpus):
+    assert sorted(list_embedding_artifacts()) == ["embeddings/a_Q1_2024.json", "embeddings/b_Q2_2024.json"]
+
+
+def test_search_corpus_merges_files(corpus):
+    result = corpus_search.search_corpus("2", top_n=1)
+    assert result["files_searched"] == 2
+    assert [hit["chunk"] for hit in result["results"]] == ["chunk 2"]
+
+
+def test_search_corpus_quarter_filter(corpus):
+    result = corpus_search.search_corpus("2", quarter_filter="Q1 2024", top_n=2)
+    assert result["files_searched"] == 1
+    assert {hit["quarter"] for hit in result["results"]} == {"Q1_2024"}
+
+
+@pytest.mark.parametrize("max_workers", [0, -1])
+def test_search_corpus_rejects_invalid_max_workers(corpus, max_workers):
+    with pytest.raises(ValueError, match="max_workers"):
+        corpus_search.search_corpus("2", max_workers=max_workers)
@@ -0,0 +1,26 @@
+from types import SimpleNamespace
+import embedding_models
+from embedding_models import embed_chunks, embedding_text
+from provenance import page_marker
+
+
+def test_embedding_text_drops_page_markers():
+    assert embedding_text(page_marker(3) + "Revenue was up.\n\n" + page_marker(4) + "Margins fell.") == \
+        "Revenue was up.\n\nMargins fell."
+    # A chunk that is only a marker is embedded as is rather than as an empty input
+    assert embedding_text(page_marker(5)) == page_marker(5)
+
+
+def test_chunks_are_embedded_without_page_markers_but_keep_them(monkeypatch):
+    inputs = []
+
+    def create(input, model, **kwargs):
+        inputs.extend(input)
+        return SimpleNamespace(data=[SimpleNamespace(embedding=[0.0]) for _ in input], usage=None)
+
+    monkeypatch.setattr(embedding_models.openai, "embeddings", SimpleNamespace(create=create), raising=False)
+    chunk = {"content": page_marker(1) + "Data center revenue grew.", "char_start": 0, "char_end": 43}
+    embed_chunks([chunk])
+
+    assert inputs == ["Data center revenue grew."]
+    assert chunk["content"].startswith(page_marker(1))
@@ -0,0 +1,34 @@
+import os
+import backend.gcs_utils  # noqa: F401  (loaded so local_bucket patches the root scripts' copy too)
+from filing_manifest import MANIFEST_PATH, load_manifest, save_manifest
+
+
+def entry(sha256):
+    return {"url": "https://example.com/report.pdf", "sha256": sha256, "generation": 1}
+
+
+def write_initial_manifest(bucket, files):
+    save_manifest(files, {}, 0)
+    # Backdate it so the next write gets a new generation even with coarse file timestamps
+    os.utime(bucket.blob(MANIFEST_PATH).path, ns=(1, 1))
+
+
+def test_save_keeps_a_concurrent_runs_newer_entries(local_bucket):
+    write_initial_manifest(local_bucket, {"a.pdf": entry("a-old"), "b.pdf": entry("b-old")})
+
+    ours, our_generation = load_manifest()
+    theirs, their_generation = load_manifest()
+    assert save_manifest({"a.pdf": entry("a-theirs")}, theirs, their_generation)
+
+    # Our load is stale now: the write fails its precondition, reloads and retries
+    assert save_manifest({"b.pdf": entry("b-ours")}, ours, our_generation)
+
+    files, _ = load_manifest()
+    assert files == {"a.pdf": entry("a-theirs"), "b.pdf": entry("b-ours")}
+
+
+def test_save_without_a_concurrent_writer(local_bucket):
+    write_initial_manifest(local_bucket, {"a.pdf": entry("a-old")})
+    files, generation = load_manifest()
+    assert save_manifest({"b.pdf": entry("b-new")}, files, generation)
+    assert load_manifest()[0] == {"a.pdf": entry("a-old"), "b.pdf": entry("b-new")}
@@ -0,0 +1,56 @@
+import os
+import subprocess
+import sys
+import http_scraper
+from conftest import ROOT
+
+FEED_FILE = os.path.join(ROOT, "fixtures", "nvidia_financial_report_feed.json")
+RENDERED_HTML_FILE = os.path.join(ROOT, "fixtures", "nvidia_quarterly_results_rendered.html")
+
+
+def read_fixture(path):
+    with open(path, encoding="utf-8") as f:
+        return f.read()
+
+
+def test_parse_feed_keeps_only_the_years_filings():
+    links = http_scraper.parse_feed(read_fixture(FEED_FILE), 2024)
+    assert [(link.quarter, link.gcs_path) for link in links] == [
+        ("Q4", "pdf_files/2024/Q4/Form_10-K.pdf"),
+        ("Q1", "pdf_files/2024/Q1/Form_10-Q.pdf"),
+    ]
+    assert all(link.url.endswith(".pdf") and link.year == 2024 for link in links)
+
+
+def test_parse_feed_skips_press_releases_and_commentary():
+    links = http_scraper.parse_feed(read_fixture(FEED_FILE), 2025)
+    assert [link.quarter for link in links] == ["Q4", "Q3", "Q2", "Q1"]
+    assert all("Form_10-" in link.gcs_path for link in links)
+
+
+def test_parse_accordion_html_matches_the_feed():
+    feed_links = http_scraper.parse_feed(read_fixture(FEED_FILE), 2025)
+    html_links = http_scraper.parse_accordion_html(read_fixture(RENDERED_HTML_FILE), 2025)
+    assert html_links
+    assert set(html_links) <= set(feed_links)
+
+
+def test_fixtures_fall_back_to_html_when_the_feed_has_no_year():
+    links = http_scraper.collect_links_from_fixtures([2023], FEED_FILE, RENDERED_HTML_FILE)
+    assert links == http_scraper.parse_accordion_html(read_fixture(RENDERED_HTML_FILE), 2023)
+
+
+DRY_RUN = """
+import runpy, sys
+sys.argv = ["http_scraper.py", "--years", "2024", "2024", "--feed-file", sys.argv[1], "--dry-run"]
+runpy.run_path("http_scraper.py", run_name="__main__")
+assert "backend.gcs_utils" not in sys.modules, "gcs_utils was imported"
+"""
+
+
+def test_dry_run_from_fixtures_needs_no_storage_client():
+    # With the GCS backend, importing gcs_utils builds storage.Client(), which needs credentials
+    result = subprocess.run([sys.executable, "-c", DRY_RUN, FEED_FILE], cwd=ROOT, capture_output=True, text=True,
+                            env={**os.environ, "STORAGE_BACKEND": "gcs"})
+    assert result.returncode == 0, result.stderr
+    assert "pdf_files/2024/Q4/Form_10-K.pdf" in result.stdout
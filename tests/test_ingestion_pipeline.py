@@ -0,0 +1,35 @@
+import io
+import pytest
+
+ingestion_pipeline = pytest.importorskip("ingestion_pipeline")
+from gcs_utils import get_blob_info, upload_to_gcs
+from pdf_parser import upload_markdown
+
+
+@pytest.fixture
+def parsed_pdf(local_bucket, monkeypatch):
+    """A PDF under pdf_files/ whose outputs/ Markdown was parsed from its current generation."""
+    upload_to_gcs(io.BytesIO(b"%PDF-1.4"), "pdf_files/AAPL/q1_2024.pdf", content_type="application/pdf")
+    generation = get_blob_info("pdf_files/AAPL/q1_2024.pdf")["generation"]
+    upload_markdown("# Q1 2024", "AAPL/q1_2024.pdf", generation)
+    parses = []
+    monkeypatch.setattr(ingestion_pipeline, "pdf_bytes_to_markdown", lambda data: parses.append(data) or "# reparsed")
+    return parses
+
+
+def new_doc():
+    return {"pdf_name": "pdf_files/AAPL/q1_2024.pdf", "filename": "AAPL/q1_2024.pdf"}
+
+
+def test_current_markdown_is_loaded_instead_of_reparsed(parsed_pdf):
+    pipeline = ingestion_pipeline.IngestionPipeline()
+    doc, _ = pipeline.parse(pipeline.fetch(new_doc())[0])
+    assert doc["markdown"] == "# Q1 2024"
+    assert parsed_pdf == []
+
+
+def test_force_reparses_current_markdown(parsed_pdf):
+    pipeline = ingestion_pipeline.IngestionPipeline(force=True)
+    doc, _ = pipeline.parse(pipeline.fetch(new_doc())[0])
+    assert doc["markdown"] == "# reparsed"
+    assert parsed_pdf == [b"%PDF-1.4"]
@@ -0,0 +1,42 @@
+import pytest
+import map_reduce_summary
+from map_reduce_summary import SummaryCache, summarize_chunks, summarize_sections
+
+CACHE_NAME = "summaries/gpt/chunked_outputs/report.json"
+CHUNKS = [{"content": f"chunk {i} " * 20, "section_item": f"item-{1 + i // 3}"} for i in range(9)]
+
+
+@pytest.fixture
+def llm_calls(local_bucket, monkeypatch):
+    """Prompts sent to a fake summarizer, whose summary is a short digest of its input."""
+    calls = []
+
+    def summarize(text, instruction):
+        calls.append(text)
+        return f"summary of {len(text)} chars"
+
+    monkeypatch.setattr(map_reduce_summary, "summarizer", lambda provider: ("fake-model", summarize))
+    return calls
+
+
+def test_document_and_section_summaries_keep_each_others_cache_entries(llm_calls):
+    summarize_chunks(CHUNKS, CACHE_NAME, fan_in=2)
+    summarize_sections(CHUNKS, CACHE_NAME, fan_in=2)
+
+    assert summarize_chunks(CHUNKS, CACHE_NAME, fan_in=2)["llm_calls"] == 0
+    assert summarize_sections(CHUNKS, CACHE_NAME, fan_in=2)["llm_calls"] == 0
+
+
+def test_cache_drops_least_recently_used_entries_beyond_the_cap(local_bucket, monkeypatch):
+    monkeypatch.setattr(map_reduce_summary, "SUMMARY_CACHE_MAX_ENTRIES", 3)
+    first = SummaryCache(CACHE_NAME)
+    for key in "abc":
+        first.put(key, key.upper())
+    first.save()
+
+    second = SummaryCache(CACHE_NAME)
+    second.get("a")
+    second.put("d", "D")
+    second.save()
+
+    assert SummaryCache(CACHE_NAME).stored == {"c": "C", "a": "A", "d": "D"}
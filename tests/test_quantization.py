@@ -0,0 +1,43 @@
+import os
+import numpy as np
+import pytest
+import corpus_search
+from quantization import quantize_int8, dequantize_int8, recall_impact
+
+
+def test_int8_round_trip_is_close():
+    matrix = np.random.default_rng(0).normal(size=(50, 32)).astype(np.float32)
+    codes, scales = quantize_int8(matrix)
+    assert codes.dtype == np.int8
+    assert np.abs(dequantize_int8(codes, scales) - matrix).max() <= scales.max() / 2 + 1e-6
+
+
+def test_recall_impact_with_rerank_is_exact_on_small_corpus():
+    matrix = np.random.default_rng(1).normal(size=(200, 32)).astype(np.float32)
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+    report = recall_impact(matrix, k=5, sample_size=20)
+    assert report["recall_at_k_int8_rerank"] == 1.0
+    assert report["int8_bytes"] < report["float32_bytes"]
+
+
+def test_int8_corpus_search_requires_rerank_cache_dir(corpus, monkeypatch):
+    monkeypatch.setattr(corpus_search, "RERANK_CACHE_DIR", None)
+    with pytest.raises(ValueError, match="RERANK_CACHE_DIR"):
+        corpus_search.search_corpus("2", quantization="int8")
+
+
+@pytest.mark.skipif(not corpus_search.is_memory_backed("/dev/shm"), reason="no tmpfs at /dev/shm")
+def test_int8_corpus_search_refuses_tmpfs(corpus, monkeypatch):
+    monkeypatch.setattr(corpus_search, "RERANK_CACHE_DIR", "/dev/shm/rerank")
+    with pytest.raises(ValueError, match="in-memory filesystem"):
+        corpus_search.search_corpus("2", quantization="int8")
+
+
+def test_int8_corpus_search_matches_float(corpus, monkeypatch, tmp_path):
+    monkeypatch.setattr(corpus_search, "RERANK_CACHE_DIR", str(tmp_path / "rerank"))
+    exact = corpus_search.search_corpus("3", top_n=2, quantization="none")["results"]
+    corpus_search._artifact_cache.clear()
+    quantized = corpus_search.search_corpus("3", top_n=2, quantization="int8")["results"]
+    assert [hit["chunk"] for hit in quantized] == [hit["chunk"] for hit in exact]
+    assert os.listdir(tmp_path / "rerank")
+
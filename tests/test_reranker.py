@@ -0,0 +1,36 @@
+import pytest
+import reranker
+
+
+@pytest.fixture
+def scored(monkeypatch):
+    """Texts the (fake) cross-encoder was asked to score; a text's score is its length."""
+    texts = []
+
+    def score_pairs(query, batch):
+        texts.extend(batch)
+        return [float(len(text)) for text in batch]
+
+    monkeypatch.setattr(reranker, "score_pairs", score_pairs)
+    reranker.clear_cache()
+    yield texts
+    reranker.clear_cache()
+
+
+def test_cached_scores_are_reused(scored):
+    chunks = [{"id": "a.json#0", "text": "short"}, {"id": "a.json#1", "text": "much longer text"}]
+    reranker.rerank("revenue", chunks, top_n=2, latency_budget_ms=0)
+    results = reranker.rerank("revenue", chunks, top_n=2, latency_budget_ms=0)
+
+    assert scored == ["short", "much longer text"]
+    assert [chunk["id"] for chunk in results] == ["a.json#1", "a.json#0"]
+
+
+def test_reingested_text_under_the_same_id_is_rescored(scored):
+    reranker.rerank("revenue", [{"id": "a.json#0", "text": "old"}, {"id": "a.json#1", "text": "old text"}],
+                    top_n=2, latency_budget_ms=0)
+    results = reranker.rerank("revenue", [{"id": "a.json#0", "text": "re-ingested text"}, {"id": "a.json#1", "text": "old text"}],
+                              top_n=2, latency_budget_ms=0)
+
+    assert scored == ["old", "old text", "re-ingested text"]
+    assert results[0]["id"] == "a.json#0" and results[0]["score"] == len("re-ingested text")
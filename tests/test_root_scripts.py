@@ -0,0 +1,37 @@
+import importlib.util
+import os
+import subprocess
+import sys
+import pytest
+from conftest import ROOT
+
+# Root-level scripts and the third-party packages they need beyond the backend's own
+ROOT_SCRIPTS = {
+    "http_scraper": [],
+    "pdf_downloader": [],
+    "filing_manifest": [],
+    "selenium_webscraping": ["selenium", "webdriver_manager"],
+}
+
+IMPORT_SCRIPT = """
+import sys
+assert not any(path.rstrip("/").endswith("backend") for path in sys.path)
+import {script}
+import backend.gcs_utils
+"""
+
+
+@pytest.mark.parametrize("script", sorted(ROOT_SCRIPTS))
+def test_root_script_imports_the_backend_as_a_package(script, tmp_path):
+    missing = [package for package in ROOT_SCRIPTS[script] if importlib.util.find_spec(package) is None]
+    if missing:
+        pytest.skip(f"{script} needs {', '.join(missing)}")
+
+    # Run from the repo root like the scripts are, without backend/ on the path
+    pythonpath = [path for path in os.environ.get("PYTHONPATH", "").split(os.pathsep)
+                  if path and os.path.abspath(path) != os.path.join(ROOT, "backend")]
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(pythonpath), "STORAGE_BACKEND": "local",
+           "LOCAL_STORAGE_DIR": str(tmp_path)}
+    result = subprocess.run([sys.executable, "-c", IMPORT_SCRIPT.format(script=script)], cwd=ROOT, env=env,
+                            capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
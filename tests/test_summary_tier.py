@@ -0,0 +1,31 @@
+import pytest
+from summary_tier import route_query
+
+
+@pytest.mark.parametrize("query", [
+    "Give me an overview of Q3 2024",
+    "What are the main risks?",
+    "Summarize the 10-K for fiscal 2025",
+    "What is Item 7 about?",
+])
+def test_broad_questions_go_to_summaries(query):
+    assert route_query(query) == "summaries"
+
+
+@pytest.mark.parametrize("query", [
+    "Tell me about data center revenue in Q3 2024",
+    "What was the gross margin outlook for Q4 2024?",
+    "Give me an overview of operating expenses",
+    "Summarize cash flow in fiscal 2024",
+    "What was the EPS in Q2 2024?",
+    "How much did gaming grow?",
+    "Total revenue for Q1 2025",
+])
+def test_specific_and_metric_questions_go_to_chunks(query):
+    assert route_query(query) == "chunks"
+
+
+def test_explicit_tier_wins():
+    assert route_query("Tell me about data center revenue", tier="summaries") == "summaries"
+    with pytest.raises(ValueError):
+        route_query("anything", tier="everything")
@@ -0,0 +1,20 @@
+import asyncio
+import tracing
+
+
+def test_span_left_open_is_ended_from_another_task(monkeypatch):
+    finished = []
+    monkeypatch.setattr(tracing, "_observers", [finished.append])
+
+    with tracing.span("http.request", end_on_exit=False) as request_span:
+        with tracing.span("llm.call") as child:
+            pass
+    assert [s.name for s in finished] == ["llm.call"]
+    assert child.parent_id == request_span.span_id
+    assert tracing._current_span.get() is None
+
+    async def stream_body():
+        tracing.end_span(request_span)
+    asyncio.run(stream_body())  # Runs in a copied context, like a streamed response body
+    assert [s.name for s in finished] == ["llm.call", "http.request"]
+    assert request_span.duration_ms is not None